@@ -5,6 +5,39 @@ import sys
 from PIL import Image
 import shutil
 
+from encoding_profiles import ffmpeg_video_args
+from media_probe import get_video_size, register_derived
+from ffmpeg_runner import run_ffmpeg
+
+# 角色图片的尺寸和边距以1080p画面为基准，按视频高度等比缩放，
+# 代理预览等低分辨率画面中的布局与正式视频一致
+REFERENCE_HEIGHT = 1080
+CHARACTER_MAX_SIZE = 500
+
+def character_scale(video_height):
+    """角色图片相对1080p画面的缩放比例"""
+    return video_height / REFERENCE_HEIGHT
+
+def fit_character_size(char_width, char_height, video_height):
+    """计算角色图片在视频中的显示尺寸，保持宽高比
+    
+    1080p画面中最大为500x500 (不放大原图)，其他分辨率按视频高度等比缩放。
+    
+    返回:
+        (宽, 高)
+    """
+    scale = character_scale(video_height)
+    char_aspect = char_width / char_height
+    if char_width > char_height:
+        # 宽度为主导
+        new_width = max(1, int(min(CHARACTER_MAX_SIZE, char_width) * scale))
+        new_height = max(1, int(new_width / char_aspect))
+    else:
+        # 高度为主导
+        new_height = max(1, int(min(CHARACTER_MAX_SIZE, char_height) * scale))
+        new_width = max(1, int(new_height * char_aspect))
+    return new_width, new_height
+
 def check_ffmpeg_available():
     """检查ffmpeg是否可用"""
     try:
@@ -22,7 +55,7 @@ def check_ffmpeg_available():
         print(f"检查ffmpeg时出错: {e}")
         return False
 
-def add_character_image_to_video(input_video, character_image, output_video):
+def add_character_image_to_video(input_video, character_image, output_video, profile=None):
     """
     使用ffmpeg将角色图片添加到视频右下角，保留透明度
     
@@ -30,6 +63,7 @@ def add_character_image_to_video(input_video, character_image, output_video):
         input_video: 输入视频文件路径
         character_image: 角色图片路径
         output_video: 输出视频文件路径
+        profile: 编码配置名称 (默认使用当前配置)
     """
     print(f"\n===== 开始添加角色图片 =====")
     print(f"输入视频: {input_video}")
@@ -68,28 +102,12 @@ def add_character_image_to_video(input_video, character_image, output_video):
     try:
         # 获取视频信息
         print("获取视频信息...")
-        ffprobe_cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-select_streams", "v:0", 
-            "-show_entries", "stream=width,height", 
-            "-of", "csv=p=0", 
-            input_video
-        ]
-        
-        print(f"执行命令: {' '.join(ffprobe_cmd)}")
-        result = subprocess.run(ffprobe_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"获取视频信息失败: {result.stderr}")
+        video_size = get_video_size(input_video)
+        if not video_size:
+            print(f"获取视频信息失败: {input_video}")
             return False
         
-        # 解析视频宽高
-        dimensions = result.stdout.strip().split(',')
-        if len(dimensions) != 2:
-            print(f"无法解析视频尺寸: {result.stdout}")
-            return False
-        
-        video_width, video_height = map(int, dimensions)
+        video_width, video_height = video_size
         print(f"视频尺寸: {video_width}x{video_height}")
         
         # 处理角色图片
@@ -126,18 +144,9 @@ def add_character_image_to_video(input_video, character_image, output_video):
         has_alpha = pil_img.mode == 'RGBA'
         print(f"图片模式: {pil_img.mode}, 是否有透明通道: {has_alpha}")
         
-        # 调整角色图片大小，保持宽高比，最大尺寸为500x500
+        # 调整角色图片大小，保持宽高比，按视频高度缩放 (1080p 下最大500x500)
         char_width, char_height = pil_img.size
-        char_aspect = char_width / char_height
-        
-        if char_width > char_height:
-            # 宽度为主导
-            new_width = min(500, char_width)
-            new_height = int(new_width / char_aspect)
-        else:
-            # 高度为主导
-            new_height = min(500, char_height)
-            new_width = int(new_height * char_aspect)
+        new_width, new_height = fit_character_size(char_width, char_height, video_height)
         
         print(f"调整图片大小: {char_width}x{char_height} -> {new_width}x{new_height}")
         
@@ -153,9 +162,10 @@ def add_character_image_to_video(input_video, character_image, output_video):
         saved_img = Image.open(temp_img_path)
         print(f"保存后的图片模式: {saved_img.mode}, 是否有透明通道: {saved_img.mode == 'RGBA'}")
         
-        # 计算右下角位置，留出20像素的边距
-        x_pos = video_width - new_width - 20
-        y_pos = video_height - new_height - 10
+        # 计算右下角位置，留出边距 (1080p 下右侧20像素、底部10像素)
+        scale = character_scale(video_height)
+        x_pos = max(0, video_width - new_width - round(20 * scale))
+        y_pos = max(0, video_height - new_height - round(10 * scale))
         
         # 使用ffmpeg添加角色图片到视频
         print("使用ffmpeg添加角色图片到视频...")
@@ -163,21 +173,25 @@ def add_character_image_to_video(input_video, character_image, output_video):
             "ffmpeg",
             "-i", input_video,
             "-i", temp_img_path,
-            "-filter_complex", f"overlay={x_pos}:{y_pos}",
-            "-c:v", "libx264",  # 使用H.264编码
-            "-pix_fmt", "yuv420p",  # 使用标准像素格式
+            "-filter_complex", f"[0:v][1:v]overlay={x_pos}:{y_pos}[out_v]",
+            "-map", "[out_v]",
+            "-map", "0:a?",
+            "-map", "0:s?",
+            *ffmpeg_video_args(profile),  # 使用指定 (默认当前) 编码配置的H.264参数
             "-c:a", "copy",
+            "-c:s", "copy",
             "-y",  # 覆盖输出文件
             output_video
         ]
         
         print(f"执行ffmpeg命令: {' '.join(ffmpeg_cmd)}")
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
+        result = run_ffmpeg(ffmpeg_cmd, label="添加角色图片", check=False, live_preview=True)
         
         if result.returncode != 0:
             print(f"添加角色图片失败: {result.stderr}")
             return False
         
+        register_derived(output_video, input_video)
         print(f"成功添加角色图片到视频: {output_video}")
         return True
     
@@ -1,18 +1,31 @@
 import subprocess
 import os
+import shutil
 import logging
 from pathlib import Path
 from typing import List, Optional, Tuple
 
+from encoding_profiles import ffmpeg_video_args
+from media_probe import register_derived
+from ffmpeg_runner import run_ffmpeg
+
 # 设置日志
 logger = logging.getLogger("add_subtitles")
 
+# 字幕输出方式:
+#   burn    - 烧录到画面中 (需要重新编码视频)
+#   soft    - 作为 mov_text 字幕轨封装进MP4，音视频流直接复制
+#   sidecar - 视频直接复制，字幕作为同名 .srt 文件放在视频旁边
+SUBTITLE_MODES = ["burn", "soft", "sidecar"]
+
 def add_subtitles(video_file: str, srt_file: str, output_file: str, 
                  font_name: str = "UD Digi Kyokasho N-B", 
                  font_size: int = 18, 
                  font_color: str = "FFFFFF", 
                  bg_opacity: float = 0.5,
-                 subtitle_vertical_offset: int = 0) -> str:
+                 subtitle_vertical_offset: int = 0,
+                 subtitle_mode: str = "burn",
+                 profile: Optional[str] = None) -> str:
     """
     为视频添加字幕
     
@@ -25,6 +38,8 @@ def add_subtitles(video_file: str, srt_file: str, output_file: str,
         font_color: 字体颜色 (默认白色 FFFFFF)
         bg_opacity: 背景透明度 (0-1，0为完全透明，1为不透明)
         subtitle_vertical_offset: 字幕垂直偏移量 (默认0)
+        subtitle_mode: 字幕输出方式 burn/soft/sidecar (默认burn，样式参数只对burn有效)
+        profile: 编码配置名称 (默认使用当前配置)
         
     返回:
         output_file: 输出视频文件路径
@@ -50,6 +65,64 @@ def add_subtitles(video_file: str, srt_file: str, output_file: str,
     output_path = Path(output_file)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
+    if subtitle_mode not in SUBTITLE_MODES:
+        logger.warning(f"未知的字幕输出方式: {subtitle_mode}，使用烧录方式")
+        subtitle_mode = "burn"
+    if subtitle_mode == "soft":
+        return _mux_soft_subtitles(video_file, srt_file, output_file)
+    if subtitle_mode == "sidecar":
+        return _write_sidecar_subtitles(video_file, srt_file, output_file)
+    
+    subtitle_filter = build_subtitle_filter(srt_file, font_name, font_size, font_color, bg_opacity,
+                                            subtitle_vertical_offset)
+    
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', video_file,
+        '-vf', subtitle_filter,
+        *ffmpeg_video_args(profile),
+        '-c:a', 'copy',
+        output_file
+    ]
+    
+    logger.debug(f"FFmpeg命令: {' '.join(cmd)}")
+    
+    try:
+        # 执行命令
+        result = run_ffmpeg(cmd, label="添加字幕", check=False, live_preview=True)
+        if result.returncode != 0:
+            logger.error(f"FFmpeg命令执行失败: {result.stderr}")
+            raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        
+        # 检查输出文件是否已生成
+        if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+            error_msg = f"输出文件不存在或为空: {output_file}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+            
+        register_derived(output_file, video_file)
+        logger.info(f"成功添加字幕，输出文件: {output_file}")
+        return output_file
+    except subprocess.CalledProcessError as e:
+        error_msg = f"FFmpeg执行失败: {e.stderr if hasattr(e, 'stderr') else str(e)}"
+        logger.exception(error_msg)
+        raise
+    except Exception as e:
+        error_msg = f"添加字幕过程中出错: {str(e)}"
+        logger.exception(error_msg)
+        raise
+
+def build_subtitle_filter(srt_file: str,
+                          font_name: str = "UD Digi Kyokasho N-B",
+                          font_size: int = 18,
+                          font_color: str = "FFFFFF",
+                          bg_opacity: float = 0.5,
+                          subtitle_vertical_offset: int = 0) -> str:
+    """生成烧录字幕的 subtitles 滤镜
+    
+    返回:
+        str: subtitles 滤镜字符串
+    """
     # 检查字体是否存在
     try:
         font_name = check_font_name(font_name)
@@ -89,40 +162,41 @@ def add_subtitles(video_file: str, srt_file: str, output_file: str,
         f"BorderStyle=4,Outline=1,Shadow=1,MarginV={final_margin_v}"
     )
     
+    return f"subtitles={srt_file}:force_style='{styles}'"
+
+def _mux_soft_subtitles(video_file: str, srt_file: str, output_file: str) -> str:
+    """将SRT作为 mov_text 字幕轨封装进视频，音视频流直接复制"""
     cmd = [
         'ffmpeg', '-y',
         '-i', video_file,
-        '-vf', f"subtitles={srt_file}:force_style='{styles}'",
-        '-c:v', 'libx264',
-        '-c:a', 'copy',
+        '-i', srt_file,
+        '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+        '-c', 'copy',
+        '-c:s', 'mov_text',
         output_file
     ]
     
     logger.debug(f"FFmpeg命令: {' '.join(cmd)}")
+    result = run_ffmpeg(cmd, label="封装字幕轨", check=False)
+    if result.returncode != 0:
+        logger.error(f"FFmpeg命令执行失败: {result.stderr}")
+        raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
     
-    try:
-        # 执行命令
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            logger.error(f"FFmpeg命令执行失败: {result.stderr}")
-            raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
-        
-        # 检查输出文件是否已生成
-        if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
-            error_msg = f"输出文件不存在或为空: {output_file}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-            
-        logger.info(f"成功添加字幕，输出文件: {output_file}")
-        return output_file
-    except subprocess.CalledProcessError as e:
-        error_msg = f"FFmpeg执行失败: {e.stderr if hasattr(e, 'stderr') else str(e)}"
-        logger.exception(error_msg)
-        raise
-    except Exception as e:
-        error_msg = f"添加字幕过程中出错: {str(e)}"
-        logger.exception(error_msg)
-        raise
+    register_derived(output_file, video_file, subtitle_streams=1)
+    logger.info(f"成功封装字幕轨，输出文件: {output_file}")
+    return output_file
+
+def _write_sidecar_subtitles(video_file: str, srt_file: str, output_file: str) -> str:
+    """视频直接复制到输出路径，字幕保存为输出视频旁的同名 .srt 文件"""
+    if os.path.abspath(video_file) != os.path.abspath(output_file):
+        shutil.copyfile(video_file, output_file)
+        register_derived(output_file, video_file)
+    sidecar_file = str(Path(output_file).with_suffix(".srt"))
+    if os.path.abspath(srt_file) != os.path.abspath(sidecar_file):
+        shutil.copyfile(srt_file, sidecar_file)
+    
+    logger.info(f"字幕已保存为外挂文件: {sidecar_file}，输出文件: {output_file}")
+    return output_file
 
 def get_system_fonts() -> List[str]:
     """
@@ -7,7 +7,14 @@ from PIL import Image
 import shutil
 import json
 from pathlib import Path
+import math
 import time
+import wave
+
+from add_character_image import character_scale, fit_character_size
+from encoding_profiles import ffmpeg_video_args
+from media_probe import get_media_info, get_duration, register_derived
+from ffmpeg_runner import run_ffmpeg
 
 def check_ffmpeg_available():
     """检查ffmpeg是否可用"""
@@ -48,19 +55,20 @@ def extract_audio(video_file, output_audio_file):
     print(f"音频提取成功: {output_audio_file}")
     return True
 
-def _run_ffmpeg_command(cmd, error_msg="执行命令失败"):
+def _run_ffmpeg_command(cmd, error_msg="执行命令失败", live_preview=False):
     """执行FFmpeg命令并处理结果
     
     Args:
         cmd: 要执行的命令列表
         error_msg: 出错时显示的消息
+        live_preview: 是否为完整长度的视频输出 (启用渐进输出时可边渲染边播放)
     
     Returns:
         成功返回(True, stdout, stderr)，失败返回(False, None, stderr)
     """
     try:
         print(f"执行命令: {' '.join(cmd)}")
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = run_ffmpeg(cmd, check=False, live_preview=live_preview)
         
         if result.returncode == 0:
             return True, result.stdout, result.stderr
@@ -80,22 +88,7 @@ def _get_audio_duration(audio_file):
     Returns:
         音频时长(秒)，失败返回None
     """
-    duration_cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "json",
-        audio_file
-    ]
-    
-    success, stdout, _ = _run_ffmpeg_command(duration_cmd, "获取音频时长失败")
-    if success and stdout:
-        try:
-            duration_data = json.loads(stdout)
-            return float(duration_data["format"]["duration"])
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"解析音频时长失败: {e}")
-    return None
+    return get_duration(audio_file) or None
 
 def _convert_to_wav(audio_file, output_wav):
     """将音频文件转换为WAV格式
@@ -118,6 +111,216 @@ def _convert_to_wav(audio_file, output_wav):
     success, _, _ = _run_ffmpeg_command(cmd_convert, "转换音频格式失败")
     return success
 
+# 每次从WAV文件读取的窗口数，分析时的内存占用与音频总长度无关
+ANALYSIS_CHUNK_WINDOWS = 2048
+
+# WAV采样宽度 -> (数据类型, 零点偏移, 归一化满幅)
+_WAV_SAMPLE_FORMATS = {
+    1: (np.uint8, 128.0, 127.0),
+    2: (np.int16, 0.0, 32767.0),
+    4: (np.int32, 0.0, 2147483647.0)
+}
+
+def _append_mouth_runs(runs, states, start_index, step, current_state):
+    """将一块窗口的张嘴状态以状态变化点的形式追加到runs中，返回最后一个窗口的状态"""
+    if current_state is None or bool(states[0]) != current_state:
+        runs.append((round(start_index * step, 3), bool(states[0])))
+    for index in np.flatnonzero(states[1:] != states[:-1]) + 1:
+        runs.append((round((start_index + index) * step, 3), bool(states[index])))
+    return bool(states[-1])
+
+def _stream_mouth_runs(wav_files, step, threshold):
+    """按顺序流式分析多个首尾相接的WAV文件，一次遍历得到张嘴状态变化点
+    
+    每次读取固定数量的窗口，用NumPy reshape后一次性计算所有窗口的RMS音量，
+    跨文件边界的不完整窗口与下一个文件的开头拼接。
+    
+    Args:
+        wav_files: WAV文件路径列表 (按时间顺序)
+        step: 窗口长度(秒)
+        threshold: 音量阈值 (0-1)
+    
+    Returns:
+        (状态变化点列表 [(时间点, 是否张嘴), ...], 音频总时长)
+    """
+    runs = []
+    current_state = None
+    window_index = 0
+    total_duration = 0.0
+    leftover = np.zeros(0, dtype=np.float32)
+    frame_rate = None
+    
+    for wav_file in wav_files:
+        with wave.open(wav_file, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            rate = wf.getframerate()
+            total_duration += wf.getnframes() / rate
+            if sample_width not in _WAV_SAMPLE_FORMATS:
+                raise ValueError(f"不支持的采样宽度: {sample_width}")
+            dtype, offset, scale = _WAV_SAMPLE_FORMATS[sample_width]
+            
+            # 采样率变化时，上一文件剩余的不完整窗口单独计算
+            if frame_rate is not None and rate != frame_rate and len(leftover):
+                rms = np.sqrt(np.mean(leftover ** 2, keepdims=True))
+                current_state = _append_mouth_runs(runs, rms > threshold, window_index, step, current_state)
+                window_index += 1
+                leftover = np.zeros(0, dtype=np.float32)
+            frame_rate = rate
+            window_size = max(1, int(rate * step))
+            
+            while True:
+                raw_data = wf.readframes(window_size * ANALYSIS_CHUNK_WINDOWS)
+                if not raw_data:
+                    break
+                samples = (np.frombuffer(raw_data, dtype=dtype).astype(np.float32) - offset) / scale
+                if channels > 1:
+                    # 如果是立体声，取平均值
+                    samples = samples.reshape(-1, channels).mean(axis=1)
+                if len(leftover):
+                    samples = np.concatenate([leftover, samples])
+                full_length = len(samples) // window_size * window_size
+                leftover = samples[full_length:]
+                if full_length:
+                    rms = np.sqrt(np.mean(samples[:full_length].reshape(-1, window_size) ** 2, axis=1))
+                    current_state = _append_mouth_runs(runs, rms > threshold, window_index, step, current_state)
+                    window_index += len(rms)
+    
+    if len(leftover):
+        rms = np.sqrt(np.mean(leftover ** 2, keepdims=True))
+        _append_mouth_runs(runs, rms > threshold, window_index, step, current_state)
+    
+    return runs, total_duration
+
+def _list_speech_wavs(audio_info_file):
+    """按音轨中的顺序列出语音阶段生成的逐句WAV文件"""
+    with open(audio_info_file, "r", encoding="utf-8") as f:
+        audio_info = json.load(f)
+    
+    wav_files = []
+    for item in audio_info.get("audio_files", []):
+        audio_item_file = item.get("audio_file")
+        if not audio_item_file:
+            continue
+        if not os.path.isabs(audio_item_file):
+            audio_item_file = os.path.join(os.path.dirname(audio_info_file), audio_item_file)
+        if os.path.exists(audio_item_file):
+            wav_files.append(audio_item_file)
+    
+    if not wav_files:
+        print(f"音频信息中没有可用的WAV文件: {audio_info_file}")
+    return wav_files
+
+def analyze_speech_wavs(audio_info_file, threshold=0.05, min_duration=0.1, sample_step=0.1):
+    """直接分析语音阶段生成的逐句WAV文件，返回张嘴状态列表
+    
+    逐句WAV按 audio_info 中的顺序首尾相接，与最终音轨的时间轴一致，
+    无需从视频中提取音频再转换格式。
+    
+    Args:
+        audio_info_file: 语音阶段生成的音频信息JSON文件路径
+        threshold: 音量阈值，范围0-1
+        min_duration: 最小张嘴持续时间(秒)
+        sample_step: 采样步长(秒)
+    
+    Returns:
+        优化后的张嘴状态列表，每项为(时间点,是否张嘴)；无法读取时返回None
+    """
+    try:
+        wav_files = _list_speech_wavs(audio_info_file)
+        if not wav_files:
+            return None
+        
+        start_time = time.time()
+        runs, total_duration = _stream_mouth_runs(wav_files, sample_step, threshold)
+        print(f"分析 {len(wav_files)} 个语音文件 ({total_duration:.1f}秒)，"
+              f"得到 {len(runs)} 个状态变化点，耗时 {time.time() - start_time:.3f} 秒")
+        return _optimize_mouth_states(runs, min_duration, total_duration)
+    except Exception as e:
+        print(f"分析语音文件出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+# 张嘴的元音 (大写为清音化元音，不发声，与 N/cl/pau 一样视为闭嘴)
+_OPEN_VOWELS = {"a", "i", "u", "e", "o"}
+
+def _query_mouth_spans(query):
+    """根据VoiceVox音频查询计算一句话内的张嘴区间
+    
+    按 prePhonemeLength、每个音拍的辅音/元音时长、停顿和 postPhonemeLength 依次累加，
+    所有时长都按 speedScale 缩放，与合成出的音频时间一致。
+    
+    Returns:
+        [(开始时间, 结束时间), ...] 句内相对时间
+    """
+    speed = query.get("speedScale") or 1.0
+    pause_scale = query.get("pauseLengthScale") or 1.0
+    spans = []
+    t = (query.get("prePhonemeLength") or 0.0) / speed
+    for accent_phrase in query.get("accent_phrases", []):
+        for mora in accent_phrase.get("moras", []):
+            t += (mora.get("consonant_length") or 0.0) / speed
+            vowel_length = (mora.get("vowel_length") or 0.0) / speed
+            if mora.get("vowel") in _OPEN_VOWELS and vowel_length > 0:
+                spans.append((t, t + vowel_length))
+            t += vowel_length
+        pause_mora = accent_phrase.get("pause_mora")
+        if pause_mora:
+            pause_length = query.get("pauseLength")
+            if pause_length is None:
+                pause_length = pause_mora.get("vowel_length") or 0.0
+            t += pause_length * pause_scale / speed
+    return spans
+
+def build_phoneme_mouth_schedule(audio_info_file, min_duration=0.05):
+    """根据语音阶段保存的VoiceVox音频查询生成张嘴状态列表
+    
+    每句的音频查询保存在对应WAV旁的 .query.json 中，按句子在音轨中的偏移
+    把每个元音区间映射到整条时间轴，无需解码或分析任何音频。
+    
+    Args:
+        audio_info_file: 语音阶段生成的音频信息JSON文件路径
+        min_duration: 最小张嘴持续时间(秒)
+    
+    Returns:
+        优化后的张嘴状态列表，每项为(时间点,是否张嘴)；任一句缺少音频查询时返回None
+    """
+    try:
+        wav_files = _list_speech_wavs(audio_info_file)
+        if not wav_files:
+            return None
+        
+        runs = [(0.0, False)]
+        offset = 0.0
+        for wav_file in wav_files:
+            query_file = Path(wav_file).with_suffix(".query.json")
+            if not query_file.exists():
+                print(f"缺少音频查询文件，无法按音素生成口型: {query_file}")
+                return None
+            with open(query_file, "r", encoding="utf-8") as f:
+                query = json.load(f)
+            for start, end in _query_mouth_spans(query):
+                start = round(offset + start, 3)
+                end = round(offset + end, 3)
+                if runs and not runs[-1][1] and runs[-1][0] >= start:
+                    # 与上一个张嘴区间首尾相接时保持张嘴
+                    runs.pop()
+                if not runs or not runs[-1][1]:
+                    runs.append((start, True))
+                runs.append((end, False))
+            # 句子在音轨中的实际长度以WAV为准，避免累计误差
+            with wave.open(wav_file, 'rb') as wf:
+                offset += wf.getnframes() / wf.getframerate()
+        
+        print(f"根据 {len(wav_files)} 句音频查询生成 {len(runs)} 个口型状态变化点")
+        return _optimize_mouth_states(runs, min_duration, offset)
+    except Exception as e:
+        print(f"按音素生成口型出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
 def _analyze_wav_volume(wav_file, step, threshold):
     """分析WAV文件音量并生成张嘴状态序列
     
@@ -127,71 +330,12 @@ def _analyze_wav_volume(wav_file, step, threshold):
         threshold: 音量阈值
     
     Returns:
-        原始张嘴状态列表，格式为[(时间点, 是否张嘴), ...]
+        张嘴状态变化点列表，格式为[(时间点, 是否张嘴), ...]
     """
     try:
-        import wave
-        
-        # 打开WAV文件
-        with wave.open(wav_file, 'rb') as wf:
-            # 获取音频参数
-            channels = wf.getnchannels()
-            sample_width = wf.getsampwidth()
-            frame_rate = wf.getframerate()
-            n_frames = wf.getnframes()
-            
-            # 读取所有数据
-            raw_data = wf.readframes(n_frames)
-            
-            # 将字节数据转换为numpy数组
-            if sample_width == 1:
-                dtype = np.uint8
-            elif sample_width == 2:
-                dtype = np.int16
-            elif sample_width == 4:
-                dtype = np.int32
-            else:
-                raise ValueError("不支持的采样宽度")
-            
-            # 将原始字节转换为数字数组
-            samples = np.frombuffer(raw_data, dtype=dtype)
-            
-            if channels > 1:
-                # 如果是立体声，取平均值
-                samples = samples.reshape(-1, channels)
-                samples = samples.mean(axis=1)
-            
-            # 计算每个时间窗口的音量级别
-            window_size = int(frame_rate * step)  # 每step秒的样本数
-            num_windows = int(np.ceil(len(samples) / window_size))
-            
-            raw_mouth_states = []
-            max_possible_volume = np.iinfo(dtype).max
-            
-            for i in range(num_windows):
-                start = i * window_size
-                end = min(start + window_size, len(samples))
-                window_samples = samples[start:end]
-                
-                # 计算窗口内的音量 (RMS)
-                if len(window_samples) > 0:
-                    volume = np.sqrt(np.mean(window_samples.astype(np.float64)**2))
-                    
-                    # 归一化音量
-                    normalized_volume = volume / max_possible_volume
-                    
-                    # 根据阈值确定是否张嘴
-                    is_mouth_open = normalized_volume > threshold
-                    
-                    # 添加时间点和张嘴状态
-                    time_point = i * step
-                    raw_mouth_states.append((time_point, is_mouth_open))
-                    
-                    print(f"时间 {time_point:.1f}s: 音量 {normalized_volume:.4f}, {'张嘴' if is_mouth_open else '闭嘴'}")
-            
-            print(f"已生成 {len(raw_mouth_states)} 个原始张嘴状态")
-            return raw_mouth_states
-            
+        raw_mouth_states, _ = _stream_mouth_runs([wav_file], step, threshold)
+        print(f"已生成 {len(raw_mouth_states)} 个张嘴状态变化点")
+        return raw_mouth_states
     except Exception as e:
         print(f"分析WAV音量出错: {e}")
         import traceback
@@ -360,15 +504,9 @@ def prepare_character_images(closed_mouth_path, open_mouth_path, video_width, vi
         
         # 获取图片尺寸
         char_width, char_height = pil_closed.size
-        char_aspect = char_width / char_height
         
-        # 调整大小，保持宽高比，最大尺寸为500x500
-        if char_width > char_height:
-            new_width = min(500, char_width)
-            new_height = int(new_width / char_aspect)
-        else:
-            new_height = min(500, char_height)
-            new_width = int(new_height * char_aspect)
+        # 调整大小，保持宽高比，按视频高度缩放 (1080p 下最大500x500)
+        new_width, new_height = fit_character_size(char_width, char_height, video_height)
         
         print(f"调整图片大小: {char_width}x{char_height} -> {new_width}x{new_height}")
         
@@ -384,8 +522,8 @@ def prepare_character_images(closed_mouth_path, open_mouth_path, video_width, vi
         pil_open.save(temp_open_path, format="PNG", optimize=True)
         
         # 计算右下角位置，留出边距
-        x_pos = video_width - new_width - 20
-        y_pos = video_height - new_height - 0  # 改为0像素的边距，使图片紧贴底部
+        x_pos = max(0, video_width - new_width - round(20 * character_scale(video_height)))
+        y_pos = max(0, video_height - new_height)  # 0像素的边距，使图片紧贴底部
         
         return temp_closed_path, temp_open_path, x_pos, y_pos
     
@@ -395,7 +533,38 @@ def prepare_character_images(closed_mouth_path, open_mouth_path, video_width, vi
         traceback.print_exc()
         return None, None, 0, 0
 
-def create_talking_character_video(input_video, closed_mouth_image, open_mouth_image, output_video, threshold=0.2):
+# 口型遮罩的边长 (像素)。遮罩每帧只需表示张嘴/闭嘴，叠加时再放大到角色图片大小；
+# 8x8 是 select 场景检测能可靠比较的最小尺寸
+MOUTH_MASK_SIZE = 8
+
+def write_mouth_mask(mouth_states, duration, fps, mask_path):
+    """按口型状态写出逐帧的低分辨率遮罩 (gray rawvideo，张嘴为白色，闭嘴为黑色)
+    
+    Args:
+        mouth_states: 张嘴状态变化点 [(时间点, 是否张嘴), ...]，按时间排序
+        duration: 视频时长(秒)
+        fps: 视频帧率
+        mask_path: 输出的 rawvideo 文件路径
+    
+    Returns:
+        写出的帧数
+    """
+    frame_size = MOUTH_MASK_SIZE * MOUTH_MASK_SIZE
+    open_frame = b"\xff" * frame_size
+    closed_frame = bytes(frame_size)
+    frame_count = max(1, int(math.ceil(round(duration * fps, 6))))
+    index = 0
+    is_open = False
+    with open(mask_path, "wb") as f:
+        for frame in range(frame_count):
+            t = frame / fps
+            while index < len(mouth_states) and mouth_states[index][0] <= t:
+                is_open = mouth_states[index][1]
+                index += 1
+            f.write(open_frame if is_open else closed_frame)
+    return frame_count
+
+def create_talking_character_video(input_video, closed_mouth_image, open_mouth_image, output_video, threshold=0.2, audio_info_file=None, profile=None):
     """
     使用ffmpeg创建会说话角色效果的视频
     
@@ -405,6 +574,9 @@ def create_talking_character_video(input_video, closed_mouth_image, open_mouth_i
         open_mouth_image: 张嘴角色图片路径
         output_video: 输出视频文件路径
         threshold: 音量阈值，超过此值时角色张嘴，范围0-1
+        audio_info_file: 语音阶段的音频信息文件，提供时优先按VoiceVox音素时长生成口型，
+                         其次直接分析逐句WAV，否则从视频中提取音频
+        profile: 编码配置名称 (默认使用当前配置)
     """
     print(f"\n===== 开始创建会说话角色视频 =====")
     print(f"输入视频: {input_video}")
@@ -439,51 +611,35 @@ def create_talking_character_video(input_video, closed_mouth_image, open_mouth_i
     os.makedirs(os.path.dirname(os.path.abspath(output_video)), exist_ok=True)
     
     try:
-        # 提取音频
-        audio_file = os.path.join(temp_dir, "audio.wav")
-        if not extract_audio(input_video, audio_file):
-            print("提取音频失败，无法继续处理")
-            return False
-        
         # 获取视频信息
         print("获取视频信息...")
-        ffprobe_cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-select_streams", "v:0", 
-            "-show_entries", "stream=width,height,r_frame_rate", 
-            "-of", "json", 
-            input_video
-        ]
-        
-        success, stdout, stderr = _run_ffmpeg_command(ffprobe_cmd, "获取视频信息失败")
-        if not success:
-            return False
-        
-        # 解析视频信息
-        video_info = json.loads(stdout)
-        
-        if not video_info.get("streams"):
+        video_info = get_media_info(input_video)
+        if not video_info or video_info.get("width") is None:
             print(f"无法获取视频流信息")
             return False
         
-        video_width = int(video_info["streams"][0]["width"])
-        video_height = int(video_info["streams"][0]["height"])
-        
-        # 解析帧率
-        frame_rate_str = video_info["streams"][0]["r_frame_rate"]
-        frame_rate_parts = frame_rate_str.split('/')
-        if len(frame_rate_parts) == 2:
-            frame_rate = float(frame_rate_parts[0]) / float(frame_rate_parts[1])
-        else:
-            frame_rate = float(frame_rate_str)
+        video_width = video_info["width"]
+        video_height = video_info["height"]
+        frame_rate = video_info["fps"]
         
         print(f"视频尺寸: {video_width}x{video_height}, 帧率: {frame_rate}fps")
         
         # 分析音频，确定张嘴时间
         print("分析音频...")
-        # 使用优化的参数: 采样步长0.3秒, 最小张嘴时长0.3秒
-        mouth_states = analyze_audio_volume(audio_file, threshold, min_duration=0.15, sample_step=0.15)
+        # 使用优化的参数: 采样步长0.15秒, 最小张嘴时长0.15秒
+        mouth_states = None
+        if audio_info_file and os.path.exists(audio_info_file):
+            # 优先使用VoiceVox音频查询中的音素时长，无需解码音频
+            mouth_states = build_phoneme_mouth_schedule(audio_info_file)
+            if not mouth_states:
+                mouth_states = analyze_speech_wavs(audio_info_file, threshold, min_duration=0.15, sample_step=0.15)
+        if not mouth_states:
+            # 从视频中提取音频
+            audio_file = os.path.join(temp_dir, "audio.wav")
+            if not extract_audio(input_video, audio_file):
+                print("提取音频失败，无法继续处理")
+                return False
+            mouth_states = analyze_audio_volume(audio_file, threshold, min_duration=0.15, sample_step=0.15)
         if not mouth_states:
             print("分析音频失败，无法继续处理")
             return False
@@ -501,92 +657,74 @@ def create_talking_character_video(input_video, closed_mouth_image, open_mouth_i
         print("创建口型变化视频...")
         
         # 获取视频时长
-        duration_cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "json",
-            input_video
-        ]
+        video_duration = video_info["duration"]
+        print(f"视频时长: {video_duration}秒")
         
-        success, stdout, stderr = _run_ffmpeg_command(duration_cmd, "获取视频时长失败")
+        # 口型由预先渲染的低分辨率遮罩流驱动: 先逐帧写出遮罩，再只保留状态变化的帧
+        # (可变帧率)。叠加时只在状态变化的帧上按遮罩合成闭嘴/张嘴图层，其余帧重复上一个图层，
+        # 每帧开销与故事长度和状态变化次数无关
+        open_segments = sum(1 for _, is_open in mouth_states if is_open)
+        raw_mask_path = os.path.join(temp_dir, "mouth_mask.raw")
+        mask_path = os.path.join(temp_dir, "mouth_mask.mkv")
+        mask_frames = write_mouth_mask(mouth_states, video_duration, frame_rate, raw_mask_path)
+        mask_cmd = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo", "-pix_fmt", "gray",
+            "-video_size", f"{MOUTH_MASK_SIZE}x{MOUTH_MASK_SIZE}",
+            "-framerate", str(frame_rate),
+            "-i", raw_mask_path,
+            "-vf", "select='eq(n\\,0)+gt(scene\\,0.5)'",
+            "-fps_mode", "vfr",
+            "-c:v", "ffv1",
+            mask_path
+        ]
+        success, _, _ = _run_ffmpeg_command(mask_cmd, "生成口型遮罩失败")
         if not success:
             return False
-            
-        duration_data = json.loads(stdout)
-        video_duration = float(duration_data["format"]["duration"])
-        print(f"视频时长: {video_duration}秒")
-        
-        # 用简单的方法：使用闭嘴图片作为基础，在需要张嘴的时候切换
-        # 创建一个张嘴时间表作为ffmpeg滤镜表达式
-        mouth_expr = []
-        open_segments = 0
-        
-        for i, (time_point, is_open) in enumerate(mouth_states):
-            if i < len(mouth_states) - 1:
-                next_time = mouth_states[i + 1][0]
-                if is_open:
-                    # 只添加真正的张嘴状态
-                    mouth_expr.append(f"between(t,{time_point},{next_time})")
-                    open_segments += 1
-            else:
-                # 最后一个状态
-                if is_open:
-                    mouth_expr.append(f"gte(t,{time_point})")
-                    open_segments += 1
-        
-        print(f"生成了{open_segments}个张嘴片段表达式")
-        
-        # 如果表达式过长，分批处理
-        MAX_EXPR_PER_BATCH = 50  # 每批最多50个表达式
-        batched_exprs = []
-        
-        for i in range(0, len(mouth_expr), MAX_EXPR_PER_BATCH):
-            batch = mouth_expr[i:i+MAX_EXPR_PER_BATCH]
-            batched_exprs.append("+".join(batch))
-        
-        # 合并所有批次
-        if batched_exprs:
-            enable_expr = "+".join([f"({expr})" for expr in batched_exprs])
-        else:
-            enable_expr = "0"  # 如果没有表达式，则默认为0（始终不启用）
-        
-        print(f"最终表达式长度: {len(enable_expr)} 字符")
-        
-        # 创建临时滤镜脚本文件，避免命令行长度限制
-        filter_script_path = os.path.join(temp_dir, "filter_complex.txt")
-        with open(filter_script_path, "w", encoding="utf-8") as f:
-            # 写入滤镜表达式
-            f.write(f"[0:v][1:v]overlay={x_pos}:{y_pos}[tmp];\n")
-            f.write(f"[tmp][2:v]overlay={x_pos}:{y_pos}:enable='{enable_expr}'")
-        
-        print(f"已创建滤镜脚本文件: {filter_script_path}")
+        print(f"生成了{open_segments}个张嘴片段的口型遮罩 ({mask_frames}帧): {mask_path}")
+        
+        # 遮罩放大到角色图片大小 (最近邻，保持只有黑白两值)，四个平面都使用遮罩，
+        # maskedmerge 按遮罩在闭嘴和张嘴图片 (包括透明通道) 之间选择
+        with Image.open(temp_closed_path) as img:
+            char_width, char_height = img.size
+        filter_complex = (
+            f"[3:v]scale={char_width}:{char_height}:flags=neighbor,format=gray,split=4[m0][m1][m2][m3];"
+            f"[m0][m1][m2][m3]mergeplanes=0x00102030:gbrap[mask];"
+            f"[1:v]format=gbrap[closed];[2:v]format=gbrap[open];"
+            f"[closed][open][mask]maskedmerge[mouth];"
+            f"[0:v][mouth]overlay={x_pos}:{y_pos}[out_v]"
+        )
         
-        # 构建ffmpeg命令，使用-filter_complex_script替代-filter_complex
+        # 构建ffmpeg命令
         ffmpeg_cmd = [
             "ffmpeg",
             "-i", input_video,      # 原始视频
             "-i", temp_closed_path, # 闭嘴图片
             "-i", temp_open_path,   # 张嘴图片
-            "-filter_complex_script", filter_script_path,  # 使用滤镜脚本文件
+            "-i", mask_path,        # 口型遮罩
+            "-filter_complex", filter_complex,
+            "-map", "[out_v]",      # 显式映射输出流
+            "-map", "0:a?",
+            "-map", "0:s?",
+            *ffmpeg_video_args(profile),  # 使用指定 (默认当前) 编码配置
             "-c:a", "copy",         # 复制音频流
+            "-c:s", "copy",         # 复制软字幕流
             "-y",                   # 覆盖输出文件
             output_video
         ]
         
-        success, _, stderr = _run_ffmpeg_command(ffmpeg_cmd, "创建会说话角色视频失败")
+        success, _, stderr = _run_ffmpeg_command(ffmpeg_cmd, "创建会说话角色视频失败", live_preview=True)
         if not success:
             # 保存错误信息到文件
             with open("output/ffmpeg_error.txt", "w", encoding="utf-8") as f:
                 f.write(stderr)
             return False
         
+        register_derived(output_video, input_video)
         print(f"成功创建会说话角色视频: {output_video}")
         
         # 清理临时文件
         try:
-            if os.path.exists(filter_script_path):
-                os.remove(filter_script_path)
             shutil.rmtree(temp_dir)
             if os.path.exists(temp_closed_path):
                 os.remove(temp_closed_path)
@@ -61,6 +61,7 @@ class Config:
             "dictionaries": "dictionaries",
             "fonts": "fonts",
             "workflows": "workflows",
+            "image_library": "image_library",
             "temporary": "temp"
         },
         
@@ -69,6 +70,18 @@ class Config:
             "resolution": (1920, 1080),
             "fps": 30,
             "default_engine": "auto",
+            "scene_encode_threads": 2,
+            "scene_encode_workers": 0,  # 0 表示按CPU核心数自动计算
+            "moviepy_subpixel": True,  # MoviePy引擎逐帧采样时使用双线性插值
+            "moviepy_prefetch_scenes": 1,  # MoviePy引擎后台预取的后续场景数
+            "moviepy_render_shards": 1,  # MoviePy引擎并行渲染场景片段的进程数，0 表示自动
+            "encoding_profile": "standard",  # 视频编码配置 (draft/fast/standard/final)，见 encoding_profiles.py
+            "progressive_output": "off",  # 边渲染边观看: off / fmp4 (分片MP4) / hls (额外输出HLS播放列表)
+            "proxy": {  # 场景编辑器的代理预览渲染: 低分辨率、低帧率、最快编码
+                "height": 360,
+                "fps": 15,
+                "profile": "draft"
+            },
             "default_font": {
                 "name": "UD Digi Kyokasho N-B",
                 "size": 18,
@@ -98,6 +111,21 @@ class Config:
             }
         },
         
+        # 场景管理器缩略图: 长边像素、格式 (webp/jpeg) 和压缩质量，缓存在临时目录
+        "scene_thumbnails": {
+            "size": 320,
+            "format": "webp",
+            "quality": 80
+        },
+        
+        # 图像任务队列配置 (各后端并发上限)
+        "image_scheduler": {
+            "limits": {
+                "comfyui": 1,
+                "midjourney": 3
+            }
+        },
+        
         # 处理配置
         "processing": {
             "max_retries": 3,
@@ -0,0 +1,152 @@
+"""视频编码配置模块
+
+集中定义命名的编码配置 (draft / fast / standard / final)，所有调用 libx264 编码的地方
+都通过这里生成编码参数，便于在出片速度和画质之间统一切换。
+
+配置可以在 config.json 的 video.encoding_profiles 中覆盖或新增，
+当前使用的配置由 video.encoding_profile 指定。
+"""
+from typing import Dict, Any, List, Optional
+
+from config import config
+from errors import get_logger
+
+logger = get_logger("encoding_profiles")
+
+# 内置编码配置: preset/crf 决定速度与画质，gop 为关键帧间隔 (帧)，threads 为 0 表示自动
+ENCODING_PROFILES = {
+    "draft": {
+        "preset": "ultrafast",
+        "crf": 30,
+        "tune": "fastdecode",
+        "gop": 60,
+        "pix_fmt": "yuv420p",
+        "threads": 0
+    },
+    "fast": {
+        "preset": "veryfast",
+        "crf": 24,
+        "tune": None,
+        "gop": 120,
+        "pix_fmt": "yuv420p",
+        "threads": 0
+    },
+    # 与 libx264 默认参数一致 (medium / crf 23)，是未指定编码配置时的行为
+    "standard": {
+        "preset": "medium",
+        "crf": 23,
+        "tune": None,
+        "gop": 250,
+        "pix_fmt": "yuv420p",
+        "threads": 0
+    },
+    # 最高画质，编码明显更慢，需要显式选择
+    "final": {
+        "preset": "slow",
+        "crf": 18,
+        "tune": None,
+        "gop": 250,
+        "pix_fmt": "yuv420p",
+        "threads": 0
+    }
+}
+
+DEFAULT_PROFILE = "standard"
+
+# 边渲染边观看的输出方式: off 普通MP4，fmp4 分片MP4 (写入过程中即可播放)，
+# hls 在分片MP4之外同时写出HLS播放列表。只作用于 run_ffmpeg(live_preview=True) 的完整长度输出，
+# 场景片段等中间编码不受影响
+PROGRESSIVE_MODES = ["off", "fmp4", "hls"]
+FRAGMENTED_MP4_FLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+
+def get_profiles() -> Dict[str, Dict[str, Any]]:
+    """返回所有可用的编码配置 (内置配置合并 config.json 中的覆盖项)"""
+    profiles = {name: dict(settings) for name, settings in ENCODING_PROFILES.items()}
+    for name, overrides in (config.get("video", "encoding_profiles", default={}) or {}).items():
+        profiles.setdefault(name, dict(ENCODING_PROFILES[DEFAULT_PROFILE])).update(overrides)
+    return profiles
+
+
+def get_profile_names() -> List[str]:
+    """返回可用的编码配置名称"""
+    return list(get_profiles().keys())
+
+
+def set_active_profile(name: str):
+    """设置当前进程使用的编码配置"""
+    if name not in get_profiles():
+        logger.warning(f"未知的编码配置: {name}，使用默认配置 {DEFAULT_PROFILE}")
+        name = DEFAULT_PROFILE
+    config.set("video", "encoding_profile", name)
+    logger.info(f"视频编码配置: {name}")
+
+
+def get_progressive_mode() -> str:
+    """返回当前的边渲染边观看输出方式"""
+    mode = config.get("video", "progressive_output", default="off")
+    return mode if mode in PROGRESSIVE_MODES else "off"
+
+
+def set_progressive_mode(mode: str):
+    """设置当前进程的边渲染边观看输出方式"""
+    if mode not in PROGRESSIVE_MODES:
+        logger.warning(f"未知的渐进输出方式: {mode}，不使用渐进输出")
+        mode = "off"
+    config.set("video", "progressive_output", mode)
+    logger.info(f"渐进输出方式: {mode}")
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """获取编码配置，未指定名称时使用 video.encoding_profile"""
+    profiles = get_profiles()
+    name = name or config.get("video", "encoding_profile", default=DEFAULT_PROFILE)
+    if name not in profiles:
+        logger.warning(f"未知的编码配置: {name}，使用默认配置 {DEFAULT_PROFILE}")
+        name = DEFAULT_PROFILE
+    return profiles[name]
+
+
+def ffmpeg_video_args(name: Optional[str] = None, threads: Optional[int] = None) -> List[str]:
+    """生成 ffmpeg 命令中的视频编码参数
+
+    Args:
+        name: 编码配置名称，默认使用当前配置
+        threads: 覆盖配置中的线程数 (并行编码多个片段时使用)
+
+    Returns:
+        List[str]: 形如 ["-c:v", "libx264", "-preset", ...] 的参数列表
+    """
+    profile = get_profile(name)
+    args = [
+        "-c:v", "libx264",
+        "-preset", str(profile["preset"]),
+        "-crf", str(profile["crf"]),
+        "-pix_fmt", str(profile["pix_fmt"]),
+        "-g", str(profile["gop"]),
+        "-threads", str(threads if threads is not None else profile["threads"])
+    ]
+    if profile.get("tune"):
+        args.extend(["-tune", str(profile["tune"])])
+    return args
+
+
+def moviepy_write_kwargs(name: Optional[str] = None, threads: Optional[int] = None) -> Dict[str, Any]:
+    """生成 MoviePy write_videofile 的编码参数"""
+    profile = get_profile(name)
+    ffmpeg_params = [
+        "-crf", str(profile["crf"]),
+        "-pix_fmt", str(profile["pix_fmt"]),
+        "-g", str(profile["gop"])
+    ]
+    if profile.get("tune"):
+        ffmpeg_params.extend(["-tune", str(profile["tune"])])
+    kwargs = {
+        "codec": "libx264",
+        "preset": str(profile["preset"]),
+        "ffmpeg_params": ffmpeg_params
+    }
+    thread_count = threads if threads is not None else profile["threads"]
+    if thread_count:
+        kwargs["threads"] = thread_count
+    return kwargs
@@ -0,0 +1,276 @@
+"""FFmpeg 执行与进度上报模块
+
+所有耗时的 ffmpeg 调用统一通过 run_ffmpeg 执行：自动加上 -progress pipe:1，
+实时解析 out_time_us / speed，计算完成百分比和剩余时间，并发布进度事件：
+- 写入日志
+- 以 FFMPEG_PROGRESS_MARKER 行输出到标准输出，供 WebUI 从子进程输出中解析
+- 调用通过 add_progress_listener 注册的回调 (例如链路追踪)
+
+长时间没有进度更新说明 ffmpeg 可能卡住，而不是编码速度慢。
+
+启用渐进输出 (video.progressive_output) 时，完整长度的输出开始写入后会输出
+LIVE_PREVIEW_MARKER 行 (分片MP4或HLS播放列表路径)，WebUI 可在渲染过程中开始播放。
+"""
+import os
+import time
+import platform
+import threading
+import subprocess
+from typing import Callable, Dict, Any, List, Optional
+
+from errors import get_logger
+
+logger = get_logger("ffmpeg_runner")
+
+# 进度事件的最小发布间隔 (秒)，短命令在首次上报前就会结束
+PROGRESS_INTERVAL = 2.0
+# 进度事件在标准输出中的标记
+PROGRESS_MARKER = "FFMPEG_PROGRESS_MARKER:"
+# 可边渲染边播放的输出在标准输出中的标记
+LIVE_PREVIEW_MARKER = "LIVE_PREVIEW_MARKER:"
+# cmd.exe 会解释的字符
+SHELL_METACHARACTERS = "|&<>^"
+
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_progress_listener(callback: Callable[[Dict[str, Any]], None]) -> None:
+    """注册进度回调，回调参数为进度事件字典
+
+    事件字段: label, out_time (秒), duration (秒或None), percent (或None),
+    speed (倍速或None), eta (秒或None), done (是否结束)
+    """
+    _listeners.append(callback)
+
+
+def remove_progress_listener(callback: Callable[[Dict[str, Any]], None]) -> None:
+    """移除进度回调"""
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def format_progress(event: Dict[str, Any]) -> str:
+    """把进度事件格式化为便于显示的文本"""
+    parts = [event["label"]]
+    if event.get("percent") is not None:
+        parts.append(f"{event['percent']:.1f}%")
+    else:
+        parts.append(f"{event['out_time']:.1f}s")
+    if event.get("speed"):
+        parts.append(f"速度 {event['speed']:.2f}x")
+    if event.get("eta") is not None:
+        parts.append(f"剩余约 {event['eta']:.0f}s")
+    return " | ".join(parts)
+
+
+def parse_progress_marker(line: str) -> Optional[str]:
+    """从子进程输出行中提取进度文本，不是进度行时返回None"""
+    if PROGRESS_MARKER not in line:
+        return None
+    return line.split(PROGRESS_MARKER, 1)[1].strip()
+
+
+def parse_live_preview_marker(line: str) -> Optional[str]:
+    """从子进程输出行中提取可播放的渐进输出路径，不是该标记时返回None"""
+    if LIVE_PREVIEW_MARKER not in line:
+        return None
+    return line.split(LIVE_PREVIEW_MARKER, 1)[1].strip()
+
+
+def _hls_playlist_path(output_file: str) -> str:
+    """HLS播放列表路径: <输出目录>/live/<输出文件名>/index.m3u8"""
+    stem = os.path.splitext(os.path.basename(output_file))[0]
+    return os.path.join(os.path.dirname(output_file) or ".", "live", stem, "index.m3u8")
+
+
+def _without_movflags(args: List[str]) -> List[str]:
+    args = list(args)
+    if "-movflags" in args:
+        index = args.index("-movflags")
+        del args[index:index + 2]
+    return args
+
+
+def _with_fragmented_output(cmd: List[str]) -> List[str]:
+    """给命令的MP4输出加上分片MP4的 movflags: 每个关键帧开始一个分片，写入过程中即可播放"""
+    from encoding_profiles import FRAGMENTED_MP4_FLAGS
+    output_file = str(cmd[-1])
+    if not output_file.lower().endswith(".mp4"):
+        return cmd
+    return _without_movflags(cmd[:-1]) + ["-movflags", FRAGMENTED_MP4_FLAGS, output_file]
+
+
+def _tee_path(path: str) -> str:
+    """tee 子输出中的路径: 统一使用 /，并转义 tee 的分隔符"""
+    path = path.replace("\\", "/")
+    for char in "|[]":
+        path = path.replace(char, "\\" + char)
+    return path
+
+
+def _tee_option_value(value: str) -> str:
+    """tee 子输出的选项值: 用 (转义后的) 单引号包围，值中的 : 不会被当作选项分隔符 (例如 C:/...)"""
+    return "\\'" + _tee_path(value) + "\\'"
+
+
+def _with_hls_output(cmd: List[str]) -> Optional[List[str]]:
+    """把命令的MP4输出改为 tee 输出: 分片MP4 + HLS播放列表 (只编码一次)
+
+    tee 需要显式映射输出流；没有 -map 且使用了 filter_complex 的命令无法安全改写，返回None。
+    HLS 子输出只选择音视频流 (mov_text 软字幕无法写入HLS)，MP4 子输出保留全部流。
+    """
+    from encoding_profiles import FRAGMENTED_MP4_FLAGS
+    output_file = str(cmd[-1])
+    if not output_file.lower().endswith(".mp4"):
+        return None
+    has_map = "-map" in cmd
+    if not has_map and ("-filter_complex" in cmd or "-filter_complex_script" in cmd):
+        return None
+
+    playlist = _hls_playlist_path(output_file)
+    os.makedirs(os.path.dirname(playlist), exist_ok=True)
+    segment_pattern = os.path.join(os.path.dirname(playlist), "seg_%05d.m4s")
+    tee_output = (f"[f=mp4:movflags={FRAGMENTED_MP4_FLAGS}]{_tee_path(output_file)}|"
+                  f"[f=hls:select=\\'v,a\\':hls_time=4:hls_playlist_type=event:hls_segment_type=fmp4:"
+                  f"hls_segment_filename={_tee_option_value(segment_pattern)}]{_tee_path(playlist)}")
+    # 输出参数中已有的 -movflags 由 tee 的子输出选项代替
+    args = _without_movflags(cmd[:-1])
+    if not has_map:
+        args.extend(["-map", "0:v", "-map", "0:a?"])
+    # tee 的 mp4/hls 子输出需要全局头 (编码参数写在 moov 中，empty_moov 分片MP4才能解码)
+    return args + ["-flags", "+global_header", "-f", "tee", tee_output]
+
+
+def _publish(event: Dict[str, Any]) -> None:
+    text = format_progress(event)
+    logger.info(f"FFmpeg进度: {text}")
+    print(f"{PROGRESS_MARKER} {text}", flush=True)
+    for callback in list(_listeners):
+        try:
+            callback(event)
+        except Exception as e:
+            logger.warning(f"进度回调执行失败: {e}")
+
+
+def _guess_duration(cmd: List[str]) -> Optional[float]:
+    """从命令中推断输出时长: 优先使用 -t，否则取第一个输入文件的时长"""
+    if "-t" in cmd:
+        try:
+            return float(cmd[cmd.index("-t") + 1])
+        except (IndexError, ValueError):
+            pass
+    if "-i" in cmd:
+        first_input = cmd[cmd.index("-i") + 1]
+        # concat 列表和图片输入无法直接得到输出时长
+        if os.path.isfile(first_input) and not first_input.lower().endswith((".txt", ".ffconcat", ".png", ".jpg", ".jpeg")):
+            from media_probe import get_duration
+            return get_duration(first_input) or None
+    return None
+
+
+def run_ffmpeg(cmd: List[str], duration: Optional[float] = None, label: Optional[str] = None,
+               check: bool = True, text: bool = True, live_preview: bool = False) -> subprocess.CompletedProcess:
+    """执行 ffmpeg 命令并实时上报进度
+
+    Args:
+        cmd: ffmpeg 命令 (第一个元素为 ffmpeg)
+        duration: 输出时长 (秒)，用于计算百分比和剩余时间，默认从命令推断
+        label: 进度事件中显示的名称，默认使用输出文件名
+        check: 失败时是否抛出 CalledProcessError
+        text: stderr 以文本 (True) 还是字节 (False) 返回
+        live_preview: 输出为完整长度的视频时设为True，启用渐进输出后可边渲染边播放
+
+    Returns:
+        subprocess.CompletedProcess: stdout 为空，stderr 为 ffmpeg 的日志输出
+    """
+    label = label or os.path.basename(str(cmd[-1]))
+    if duration is None:
+        duration = _guess_duration(cmd)
+    preview_path = None
+    if live_preview:
+        from encoding_profiles import get_progressive_mode
+        mode = get_progressive_mode()
+        if mode == "hls":
+            hls_cmd = _with_hls_output(cmd)
+            if hls_cmd:
+                preview_path = _hls_playlist_path(str(cmd[-1]))
+                cmd = hls_cmd
+            else:
+                # 无法改写为 tee 输出时退回分片MP4，普通MP4在结束前无法播放
+                logger.info("命令无法改写为HLS输出，改用分片MP4渐进输出")
+                preview_path = str(cmd[-1])
+                cmd = _with_fragmented_output(cmd)
+        elif mode == "fmp4":
+            preview_path = str(cmd[-1])
+            cmd = _with_fragmented_output(cmd)
+    full_cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+
+    # Windows 下通过 shell 查找 ffmpeg；参数中有 cmd.exe 的元字符 (例如 tee 输出的 |) 时不经过 shell，
+    # 否则会被当作管道等 shell 语法
+    use_shell = platform.system() == "Windows" and not any(
+        char in str(arg) for arg in full_cmd for char in SHELL_METACHARACTERS)
+    process = subprocess.Popen(
+        full_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=use_shell
+    )
+
+    # stderr 在后台线程中读取，避免管道写满导致 ffmpeg 阻塞
+    stderr_chunks = []
+    stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    start = time.time()
+    last_publish = start
+    state: Dict[str, str] = {}
+    for raw_line in iter(process.stdout.readline, b""):
+        key, _, value = raw_line.decode("utf-8", errors="replace").strip().partition("=")
+        state[key] = value
+        # 每个进度块以 progress=continue/end 结束
+        if key != "progress":
+            continue
+        if preview_path:
+            # 第一个进度块到达时输出文件已有内容，通知界面开始播放
+            print(f"{LIVE_PREVIEW_MARKER} {preview_path}", flush=True)
+            logger.info(f"渐进输出已开始，可边渲染边播放: {preview_path}")
+            preview_path = None
+        now = time.time()
+        done = value == "end"
+        if not done and now - last_publish < PROGRESS_INTERVAL:
+            continue
+        last_publish = now
+
+        try:
+            # out_time_ms 实际单位也是微秒，优先使用 out_time_us
+            out_time = int(state.get("out_time_us") or state.get("out_time_ms") or 0) / 1_000_000
+        except ValueError:
+            out_time = 0.0
+        try:
+            speed = float(state.get("speed", "").rstrip("x"))
+        except ValueError:
+            speed = None
+
+        percent = eta = None
+        if duration:
+            percent = min(100.0, out_time / duration * 100)
+            if speed:
+                eta = max(0.0, (duration - out_time) / speed)
+        if done:
+            percent = 100.0 if duration else None
+            eta = 0.0
+        _publish({"label": label, "out_time": out_time, "duration": duration, "percent": percent,
+                  "speed": speed, "eta": eta, "done": done, "elapsed": now - start})
+
+    process.stdout.close()
+    returncode = process.wait()
+    stderr_thread.join()
+    process.stderr.close()
+
+    stderr = stderr_chunks[0] if stderr_chunks else b""
+    if text:
+        stderr = stderr.decode("utf-8", errors="replace")
+    stdout = "" if text else b""
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, full_cmd, stdout, stderr)
+    return subprocess.CompletedProcess(full_cmd, returncode, stdout, stderr)
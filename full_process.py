@@ -6,6 +6,11 @@ from story_analyzer import StoryAnalyzer
 from image_generator import ComfyUIGenerator
 from midjourney_generator import MidjourneyGenerator
 from video_processor import VideoProcessor
+from config import config
+from image_library import ImageLibrary, tokenize_prompt
+from image_scheduler import get_scheduler
+from encoding_profiles import set_active_profile, get_profile_names, set_progressive_mode, PROGRESSIVE_MODES
+from add_subtitles import SUBTITLE_MODES
 import json
 import subprocess
 import argparse
@@ -15,9 +20,10 @@ import shutil
 import locale
 import logging
 import asyncio
+import threading
 from test_voice_generator import process_voice_generation
 from scene_management import rewrite_prompt_with_ai
-from typing import Optional
+from typing import Optional, List, Tuple
 
 # 设置日志记录
 logging.basicConfig(
@@ -134,6 +140,8 @@ def clean_output_directories():
             ("output/videos", "*.mp4"),
             ("output/audio", "*.*"),
             ("output/texts", "*.txt"),
+            ("output/scene_clips", "*.*"),
+            ("output/live", "*/*"),
             ("output", "*.mp4"),
             ("output", "*.srt"),
             ("output", "*.json")
@@ -161,18 +169,199 @@ def clean_output_directories():
         print(error_msg)
         logger.exception(error_msg)
 
+# 四宫格收割模式下，相邻场景提示词的最低相似度 (词集合 Jaccard)
+GRID_HARVEST_SIMILARITY = 0.5
+
+def group_scenes_for_grid(key_scenes, similarity_threshold=GRID_HARVEST_SIMILARITY, max_group_size=4):
+    """将提示词相似的相邻场景分组，每组最多4个场景，共用一个Midjourney四宫格
+
+    Returns:
+        list: 分组列表，每组为 [(场景索引, 场景数据), ...]
+    """
+    groups = []
+    current_group = []
+    current_tokens = set()
+    for i, scene in enumerate(key_scenes):
+        prompt = scene.get('prompt', '') if isinstance(scene, dict) else str(scene)
+        tokens = tokenize_prompt(prompt)
+        if current_group and len(current_group) < max_group_size and isinstance(scene, dict) and isinstance(current_group[0][1], dict):
+            union = current_tokens | tokens
+            similarity = len(current_tokens & tokens) / len(union) if union else 0.0
+            if similarity >= similarity_threshold:
+                current_group.append((i, scene))
+                continue
+        if current_group:
+            groups.append(current_group)
+        current_group = [(i, scene)]
+        current_tokens = tokens
+    if current_group:
+        groups.append(current_group)
+    return groups
+
+def find_duplicate_scenes(key_scenes, threshold):
+    """查找提示词近似重复的场景，每组只需生成一张图像
+
+    Args:
+        key_scenes: 场景列表
+        threshold: 词集合 Jaccard 相似度阈值 (0-1)，达到阈值即视为重复
+
+    Returns:
+        dict: {重复场景索引: 代表场景索引}
+    """
+    duplicates = {}
+    representatives = []  # [(场景索引, 词集合)]
+    for i, scene in enumerate(key_scenes):
+        if not isinstance(scene, dict) or not scene.get('prompt'):
+            continue
+        tokens = tokenize_prompt(scene['prompt'])
+        for rep_index, rep_tokens in representatives:
+            union = tokens | rep_tokens
+            if union and len(tokens & rep_tokens) / len(union) >= threshold:
+                duplicates[i] = rep_index
+                break
+        else:
+            representatives.append((i, tokens))
+    return duplicates
+
+def reuse_duplicate_scene_images(key_scenes, duplicates, images_dir="output/images"):
+    """将代表场景生成的图像复制给其重复场景，保持每个场景拥有独立的图像文件"""
+    reused = 0
+    for dup_index, rep_index in duplicates.items():
+        dup_scene = key_scenes[dup_index]
+        rep_image = key_scenes[rep_index].get('image_file_generated')
+        if not rep_image or not os.path.exists(rep_image):
+            logger.warning(f"场景 {dup_index + 1} 的代表场景 {rep_index + 1} 没有可用图像，无法复用")
+            dup_scene['image_file_generated'] = None
+            continue
+        target_image = os.path.join(images_dir, dup_scene.get('image_file', f"scene_{dup_index+1:03d}.png"))
+        if os.path.abspath(target_image) != os.path.abspath(rep_image):
+            shutil.copyfile(rep_image, target_image)
+        dup_scene['image_file_generated'] = target_image
+        dup_scene['duplicate_of'] = key_scenes[rep_index].get('scene_id', rep_index + 1)
+        dup_scene['draft'] = key_scenes[rep_index].get('draft', False)
+        reused += 1
+    return reused
+
+def library_style_key(image_generator_type, image_style, custom_style, comfyui_style):
+    """图像库中区分风格的键: 生成器、风格描述和 ComfyUI 风格都一致的图像才能互相复用"""
+    return f"{image_generator_type.lower()}|{custom_style or image_style or ''}|{comfyui_style or ''}"
+
+def upgrade_draft_images(key_scenes, image_style, custom_style, comfyui_style, upgraded_scenes, story_id="default", priority=1.0,
+                         aspect_ratio=None, library_min_score=0.0):
+    """后台以完整质量重新生成草稿图像
+
+    新图像先写入 output/images/full/，待草稿视频合成完毕后再替换草稿图像，
+    避免合成过程中图片被改写。成功升级的场景索引追加到 upgraded_scenes。
+    启用图像库时，高质量图像生成后即入库 (草稿图像不入库)。
+    """
+    generator = ComfyUIGenerator(style=comfyui_style)
+    library = ImageLibrary() if library_min_score > 0 else None
+    library_style = library_style_key("comfyui", image_style, custom_style, comfyui_style)
+    for i, scene in enumerate(key_scenes):
+        # 重复场景在替换阶段直接复制其代表场景的高质量图像
+        if not isinstance(scene, dict) or not scene.get('draft') or scene.get('duplicate_of'):
+            continue
+        final_prompt = scene['prompt']
+        if custom_style:
+            final_prompt += f", {custom_style}"
+        elif image_style:
+            final_prompt += f", {image_style}"
+        # 后台升级任务以较低优先级排队，让其他故事的首轮图像先生成
+        full_image = asyncio.run(_scheduled_call("comfyui", story_id, priority * 0.5, generator.generate_image,
+                                                 final_prompt, f"full/{scene['image_file']}", overwrite=True))
+        if full_image:
+            upgraded_scenes.append(i)
+            logger.info(f"场景 {i+1} 高质量图像已生成: {full_image}")
+            if library:
+                library.add_image(full_image, scene.get('prompt', ''), library_style, aspect_ratio)
+        else:
+            logger.warning(f"场景 {i+1} 高质量图像生成失败，保留草稿图像")
+    if library:
+        logger.info(f"图像库当前共有 {library.count()} 张图像")
+        library.close()
+
+def apply_upgraded_images(key_scenes, upgraded_scenes, images_dir="output/images"):
+    """用已生成的高质量图像替换草稿图像，返回被替换的场景数"""
+    upgraded_ids = set()
+    for i in upgraded_scenes:
+        scene = key_scenes[i]
+        os.replace(os.path.join(images_dir, "full", scene['image_file']), os.path.join(images_dir, scene['image_file']))
+        scene['draft'] = False
+        upgraded_ids.add(scene.get('scene_id', i + 1))
+    replaced = len(upgraded_scenes)
+    for scene in key_scenes:
+        if isinstance(scene, dict) and scene.get('draft') and scene.get('duplicate_of') in upgraded_ids:
+            rep = next((s for s in key_scenes if isinstance(s, dict) and s.get('scene_id') == scene['duplicate_of']), None)
+            if rep is None:
+                logger.warning(f"找不到场景 {scene.get('scene_id')} 的代表场景 {scene['duplicate_of']}，保留草稿图像")
+                continue
+            shutil.copyfile(os.path.join(images_dir, rep['image_file']), os.path.join(images_dir, scene['image_file']))
+            scene['draft'] = False
+            replaced += 1
+    return replaced
+
+def parse_output_resolutions(values) -> List[Tuple[int, int]]:
+    """解析输出分辨率列表，例如 ["1920x1080", "1080x1920"] 或 "1920x1080,1080x1920"
+
+    宽高会向下取偶数 (libx264/yuv420p 要求)，重复项只保留一个。
+    """
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = [values]
+    resolutions = []
+    for value in values:
+        for item in str(value).replace(",", " ").split():
+            try:
+                width, height = (int(part) for part in item.lower().split("x"))
+            except ValueError:
+                logger.warning(f"无法解析输出分辨率: {item}，应为 宽x高 格式，已忽略")
+                continue
+            resolution = (width // 2 * 2, height // 2 * 2)
+            if min(resolution) <= 0:
+                logger.warning(f"无效的输出分辨率: {item}，已忽略")
+            elif resolution not in resolutions:
+                resolutions.append(resolution)
+    return resolutions
+
+async def _scheduled_call(backend, story_id, priority, func, *args, **kwargs):
+    """经图像任务队列调度后，在线程中执行同步的生成函数"""
+    async with get_scheduler().job(backend, story_id, priority):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
 # 新增：异步并发生成图像的辅助函数
-async def generate_images_concurrently(key_scenes, image_generator_type, aspect_ratio, image_style, custom_style, comfyui_style, mj_concurrency):
-    logger.info(f"开始并发生成图像，并发数限制: {mj_concurrency}")
+async def generate_images_concurrently(key_scenes, image_generator_type, aspect_ratio, image_style, custom_style, comfyui_style, story_id="default", priority=1.0, mj_grid_harvest="off", library_min_score=0.0, draft=False):
+    scheduler = get_scheduler()
+    logger.info(f"开始并发生成图像 (故事: {story_id}, 优先级: {priority})，当前图像任务队列:\n{scheduler.format_queue_state()}")
     image_files = []
     processed_scenes = [] # 用于存储包含生成结果的场景信息
+
+    # 图像库: 先查找可复用的历史图像，只为未命中的场景调用生成器
+    all_scenes = key_scenes
+    library = None
+    library_style = library_style_key(image_generator_type, image_style, custom_style, comfyui_style)
+    if library_min_score > 0:
+        library = ImageLibrary()
+        key_scenes = []
+        for scene in all_scenes:
+            if isinstance(scene, dict) and scene.get('prompt'):
+                matches = library.find_similar(scene['prompt'], library_style, aspect_ratio, min_score=library_min_score)
+                if matches:
+                    target_image = os.path.join("output/images", scene.get('image_file', f"scene_{scene.get('scene_id', 0):03d}.png"))
+                    shutil.copyfile(matches[0]['image_path'], target_image)
+                    scene['image_file_generated'] = target_image
+                    scene['library_image'] = matches[0]['image_path']
+                    image_files.append(target_image)
+                    logger.info(f"场景 {scene.get('scene_id')} 复用图像库图像 (相似度 {matches[0]['score']:.2f}): {matches[0]['image_path']}")
+                    continue
+            key_scenes.append(scene)
+        logger.info(f"图像库命中 {len(all_scenes) - len(key_scenes)} 个场景，剩余 {len(key_scenes)} 个场景需要生成")
     
     # 根据类型选择生成器
     if image_generator_type.lower() == "comfyui":
-        generator = ComfyUIGenerator(style=comfyui_style)
-        logger.info(f"使用 ComfyUI 生成器, 风格: {comfyui_style}")
-        # TODO: ComfyUI 的并发逻辑可能不同，这里暂时保持原样或后续添加
-        # 目前 ComfyUI 部分的并发未实现
+        generator = ComfyUIGenerator(style=comfyui_style, draft=draft)
+        logger.info(f"使用 ComfyUI 生成器, 风格: {comfyui_style}{' (草稿质量)' if draft else ''}")
+        # ComfyUI 任务经统一队列调度，与其他故事公平分享 ComfyUI 容量
         for i, scene in enumerate(key_scenes):
             # ... (保留原有 ComfyUI 生成逻辑, 非并发) ...
             scene_prompt = scene['prompt'] if isinstance(scene, dict) and 'prompt' in scene else str(scene)
@@ -186,11 +375,12 @@ async def generate_images_concurrently(key_scenes, image_generator_type, aspect_
                  final_prompt += f", {image_style}"
             # ... (添加其他通用修饰词) ...
             
-            image_file = generator.generate_image(final_prompt, image_filename) # 同步调用
+            image_file = await _scheduled_call("comfyui", story_id, priority, generator.generate_image, final_prompt, image_filename)
             if image_file:
                 image_files.append(image_file)
                 if isinstance(scene, dict):
                     scene['image_file_generated'] = image_file # 更新场景信息
+                    scene['draft'] = draft
                     processed_scenes.append(scene)
                 logger.info(f"ComfyUI 场景 {i+1} 图像生成成功: {image_file}")
             else:
@@ -201,10 +391,9 @@ async def generate_images_concurrently(key_scenes, image_generator_type, aspect_
     elif image_generator_type.lower() == "midjourney":
         generator = MidjourneyGenerator()
         logger.info("使用 Midjourney 生成器")
-        semaphore = asyncio.Semaphore(mj_concurrency)
         
         async def generate_single_image_task(scene_index, scene_data):
-            async with semaphore:
+            async with scheduler.job("midjourney", story_id, priority):
                 logger.info(f"开始处理 Midjourney 场景 {scene_index + 1}")
                 original_prompt = scene_data['prompt'] if isinstance(scene_data, dict) and 'prompt' in scene_data else str(scene_data)
                 image_filename = scene_data['image_file'] if isinstance(scene_data, dict) and 'image_file' in scene_data else f"scene_{scene_index+1:03d}.png"
@@ -267,12 +456,50 @@ async def generate_images_concurrently(key_scenes, image_generator_type, aspect_
                     logger.info(f"Midjourney 场景 {scene_index + 1} 图像生成成功: {image_file}")
                     return {"index": scene_index, "scene_data": scene_data, "image_file": image_file, "success": True}
 
-        # 创建所有并发任务
-        tasks = [generate_single_image_task(i, scene) for i, scene in enumerate(key_scenes)]
-        
-        # 并发执行并收集结果
-        logger.info(f"准备并发执行 {len(tasks)} 个 Midjourney 图像生成任务...")
-        results = await asyncio.gather(*tasks)
+        async def generate_grid_group_task(group):
+            """一个四宫格覆盖一组相似场景，未能获取图像的场景回退到单场景生成"""
+            if len(group) == 1:
+                return [await generate_single_image_task(*group[0])]
+
+            first_index, first_scene = group[0]
+            grid_prompt = first_scene['prompt']
+            if custom_style:
+                grid_prompt += f", {custom_style}"
+            elif image_style:
+                grid_prompt += f", {image_style}"
+            image_filenames = [scene_data.get('image_file', f"scene_{scene_index+1:03d}.png") for scene_index, scene_data in group]
+
+            async with scheduler.job("midjourney", story_id, priority):
+                logger.info(f"开始处理 Midjourney 四宫格: 场景 {first_index + 1}-{group[-1][0] + 1} (模式: {mj_grid_harvest})")
+                grid_files = await generator.generate_grid_images_async(
+                    grid_prompt,
+                    image_filenames,
+                    aspect_ratio=aspect_ratio,
+                    harvest_mode=mj_grid_harvest
+                )
+
+            group_results = []
+            for (scene_index, scene_data), image_file in zip(group, grid_files):
+                if image_file:
+                    logger.info(f"Midjourney 场景 {scene_index + 1} 已从四宫格获取图像: {image_file}")
+                    group_results.append({"index": scene_index, "scene_data": scene_data, "image_file": image_file, "success": True})
+                else:
+                    logger.warning(f"Midjourney 场景 {scene_index + 1} 未能从四宫格获取图像，改为单独生成")
+                    group_results.append(await generate_single_image_task(scene_index, scene_data))
+            return group_results
+
+        if mj_grid_harvest in ("split", "upscale"):
+            groups = group_scenes_for_grid(key_scenes)
+            logger.info(f"四宫格收割模式: {len(key_scenes)} 个场景合并为 {len(groups)} 个 Midjourney 绘图任务")
+            group_results = await asyncio.gather(*[generate_grid_group_task(group) for group in groups])
+            results = [result for group_result in group_results for result in group_result]
+        else:
+            # 创建所有并发任务
+            tasks = [generate_single_image_task(i, scene) for i, scene in enumerate(key_scenes)]
+            
+            # 并发执行并收集结果
+            logger.info(f"准备并发执行 {len(tasks)} 个 Midjourney 图像生成任务...")
+            results = await asyncio.gather(*tasks)
         logger.info("所有 Midjourney 并发任务已完成处理。")
         
         # 按原始顺序处理结果
@@ -295,6 +522,15 @@ async def generate_images_concurrently(key_scenes, image_generator_type, aspect_
         logger.error(f"不支持的图像生成器类型: {image_generator_type}")
         processed_scenes = key_scenes # 返回原始场景
 
+    if library:
+        # 新生成的图像入库，供之后的故事复用 (草稿图像不入库)
+        for scene in key_scenes:
+            if isinstance(scene, dict) and scene.get('image_file_generated') and not scene.get('draft'):
+                library.add_image(scene['image_file_generated'], scene.get('prompt', ''), library_style, aspect_ratio)
+        logger.info(f"图像库当前共有 {library.count()} 张图像")
+        library.close()
+        processed_scenes = [s for s in all_scenes if isinstance(s, dict)]
+
     logger.info(f"图像生成完成，共成功生成 {len(image_files)} 个图像")
     return processed_scenes # 返回处理后的场景列表（可能包含生成的图片路径）
 
@@ -312,7 +548,16 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
                     max_scene_duration: float = 5.0, analysis_theme: str = "default_detailed_visual",
                     use_fade_transitions: bool = True,
                     apply_light_effect: bool = False, # New parameter
-                    effect_video_dir: Optional[str] = None): # New parameter
+                    effect_video_dir: Optional[str] = None, # New parameter
+                    mj_grid_harvest: str = "off",
+                    scene_dedup_threshold: float = 0.0,
+                    image_library_min_score: float = 0.0,
+                    draft_preview: bool = False,
+                    priority: float = 1.0,
+                    video_profile: Optional[str] = None,
+                    subtitle_mode: str = "burn",
+                    progressive_output: Optional[str] = None,
+                    output_resolutions: Optional[List[str]] = None):
     overall_start_time = time.time() # 总流程开始时间
     logger.info(f"=== 开始处理故事: {Path(input_file).name} (主题: {analysis_theme}) ===")
     # 检查输入文件是否存在
@@ -327,6 +572,12 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
     # 先清理旧数据
     clean_output_directories()
     
+    # 所有视频编码步骤共用同一个编码配置
+    if video_profile:
+        set_active_profile(video_profile)
+    if progressive_output:
+        set_progressive_mode(progressive_output)
+    
     print("=== 开始处理故事 ===")
     print(f"输入文件: {full_input_path}")
     print(f"图像生成器: {image_generator_type}")
@@ -346,6 +597,9 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
     for dir_name in ["output", "output/audio", "output/images", "output/texts", "output/videos"]:
         Path(dir_name).mkdir(parents=True, exist_ok=True)
     
+    # Midjourney 并发数作为图像任务队列中该后端的并发上限
+    get_scheduler().set_limit("midjourney", mj_concurrency)
+    
     try:
         step_start_time = time.time()
         # 1. 文本处理
@@ -445,17 +699,33 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
         else:
             # 调用新的并发图像生成函数
             try:
+                # 近似重复的场景只生成一次图像，之后复制给重复场景
+                duplicates = find_duplicate_scenes(key_scenes, scene_dedup_threshold) if scene_dedup_threshold > 0 else {}
+                if duplicates:
+                    logger.info(f"检测到 {len(duplicates)} 个提示词近似重复的场景 (阈值: {scene_dedup_threshold})，将复用代表场景的图像")
+                scenes_to_generate = [scene for i, scene in enumerate(key_scenes) if i not in duplicates]
+
                 logger.info("调用并发图像生成函数...")
                 # 注意：这里使用了 asyncio.run() 来执行异步函数
-                key_scenes = asyncio.run(generate_images_concurrently(
-                    key_scenes,
+                generated_scenes = asyncio.run(generate_images_concurrently(
+                    scenes_to_generate,
                     image_generator_type,
                     aspect_ratio,
                     image_style,
                     custom_style,
                     comfyui_style,
-                    mj_concurrency
+                    Path(full_input_path).stem,
+                    priority,
+                    mj_grid_harvest,
+                    image_library_min_score,
+                    draft_preview
                 ))
+                if duplicates:
+                    # 场景字典在生成过程中被原地更新，这里只需补全重复场景
+                    reused = reuse_duplicate_scene_images(key_scenes, duplicates)
+                    logger.info(f"已为 {reused} 个重复场景复用图像")
+                else:
+                    key_scenes = generated_scenes
                 logger.info("并发图像生成函数执行完毕。")
                 # 重新提取成功生成的图片文件列表（如果需要的话）
                 image_files = [s['image_file_generated'] for s in key_scenes if isinstance(s, dict) and s.get('image_file_generated')]
@@ -470,6 +740,22 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
         with open("output/key_scenes.json", "w", encoding="utf-8") as f:
             json.dump(key_scenes, f, ensure_ascii=False, indent=2)
         logger.info("场景信息已更新并保存")
+
+        # 草稿预览模式: 先用草稿图像合成视频，同时在后台生成高质量图像
+        upgrade_thread = None
+        upgraded_scenes = []
+        draft_scenes = [s for s in key_scenes if isinstance(s, dict) and s.get('draft')]
+        if draft_scenes:
+            logger.info(f"草稿预览模式: 后台开始为 {len(draft_scenes)} 个场景生成高质量图像")
+            upgrade_thread = threading.Thread(
+                target=upgrade_draft_images,
+                args=(key_scenes, image_style, custom_style, comfyui_style, upgraded_scenes, Path(full_input_path).stem, priority,
+                      aspect_ratio, image_library_min_score),
+                daemon=True
+            )
+            upgrade_thread.start()
+        elif draft_preview and image_generator_type.lower() != "comfyui":
+            logger.warning("草稿预览模式仅支持 ComfyUI，已忽略")
         
         step_start_time = time.time()
         # 5. 生成字幕
@@ -481,113 +767,25 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
         
         # 6. 创建视频
         logger.info("\n6. 创建视频...")
-        base_video_start_time = time.time()
-        base_video = "output/base_video.mp4"
+        audio_track_start_time = time.time()
+        audio_track = "output/audio/audio_track.m4a"
         final_video_temp_product = "output/final_video_temp.mp4" # 使用临时名称以防覆盖
         
-        # 使用新的VideoProcessor统一处理
-        video_processor = VideoProcessor(engine=video_engine, effect_video_dir=effect_video_dir)
+        # 多画幅输出: 场景视频在覆盖所有画幅的画布上只渲染一次，再由一个 split 滤镜图裁剪出各个版本
+        output_variants = parse_output_resolutions(output_resolutions)
+        render_resolution = None
+        if len(output_variants) > 1:
+            render_resolution = (max(w for w, _ in output_variants), max(h for _, h in output_variants))
+            logger.info(f"多画幅输出: {', '.join(f'{w}x{h}' for w, h in output_variants)}，画布分辨率 {render_resolution[0]}x{render_resolution[1]}")
+        elif output_variants:
+            render_resolution = output_variants[0]
+        # 使用新的VideoProcessor统一处理，输出分辨率只属于这个处理器，不修改全局配置
+        video_processor = VideoProcessor(engine=video_engine, effect_video_dir=effect_video_dir, resolution=render_resolution)
         print(f"使用 {video_processor.engine.upper()} 引擎处理视频")
         
-        # 创建基础视频
-        video_processor.create_base_video(audio_info_file, base_video)
-        logger.info(f"基础视频创建完成，耗时: {time.time() - base_video_start_time:.2f} 秒")
-        
-        scene_video_start_time = time.time()
-        # 创建场景视频
-        video_processor.create_video_with_scenes("output/key_scenes.json", base_video, final_video_temp_product, use_fade_transitions=use_fade_transitions)
-        logger.info(f"场景视频创建完成，耗时: {time.time() - scene_video_start_time:.2f} 秒")
-        
-        current_video_for_processing = final_video_temp_product # 当前待处理的视频文件
-        
-        # 如果提供了角色图片，添加角色图片
-        if character_image and character_image != "不使用角色图片" and character_image != "没有找到图片文件。请在input_images目录添加图片。":
-            char_img_start_time = time.time()
-            logger.info("\n6.1 添加角色图片...")
-            logger.info(f"角色图片路径: {character_image}")
-            
-            # 将角色图片转换为完整路径
-            character_image_path = get_full_path(character_image, "input_images")
-            
-            # 检查图片是否存在
-            if not os.path.exists(character_image_path):
-                print(f"警告: 指定的角色图片不存在: {character_image_path}")
-                # 尝试查找可能的图片位置
-                possible_locations = [
-                    os.path.join("output", os.path.basename(character_image)),
-                    os.path.join("input_images", os.path.basename(character_image))
-                ]
-                for loc in possible_locations:
-                    if os.path.exists(loc):
-                        print(f"找到可能的替代图片: {loc}")
-                        character_image_path = loc
-                        break
-                else:
-                    print("无法找到替代图片，跳过角色图片添加")
-                    character_image_path = None
-            
-            if character_image_path:
-                # 判断是否使用会说话的角色
-                if talking_character and closed_mouth_image and open_mouth_image and closed_mouth_image != "不使用角色图片" and open_mouth_image != "不使用角色图片":
-                    try:
-                        print("使用会说话的角色效果...")
-                        
-                        # 准备闭嘴和张嘴图片路径
-                        closed_mouth_path = get_full_path(closed_mouth_image, "input_images")
-                        open_mouth_path = get_full_path(open_mouth_image, "input_images")
-                        
-                        # 检查图片是否存在
-                        if not os.path.exists(closed_mouth_path) or not os.path.exists(open_mouth_path):
-                            print(f"警告: 闭嘴或张嘴图片不存在，将使用普通角色图片")
-                            # 使用普通角色图片模式
-                            from add_character_image import add_character_image_to_video
-                            success = add_character_image_to_video(final_video_temp_product, character_image_path, current_video_for_processing)
-                        else:
-                            # 导入会说话角色模块
-                            from add_talking_character import create_talking_character_video
-                            
-                            # 添加会说话的角色
-                            success = create_talking_character_video(
-                                final_video_temp_product, 
-                                closed_mouth_path, 
-                                open_mouth_path, 
-                                current_video_for_processing,
-                                threshold=audio_sensitivity
-                            )
-                        
-                        if success:
-                            print(f"成功添加会说话的角色图片到视频")
-                            # 使用带有角色图片的视频作为最终视频
-                            current_video_for_processing = final_video_temp_product
-                        else:
-                            print(f"添加会说话的角色图片失败，将使用上一阶段视频继续处理")
-                    except Exception as e:
-                        print(f"添加会说话的角色过程中出错: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        logger.warning("添加角色图片过程中出错，将使用上一阶段视频继续处理") # 更明确的日志
-                else:
-                    try:
-                        # 使用普通角色图片
-                        from add_character_image import add_character_image_to_video
-                        success = add_character_image_to_video(final_video_temp_product, character_image_path, current_video_for_processing)
-                        if success:
-                            print(f"成功添加角色图片到视频")
-                            current_video_for_processing = final_video_temp_product
-                        else:
-                            print(f"添加角色图片失败，将使用上一阶段视频继续处理")
-                    except Exception as e:
-                        print(f"添加角色图片过程中出错: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        logger.warning("添加角色图片过程中出错，将使用上一阶段视频继续处理") # 更明确的日志
-                if character_image_path: # 只有在尝试了添加图片后才记录时间
-                    logger.info(f"角色图片处理完成，耗时: {time.time() - char_img_start_time:.2f} 秒")
-        
-        # 7. 添加字幕到最终视频
-        logger.info("\n7. 添加最终字幕到视频...")
-        final_subtitled_video_path = f"output/{Path(full_input_path).stem}.mp4"
-        sub_add_start_time = time.time()
+        # 合并语音并一次性编码为AAC音轨，后续步骤全部流复制
+        video_processor.create_audio_track(audio_info_file, audio_track)
+        logger.info(f"音轨创建完成，耗时: {time.time() - audio_track_start_time:.2f} 秒")
         
         subtitle_params = {}
         if font_name:
@@ -600,59 +798,227 @@ def process_story(input_file: str, image_generator_type: str = "comfyui", aspect
             subtitle_params["bg_opacity"] = bg_opacity
         if subtitle_vertical_offset != 0:
             subtitle_params["subtitle_vertical_offset"] = subtitle_vertical_offset
+        subtitle_params["subtitle_mode"] = subtitle_mode
+        
+        def compose_variants(scene_video):
+            """由画布场景视频一次性输出所有画幅版本 (角色图片、字幕)，返回第一个版本的路径"""
+            variant_start_time = time.time()
+            if apply_light_effect:
+                # 特效在画布上叠加一次，各版本裁剪时一并保留
+                effect_canvas_path = f"output/{Path(full_input_path).stem}_effect_canvas.mp4"
+                try:
+                    effect_result_path = video_processor.apply_effect_overlay(scene_video, effect_canvas_path)
+                    if Path(effect_result_path).resolve() == Path(effect_canvas_path).resolve() and Path(effect_canvas_path).exists():
+                        scene_video = effect_canvas_path
+                    else:
+                        logger.warning("灯光特效未应用或失败，多画幅版本不含特效")
+                except Exception as e_effect:
+                    logger.error(f"应用灯光特效过程中发生错误: {e_effect}，多画幅版本不含特效")
+        
+            character_image_path = None
+            if character_image and character_image != "不使用角色图片" and character_image != "没有找到图片文件。请在input_images目录添加图片。":
+                character_image_path = get_full_path(character_image, "input_images")
+                if not os.path.exists(character_image_path):
+                    logger.warning(f"指定的角色图片不存在: {character_image_path}，多画幅版本不添加角色图片")
+                    character_image_path = None
+                elif talking_character:
+                    # 通过标记行告知 WebUI，在最终状态中提示用户
+                    logger.warning("PROCESS_NOTICE_MARKER: 多画幅输出暂不支持会说话的角色，各画幅版本已改用静态角色图片")
         
-        from add_subtitles import add_subtitles
-        add_subtitles(current_video_for_processing, srt_file, final_subtitled_video_path, **subtitle_params)
-        logger.info(f"带字幕视频已生成: {final_subtitled_video_path}，添加字幕耗时: {time.time() - sub_add_start_time:.2f} 秒")
+            stem = Path(full_input_path).stem
+            output_files = [f"output/{stem}_{w}x{h}.mp4" for w, h in output_variants]
+            burn_subtitles = subtitle_mode == "burn"
+            video_processor.render_aspect_variants(
+                scene_video, output_variants, output_files,
+                srt_file=srt_file if burn_subtitles else None,
+                subtitle_params=subtitle_params,
+                character_image=character_image_path
+            )
+            if not burn_subtitles:
+                # 软字幕/外挂字幕与画幅无关，逐个版本封装 (流复制)
+                from add_subtitles import add_subtitles
+                for output_file in output_files:
+                    variant_temp = output_file.replace(".mp4", "_nosub.mp4")
+                    os.replace(output_file, variant_temp)
+                    add_subtitles(variant_temp, srt_file, output_file, **subtitle_params)
+                    os.remove(variant_temp)
+            for output_file in output_files:
+                logger.info(f"画幅版本已生成: {output_file}")
+            logger.info(f"多画幅输出完成，耗时: {time.time() - variant_start_time:.2f} 秒")
+            return output_files[0]
         
-        # 8. (新步骤) 应用视频特效叠加
-        video_to_return = final_subtitled_video_path # Default to subtitled video
+        def compose_video():
+            """由场景图像合成最终视频 (场景、角色、字幕、特效)，返回最终视频路径"""
+            scene_video_start_time = time.time()
+            # 创建场景视频
+            video_processor.create_video_with_scenes("output/key_scenes.json", audio_track, final_video_temp_product, use_fade_transitions=use_fade_transitions)
+            logger.info(f"场景视频创建完成，耗时: {time.time() - scene_video_start_time:.2f} 秒")
+            if len(output_variants) > 1:
+                return compose_variants(final_video_temp_product)
+        
+            current_video_for_processing = final_video_temp_product # 当前待处理的视频文件
+        
+            # 如果提供了角色图片，添加角色图片
+            if character_image and character_image != "不使用角色图片" and character_image != "没有找到图片文件。请在input_images目录添加图片。":
+                char_img_start_time = time.time()
+                logger.info("\n6.1 添加角色图片...")
+                logger.info(f"角色图片路径: {character_image}")
+            
+                # 将角色图片转换为完整路径
+                character_image_path = get_full_path(character_image, "input_images")
+            
+                # 检查图片是否存在
+                if not os.path.exists(character_image_path):
+                    print(f"警告: 指定的角色图片不存在: {character_image_path}")
+                    # 尝试查找可能的图片位置
+                    possible_locations = [
+                        os.path.join("output", os.path.basename(character_image)),
+                        os.path.join("input_images", os.path.basename(character_image))
+                    ]
+                    for loc in possible_locations:
+                        if os.path.exists(loc):
+                            print(f"找到可能的替代图片: {loc}")
+                            character_image_path = loc
+                            break
+                    else:
+                        print("无法找到替代图片，跳过角色图片添加")
+                        character_image_path = None
+            
+                if character_image_path:
+                    # 判断是否使用会说话的角色
+                    if talking_character and closed_mouth_image and open_mouth_image and closed_mouth_image != "不使用角色图片" and open_mouth_image != "不使用角色图片":
+                        try:
+                            print("使用会说话的角色效果...")
+                        
+                            # 准备闭嘴和张嘴图片路径
+                            closed_mouth_path = get_full_path(closed_mouth_image, "input_images")
+                            open_mouth_path = get_full_path(open_mouth_image, "input_images")
+                        
+                            # 检查图片是否存在
+                            if not os.path.exists(closed_mouth_path) or not os.path.exists(open_mouth_path):
+                                print(f"警告: 闭嘴或张嘴图片不存在，将使用普通角色图片")
+                                # 使用普通角色图片模式
+                                from add_character_image import add_character_image_to_video
+                                success = add_character_image_to_video(final_video_temp_product, character_image_path, current_video_for_processing)
+                            else:
+                                # 导入会说话角色模块
+                                from add_talking_character import create_talking_character_video
+                            
+                                # 添加会说话的角色
+                                success = create_talking_character_video(
+                                    final_video_temp_product, 
+                                    closed_mouth_path, 
+                                    open_mouth_path, 
+                                    current_video_for_processing,
+                                    threshold=audio_sensitivity,
+                                    audio_info_file=audio_info_file
+                                )
+                        
+                            if success:
+                                print(f"成功添加会说话的角色图片到视频")
+                                # 使用带有角色图片的视频作为最终视频
+                                current_video_for_processing = final_video_temp_product
+                            else:
+                                print(f"添加会说话的角色图片失败，将使用上一阶段视频继续处理")
+                        except Exception as e:
+                            print(f"添加会说话的角色过程中出错: {e}")
+                            import traceback
+                            traceback.print_exc()
+                            logger.warning("添加角色图片过程中出错，将使用上一阶段视频继续处理") # 更明确的日志
+                    else:
+                        try:
+                            # 使用普通角色图片
+                            from add_character_image import add_character_image_to_video
+                            success = add_character_image_to_video(final_video_temp_product, character_image_path, current_video_for_processing)
+                            if success:
+                                print(f"成功添加角色图片到视频")
+                                current_video_for_processing = final_video_temp_product
+                            else:
+                                print(f"添加角色图片失败，将使用上一阶段视频继续处理")
+                        except Exception as e:
+                            print(f"添加角色图片过程中出错: {e}")
+                            import traceback
+                            traceback.print_exc()
+                            logger.warning("添加角色图片过程中出错，将使用上一阶段视频继续处理") # 更明确的日志
+                    if character_image_path: # 只有在尝试了添加图片后才记录时间
+                        logger.info(f"角色图片处理完成，耗时: {time.time() - char_img_start_time:.2f} 秒")
+        
+            # 7. 添加字幕到最终视频
+            logger.info("\n7. 添加最终字幕到视频...")
+            final_subtitled_video_path = f"output/{Path(full_input_path).stem}.mp4"
+            sub_add_start_time = time.time()
+        
+            from add_subtitles import add_subtitles
+            add_subtitles(current_video_for_processing, srt_file, final_subtitled_video_path, **subtitle_params)
+            logger.info(f"带字幕视频已生成: {final_subtitled_video_path}，添加字幕耗时: {time.time() - sub_add_start_time:.2f} 秒")
+        
+            # 8. (新步骤) 应用视频特效叠加
+            video_to_return = final_subtitled_video_path # Default to subtitled video
 
-        if apply_light_effect:
-            effect_step_start_time = time.time()
-            logger.info("\n8. 应用灯光特效叠加...")
+            if apply_light_effect:
+                effect_step_start_time = time.time()
+                logger.info("\n8. 应用灯光特效叠加...")
             
-            # Define a temporary path for the effect output
-            temp_effect_output_video_path = f"output/{Path(full_input_path).stem}_effect_temp.mp4"
+                # Define a temporary path for the effect output
+                temp_effect_output_video_path = f"output/{Path(full_input_path).stem}_effect_temp.mp4"
             
-            try:
-                # Attempt to apply effect to the subtitled video, outputting to temp path
-                effect_result_path = video_processor.apply_effect_overlay(
-                    final_subtitled_video_path,    # Input is the subtitled video (e.g., name.mp4)
-                    temp_effect_output_video_path  # Output is a temporary file
-                )
+                try:
+                    # Attempt to apply effect to the subtitled video, outputting to temp path
+                    effect_result_path = video_processor.apply_effect_overlay(
+                        final_subtitled_video_path,    # Input is the subtitled video (e.g., name.mp4)
+                        temp_effect_output_video_path  # Output is a temporary file
+                    )
                 
-                # Check if the effect was successfully applied (i.e., output path is the temp path)
-                if Path(effect_result_path).resolve() == Path(temp_effect_output_video_path).resolve() and Path(temp_effect_output_video_path).exists() and Path(temp_effect_output_video_path).stat().st_size > 0:
-                    logger.info(f"灯光特效叠加到临时文件成功: {temp_effect_output_video_path}")
-                    # Move/rename the successfully effected video to the final desired path, overwriting the original subtitled-only video.
-                    try:
-                        shutil.move(str(temp_effect_output_video_path), str(final_subtitled_video_path))
-                        video_to_return = final_subtitled_video_path # Update the path to return
-                        logger.info(f"已将特效视频重命名为最终路径: {video_to_return}")
-                    except Exception as move_err:
-                        logger.error(f"重命名特效视频 {temp_effect_output_video_path} 到 {final_subtitled_video_path} 失败: {move_err}. 保留临时特效文件。")
-                        video_to_return = temp_effect_output_video_path # Return temp if move fails but effect was good
-                else:
-                    logger.warning(f"灯光特效未应用或失败。apply_effect_overlay 返回: {effect_result_path}. 使用原始带字幕视频。")
-                    # Ensure temp file is cleaned up if it exists and is possibly bad/empty
+                    # Check if the effect was successfully applied (i.e., output path is the temp path)
+                    if Path(effect_result_path).resolve() == Path(temp_effect_output_video_path).resolve() and Path(temp_effect_output_video_path).exists() and Path(temp_effect_output_video_path).stat().st_size > 0:
+                        logger.info(f"灯光特效叠加到临时文件成功: {temp_effect_output_video_path}")
+                        # Move/rename the successfully effected video to the final desired path, overwriting the original subtitled-only video.
+                        try:
+                            shutil.move(str(temp_effect_output_video_path), str(final_subtitled_video_path))
+                            video_to_return = final_subtitled_video_path # Update the path to return
+                            logger.info(f"已将特效视频重命名为最终路径: {video_to_return}")
+                        except Exception as move_err:
+                            logger.error(f"重命名特效视频 {temp_effect_output_video_path} 到 {final_subtitled_video_path} 失败: {move_err}. 保留临时特效文件。")
+                            video_to_return = temp_effect_output_video_path # Return temp if move fails but effect was good
+                    else:
+                        logger.warning(f"灯光特效未应用或失败。apply_effect_overlay 返回: {effect_result_path}. 使用原始带字幕视频。")
+                        # Ensure temp file is cleaned up if it exists and is possibly bad/empty
+                        if Path(temp_effect_output_video_path).exists():
+                            try:
+                                os.remove(temp_effect_output_video_path)
+                                logger.info(f"已清理空的/损坏的临时特效文件: {temp_effect_output_video_path}")
+                            except OSError as e_remove:
+                                logger.warning(f"无法清理临时特效文件 {temp_effect_output_video_path}: {e_remove}")
+                    logger.info(f"特效处理耗时: {time.time() - effect_step_start_time:.2f} 秒")
+
+                except Exception as e_effect:
+                    logger.error(f"应用灯光特效过程中发生严重错误: {e_effect}")
+                    logger.warning(f"将使用原始带字幕视频。")
+                    # Cleanup temp file if it exists
                     if Path(temp_effect_output_video_path).exists():
                         try:
                             os.remove(temp_effect_output_video_path)
-                            logger.info(f"已清理空的/损坏的临时特效文件: {temp_effect_output_video_path}")
-                        except OSError as e_remove:
-                            logger.warning(f"无法清理临时特效文件 {temp_effect_output_video_path}: {e_remove}")
-                logger.info(f"特效处理耗时: {time.time() - effect_step_start_time:.2f} 秒")
-
-            except Exception as e_effect:
-                logger.error(f"应用灯光特效过程中发生严重错误: {e_effect}")
-                logger.warning(f"将使用原始带字幕视频。")
-                # Cleanup temp file if it exists
-                if Path(temp_effect_output_video_path).exists():
-                    try:
-                        os.remove(temp_effect_output_video_path)
-                    except OSError:
-                        pass # Ignore if removal fails
+                        except OSError:
+                            pass # Ignore if removal fails
+            return video_to_return
+
+        video_to_return = compose_video()
+
+        if upgrade_thread:
+            # 草稿视频已可观看，复制一份以免被高质量版本覆盖
+            draft_video_path = f"output/{Path(full_input_path).stem}_draft.mp4"
+            shutil.copyfile(video_to_return, draft_video_path)
+            logger.info(f"DRAFT_VIDEO_PATH_MARKER: {draft_video_path}")
+            logger.info("草稿视频已生成，等待后台高质量图像生成完成...")
+            upgrade_thread.join()
+            upgraded_count = apply_upgraded_images(key_scenes, upgraded_scenes)
+            if upgraded_count:
+                with open("output/key_scenes.json", "w", encoding="utf-8") as f:
+                    json.dump(key_scenes, f, ensure_ascii=False, indent=2)
+                logger.info(f"已升级 {upgraded_count} 个场景的图像，重新合成视频 (未变化的场景片段将被复用)...")
+                video_to_return = compose_video()
+            else:
+                logger.warning("没有场景成功升级为高质量图像，保留草稿视频")
         
         overall_end_time = time.time()
         total_duration_seconds = overall_end_time - overall_start_time
@@ -707,8 +1073,26 @@ if __name__ == "__main__":
     # 添加语速参数
     parser.add_argument("--speed_scale", type=float, default=1.0, help="设置语音合成的语速 (例如 0.5 到 2.0)")
     # 添加 MJ 并发数参数
-    parser.add_argument("--mj_concurrency", type=int, default=3, choices=[3, 10], help="设置 Midjourney 任务并发数 (默认 3)")
+    parser.add_argument("--mj_concurrency", type=int, default=3, choices=[3, 10], help="设置图像任务队列中 Midjourney 后端的并发上限 (默认 3)")
+    parser.add_argument("--priority", type=float, default=1.0,
+                        help="本故事在图像任务队列中的优先级权重，多个故事同时生成时按权重公平分享图像后端 (默认 1.0)")
+    parser.add_argument("--mj_grid_harvest", choices=["off", "split", "upscale"], default="off",
+                        help="Midjourney 四宫格收割模式: off (默认，每个场景一个任务), split (本地切分四宫格) 或 upscale (并行放大四格)")
+    parser.add_argument("--scene_dedup_threshold", type=float, default=0.0,
+                        help="场景提示词去重阈值 (0-1，词集合相似度)，达到阈值的近似重复场景复用同一张图像 (默认 0，不去重)")
+    parser.add_argument("--draft_preview", action="store_true",
+                        help="草稿预览模式 (仅ComfyUI): 先用低步数低分辨率图像快速生成视频，再在后台升级为高质量图像并重新合成")
+    parser.add_argument("--image_library_min_score", type=float, default=0.0,
+                        help="图像库复用的最低相似度 (0-1)，命中的场景直接复用历史图像，新图像自动入库 (默认 0，不使用图像库)")
+    parser.add_argument("--video_profile", choices=get_profile_names(), default=None,
+                        help="视频编码配置: draft (最快), fast, standard (libx264 默认参数) 或 final (最高画质，最慢)，默认使用 config 中的 video.encoding_profile")
+    parser.add_argument("--subtitle_mode", choices=SUBTITLE_MODES, default="burn",
+                        help="字幕输出方式: burn (默认，烧录进画面), soft (封装为字幕轨，不重新编码) 或 sidecar (外挂 .srt 文件)")
+    parser.add_argument("--progressive_output", choices=PROGRESSIVE_MODES, default=None,
+                        help="边渲染边观看: off, fmp4 (分片MP4，写入中即可播放) 或 hls (另外输出HLS播放列表)，默认使用 config 中的 video.progressive_output")
     # 添加会说话角色参数
+    parser.add_argument("--output_resolutions", nargs="+", default=None,
+                        help="一次输出多个画幅版本，例如 1920x1080 1080x1920 (或用逗号分隔)，图像、语音和场景视频只生成一次")
     parser.add_argument("--talking_character", action="store_true", help="启用会说话的角色效果")
     parser.add_argument("--closed_mouth_image", help="设置闭嘴图片路径")
     parser.add_argument("--open_mouth_image", help="设置张嘴图片路径")
@@ -727,8 +1111,8 @@ if __name__ == "__main__":
         default="default_detailed_visual",  # 设置一个默认主题
         help="故事分析和场景生成时使用的主题 (例如: default_detailed_visual, news_report_style)"
     )
-    # 新增: 控制MoviePy淡入淡出效果的开关
-    parser.add_argument("--no_fade_transitions", action="store_false", dest="use_fade_transitions", default=True, help="如果设置，禁用MoviePy场景切换时的淡入淡出效果")
+    # 新增: 控制场景切换淡入淡出效果的开关 (MoviePy和FFmpeg引擎)
+    parser.add_argument("--no_fade_transitions", action="store_false", dest="use_fade_transitions", default=True, help="如果设置，禁用场景切换时的淡入淡出效果")
     
     # 新增: 控制视频特效叠加的参数
     parser.add_argument("--apply_light_effect", action="store_true", help="如果设置，在最终视频上叠加灯光特效")
@@ -761,9 +1145,18 @@ if __name__ == "__main__":
     print(f"  音频灵敏度: {args.audio_sensitivity}")
     print(f"  字幕垂直偏移量: {args.subtitle_vertical_offset}")
     print(f"  场景最大时长: {args.max_scene_duration}")
-    print(f"  MoviePy淡入淡出: {args.use_fade_transitions}")
+    print(f"  场景淡入淡出: {args.use_fade_transitions}")
     print(f"  应用灯光特效: {args.apply_light_effect}")
     print(f"  特效视频目录: {args.effect_video_dir}")
+    print(f"  MJ四宫格收割: {args.mj_grid_harvest}")
+    print(f"  场景去重阈值: {args.scene_dedup_threshold}")
+    print(f"  图像库复用阈值: {args.image_library_min_score}")
+    print(f"  草稿预览模式: {args.draft_preview}")
+    print(f"  队列优先级: {args.priority}")
+    print(f"  视频编码配置: {args.video_profile or '默认'}")
+    print(f"  字幕输出方式: {args.subtitle_mode}")
+    print(f"  渐进输出方式: {args.progressive_output or '默认'}")
+    print(f"  输出分辨率: {' '.join(args.output_resolutions) if args.output_resolutions else '默认'}")
 
     # 设置图像生成器 (优先使用--image_generator)
     image_generator = args.image_generator
@@ -824,7 +1217,16 @@ if __name__ == "__main__":
         args.analysis_theme,
         args.use_fade_transitions,
         args.apply_light_effect,
-        args.effect_video_dir
+        args.effect_video_dir,
+        args.mj_grid_harvest,
+        args.scene_dedup_threshold,
+        args.image_library_min_score,
+        args.draft_preview,
+        args.priority,
+        args.video_profile,
+        args.subtitle_mode,
+        args.progressive_output,
+        args.output_resolutions
     ) 
     
     if result is None or isinstance(result, str) and result.startswith("错误:"):
@@ -14,10 +14,14 @@ from typing import Dict, Any, Optional, List, Union
 # 设置日志
 logger = logging.getLogger("image_generator")
 
+# 草稿模式: 采样步数和潜空间分辨率缩放比例
+DRAFT_STEPS = 8
+DRAFT_SCALE = 0.5
+
 class ComfyUIGenerator:
     """ComfyUI图像生成器，用于通过ComfyUI API生成图片"""
     
-    def __init__(self, host: str = "127.0.0.1", port: str = "8188", style: Optional[str] = None):
+    def __init__(self, host: str = "127.0.0.1", port: str = "8188", style: Optional[str] = None, draft: bool = False):
         """
         初始化ComfyUI图像生成器
         
@@ -25,6 +29,7 @@ class ComfyUIGenerator:
             host: ComfyUI服务器主机名
             port: ComfyUI服务器端口
             style: 图像生成风格
+            draft: 是否使用草稿工作流 (低步数、低分辨率，用于快速预览)
         """
         self.server_address = f"{host}:{port}"
         self.client_id = str(uuid.uuid4())
@@ -50,7 +55,10 @@ class ComfyUIGenerator:
         logger.info(f"使用风格: {self.style} (Lora: {self.lora_name})")
         
         # 加载工作流配置
+        self.draft = draft
         self.workflow = self._load_workflow()
+        if self.draft:
+            self.workflow = self._make_draft_workflow(self.workflow)
 
     def _load_workflow(self) -> Dict[str, Any]:
         """
@@ -86,6 +94,28 @@ class ComfyUIGenerator:
             logger.exception(error_msg)
             raise
 
+    def _make_draft_workflow(self, workflow: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        由完整工作流派生草稿工作流：降低采样步数和潜空间分辨率
+        
+        Args:
+            workflow: 完整质量的工作流配置
+            
+        Returns:
+            Dict: 草稿工作流配置
+        """
+        draft_workflow = json.loads(json.dumps(workflow))
+        for node_id, node in draft_workflow.items():
+            inputs = node.get("inputs", {})
+            if node.get("class_type") == "KSampler" and "steps" in inputs:
+                inputs["steps"] = min(inputs["steps"], DRAFT_STEPS)
+            elif node.get("class_type") == "EmptyLatentImage":
+                # 潜空间尺寸需为64的倍数
+                inputs["width"] = max(64, int(inputs["width"] * DRAFT_SCALE) // 64 * 64)
+                inputs["height"] = max(64, int(inputs["height"] * DRAFT_SCALE) // 64 * 64)
+        logger.info(f"使用草稿工作流: 采样步数 <= {DRAFT_STEPS}, 分辨率缩放 {DRAFT_SCALE}")
+        return draft_workflow
+
     def set_style(self, style: str) -> bool:
         """
         设置图像生成风格
@@ -493,20 +523,21 @@ class ComfyUIGenerator:
             
             return generated_images
 
-    def generate_image(self, prompt: str, output_filename: str) -> Optional[str]:
+    def generate_image(self, prompt: str, output_filename: str, overwrite: bool = False) -> Optional[str]:
         """
         生成单个图像
         
         Args:
             prompt: 图像提示词
-            output_filename: 输出文件名
+            output_filename: 输出文件名 (相对于输出目录)
+            overwrite: 为True时即使图片已存在也重新生成
             
         Returns:
             Optional[str]: 生成的图像文件路径，如果失败则返回None
         """
         # 准备输出文件路径
         output_file = self.output_dir / output_filename
-        if output_file.exists():
+        if output_file.exists() and not overwrite:
             print(f"图片已存在: {output_file}")
             logger.info(f"图片已存在，跳过生成: {output_file}")
             return str(output_file)
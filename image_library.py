@@ -0,0 +1,204 @@
+"""图像库模块
+
+将生成过的场景图像连同提示词、风格、宽高比和分辨率保存到磁盘，
+并基于提示词词项建立倒排索引，供后续故事按相似度复用已有图像。
+"""
+import os
+import re
+import math
+import shutil
+import sqlite3
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from PIL import Image
+
+from config import config
+from errors import get_logger
+
+logger = get_logger("image_library")
+
+# 这些通用修饰词几乎出现在每个提示词中，不参与相似度计算
+_STOP_TERMS = {
+    "a", "an", "the", "of", "and", "in", "on", "with", "at", "to",
+    "high", "quality", "detailed", "masterpiece", "best"
+}
+
+
+def tokenize_prompt(prompt: str) -> set:
+    """将提示词拆分为小写词项集合"""
+    terms = re.split(r"[\s,，、.。;；:：()（）]+", str(prompt).lower())
+    return {term for term in terms if term and term not in _STOP_TERMS}
+
+
+class ImageLibrary:
+    """基于 SQLite 倒排索引的图像库
+
+    entries 表保存每张图像的元数据，terms 表为按 (风格, 宽高比) 划分的 (词项, 图像ID) 倒排表，
+    term_stats 表记录每个范围内各词项的文档频率。查询时按前缀过滤只用最少见的几个词项
+    取候选图像 (常见的风格词不会扫描整张表)，再只对候选图像计算相似度。
+    """
+
+    def __init__(self, library_dir: Optional[str] = None):
+        self.library_dir = Path(library_dir or config.get("paths", "image_library", default="image_library"))
+        self.images_dir = self.library_dir / "images"
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.library_dir / "index.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    image_path TEXT NOT NULL,
+                    content_hash TEXT UNIQUE,
+                    prompt TEXT NOT NULL,
+                    style TEXT NOT NULL DEFAULT '',
+                    aspect_ratio TEXT NOT NULL DEFAULT '',
+                    width INTEGER,
+                    height INTEGER,
+                    term_count INTEGER NOT NULL,
+                    created_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    style TEXT NOT NULL DEFAULT '',
+                    aspect_ratio TEXT NOT NULL DEFAULT ''
+                );
+                CREATE TABLE IF NOT EXISTS term_stats (
+                    style TEXT NOT NULL,
+                    aspect_ratio TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    df INTEGER NOT NULL,
+                    PRIMARY KEY (style, aspect_ratio, term)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_filter ON entries(style, aspect_ratio);
+                -- 覆盖索引: 候选查找只读索引，先按风格/宽高比过滤再按词项定位；(entry_id, term) 用于统计候选的共享词项
+                CREATE INDEX IF NOT EXISTS idx_terms_scope ON terms(style, aspect_ratio, term, entry_id);
+                CREATE INDEX IF NOT EXISTS idx_terms_entry ON terms(entry_id, term);
+            """)
+
+    def add_image(self, image_path: str, prompt: str, style: Optional[str] = None,
+                  aspect_ratio: Optional[str] = None) -> Optional[int]:
+        """将图像复制到图像库并建立索引
+
+        Returns:
+            图像ID，图像无效或已存在时返回已有ID或 None
+        """
+        if not image_path or not os.path.exists(image_path):
+            return None
+        terms = tokenize_prompt(prompt)
+        if not terms:
+            return None
+
+        with open(image_path, "rb") as f:
+            content_hash = hashlib.sha1(f.read()).hexdigest()
+
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM entries WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row:
+                return row[0]
+
+            try:
+                with Image.open(image_path) as img:
+                    width, height = img.size
+            except Exception as e:
+                logger.warning(f"无法读取图像尺寸，跳过入库: {image_path} ({e})")
+                return None
+
+            stored_path = self.images_dir / f"{content_hash}{Path(image_path).suffix or '.png'}"
+            shutil.copyfile(image_path, stored_path)
+
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO entries (image_path, content_hash, prompt, style, aspect_ratio, width, height, term_count, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (str(stored_path), content_hash, prompt, style or "", aspect_ratio or "",
+                     width, height, len(terms), time.time())
+                )
+                entry_id = cursor.lastrowid
+                scope = (style or "", aspect_ratio or "")
+                self._conn.executemany("INSERT INTO terms (term, entry_id, style, aspect_ratio) VALUES (?, ?, ?, ?)",
+                                       [(term, entry_id, *scope) for term in terms])
+                self._conn.executemany(
+                    "INSERT INTO term_stats (style, aspect_ratio, term, df) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT (style, aspect_ratio, term) DO UPDATE SET df = df + 1",
+                    [(*scope, term) for term in terms]
+                )
+        logger.debug(f"图像已入库: {stored_path} (ID: {entry_id})")
+        return entry_id
+
+    def find_similar(self, prompt: str, style: Optional[str] = None, aspect_ratio: Optional[str] = None,
+                     min_score: float = 0.6, limit: int = 1) -> List[Dict[str, Any]]:
+        """按提示词相似度 (词项 Jaccard) 查找风格和宽高比一致的图像
+
+        Returns:
+            按得分从高到低排列的结果列表，每项包含 image_path、prompt、score 等字段
+        """
+        terms = tokenize_prompt(prompt)
+        if not terms:
+            return []
+        scope = (style or "", aspect_ratio or "")
+        term_list = sorted(terms)
+        placeholders = ",".join("?" * len(term_list))
+
+        with self._lock:
+            # 文档频率: 库中没有出现过的词项不可能共享，直接忽略
+            df = dict(self._conn.execute(
+                f"SELECT term, df FROM term_stats WHERE style = ? AND aspect_ratio = ? AND term IN ({placeholders})",
+                (*scope, *term_list)
+            ).fetchall())
+            if not df:
+                return []
+            # 前缀过滤: Jaccard >= min_score 时至少共享 ceil(min_score * 查询词项数) 个词项 (都在库中出现过)，
+            # 因此必然包含其中最少见的 (库中出现过的词项数 - 该数 + 1) 个词项之一，只用这些词项取候选
+            required = max(1, math.ceil(round(min_score * len(terms), 6)))
+            prefix = sorted(df, key=lambda term: (df[term], term))[:max(0, len(df) - required + 1)]
+            if not prefix:
+                return []
+            # 长度过滤: Jaccard >= min_score 要求 图像词项数 在 [min_score * q, q / min_score] 内
+            min_terms = math.ceil(round(min_score * len(terms), 6)) if min_score > 0 else 0
+            max_terms = math.floor(round(len(terms) / min_score, 6)) if min_score > 0 else 2 ** 31
+            # 共享词项数 / (查询词项数 + 图像词项数 - 共享词项数) 即 Jaccard 相似度
+            query = f"""
+                WITH candidates AS (
+                    SELECT DISTINCT entry_id FROM terms
+                    WHERE style = ? AND aspect_ratio = ? AND term IN ({",".join("?" * len(prefix))})
+                )
+                SELECT e.id, e.image_path, e.prompt, e.width, e.height, e.term_count,
+                       (SELECT COUNT(*) FROM terms t WHERE t.entry_id = e.id AND t.term IN ({placeholders})) AS shared
+                FROM candidates c JOIN entries e ON e.id = c.entry_id
+                WHERE e.term_count BETWEEN ? AND ?
+            """
+            rows = self._conn.execute(query, (*scope, *prefix, *term_list, min_terms, max_terms)).fetchall()
+
+        results = []
+        for entry_id, path, entry_prompt, width, height, term_count, shared in rows:
+            score = shared / (len(terms) + term_count - shared)
+            if score >= min_score and os.path.exists(path):
+                results.append({
+                    "id": entry_id,
+                    "image_path": path,
+                    "prompt": entry_prompt,
+                    "width": width,
+                    "height": height,
+                    "score": score
+                })
+        results.sort(key=lambda item: item["score"], reverse=True)
+        return results[:limit]
+
+    def count(self) -> int:
+        """返回图像库中的图像数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,342 @@
+"""图像任务调度模块
+
+为同时运行的多个故事提供统一的图像任务队列：
+- 每个图像后端 (ComfyUI / Midjourney) 有独立的并发上限
+- 各故事按优先级权重公平分享后端容量 (加权公平排队)，大故事不会饿死小故事
+
+故事通常运行在各自的 full_process.py 进程中，因此队列状态和后端占用槽位
+都保存在共享目录下的文件中，由各进程协同调度。每个进程只有一个心跳线程
+定期刷新本进程的故事状态和持有的槽位，等待中的任务共用同一份队列快照。
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import platform
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from config import config
+from errors import get_logger
+
+logger = get_logger("image_scheduler")
+
+# 各后端默认并发上限
+DEFAULT_LIMITS = {
+    "comfyui": 1,
+    "midjourney": 3
+}
+# 等待调度时的轮询间隔 (秒)，也是队列快照的有效期
+POLL_INTERVAL = 0.5
+# 心跳线程刷新故事状态和槽位文件的间隔 (秒)
+HEARTBEAT_INTERVAL = 10
+# 故事状态超过该时间未刷新视为进程已退出 (秒)
+STORY_STALE_SECONDS = 60
+# 槽位文件超过该时间未刷新视为持有者已崩溃 (秒)，持有者进程不存在时立即回收
+SLOT_STALE_SECONDS = 120
+
+
+def _pid_alive(pid: int) -> bool:
+    """检查本机上的进程是否仍在运行"""
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if platform.system() == "Windows":
+        # Windows 上 os.kill(pid, 0) 会结束目标进程，改用 OpenProcess 查询
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: 进程存在但无权访问
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class ImageJobScheduler:
+    """跨进程的加权公平图像任务调度器
+
+    用法:
+        async with scheduler.job("midjourney", story_id="story_a", priority=2.0):
+            await generator.generate_image_async(...)
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, limits: Optional[Dict[str, int]] = None):
+        temp_dir = config.get("paths", "temporary", default="temp")
+        self.state_dir = Path(state_dir or os.path.join(temp_dir, "image_scheduler"))
+        self.stories_dir = self.state_dir / "stories"
+        self.slots_dir = self.state_dir / "slots"
+        self.stories_dir.mkdir(parents=True, exist_ok=True)
+        self.slots_dir.mkdir(parents=True, exist_ok=True)
+
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(config.get("image_scheduler", "limits", default={}))
+        if limits:
+            self.limits.update(limits)
+
+        # 本进程内各 (故事, 后端) 的计数: waiting / running / served
+        self._stories: Dict[str, Dict[str, Any]] = {}
+        # 本进程持有的槽位文件，由心跳线程刷新修改时间
+        self._held_slots = set()
+        self._lock = threading.RLock()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        # 其他进程发布的故事状态快照: (读取时间, 故事状态列表)
+        self._snapshot = (0.0, [])
+
+    def set_limit(self, backend: str, limit: int):
+        """设置后端并发上限"""
+        self.limits[backend] = max(1, int(limit))
+
+    def _story_file(self, story_id: str) -> Path:
+        safe_id = re.sub(r"[^\w\-]", "_", story_id)
+        return self.stories_dir / f"{safe_id}__{os.getpid()}.json"
+
+    def _story_state(self, story_id: str, backend: str, priority: float) -> Dict[str, Any]:
+        key = f"{story_id}|{backend}"
+        if key not in self._stories:
+            self._stories[key] = {
+                "story_id": story_id,
+                "backend": backend,
+                "priority": priority,
+                "waiting": 0,
+                "running": 0,
+                "served": 0
+            }
+        state = self._stories[key]
+        state["priority"] = max(priority, state["priority"])
+        return state
+
+    def _is_active(self, story_id: str) -> bool:
+        return any(s["waiting"] > 0 or s["running"] > 0
+                   for s in self._stories.values() if s["story_id"] == story_id)
+
+    def _publish(self, story_id: str):
+        """将本进程中该故事的状态写入共享目录 (状态变化和心跳时调用)"""
+        with self._lock:
+            states = [dict(s) for s in self._stories.values() if s["story_id"] == story_id]
+            story_file = self._story_file(story_id)
+            if not self._is_active(story_id):
+                try:
+                    story_file.unlink()
+                except OSError:
+                    pass
+                return
+            payload = {"pid": os.getpid(), "updated": time.time(), "backends": states}
+            temp_file = story_file.with_suffix(".tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(temp_file, story_file)
+            # 本进程的状态变化立即反映到快照中
+            self._snapshot = (0.0, [])
+
+    def _heartbeat(self):
+        """心跳线程: 定期刷新本进程的故事状态和持有的槽位，没有活动任务时退出"""
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._lock:
+                active_stories = {s["story_id"] for s in self._stories.values()
+                                  if s["waiting"] > 0 or s["running"] > 0}
+                held_slots = list(self._held_slots)
+                if not active_stories and not held_slots:
+                    self._heartbeat_thread = None
+                    return
+            for story_id in active_stories:
+                try:
+                    self._publish(story_id)
+                except OSError as e:
+                    logger.warning(f"刷新故事 {story_id} 的队列状态失败: {e}")
+            for slot_file in held_slots:
+                try:
+                    os.utime(slot_file)
+                except OSError as e:
+                    logger.warning(f"刷新槽位 {slot_file} 失败: {e}")
+
+    def _ensure_heartbeat(self):
+        with self._lock:
+            if self._heartbeat_thread is None:
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="image-scheduler-heartbeat",
+                                                          daemon=True)
+                self._heartbeat_thread.start()
+
+    def _read_stories(self):
+        """读取所有进程发布的故事状态，清理过期文件
+
+        结果在 POLL_INTERVAL 内缓存，本进程所有等待中的任务共用一次目录扫描。
+        """
+        with self._lock:
+            read_at, cached = self._snapshot
+            if time.time() - read_at < POLL_INTERVAL:
+                return cached
+        stories = []
+        now = time.time()
+        for story_file in self.stories_dir.glob("*.json"):
+            try:
+                with open(story_file, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - payload.get("updated", 0) > STORY_STALE_SECONDS or not _pid_alive(int(payload.get("pid", 0))):
+                try:
+                    story_file.unlink()
+                except OSError:
+                    pass
+                continue
+            stories.extend(payload.get("backends", []))
+        with self._lock:
+            self._snapshot = (time.time(), stories)
+        return stories
+
+    def _is_my_turn(self, story_id: str, backend: str) -> bool:
+        """加权公平: 已服务次数 / 优先级 最小的故事优先获得下一个槽位"""
+        waiting = [s for s in self._read_stories() if s["backend"] == backend and s["waiting"] > 0]
+        if not waiting:
+            return True
+        min_virtual_time = min(s["served"] / max(s["priority"], 0.01) for s in waiting)
+        mine = self._stories[f"{story_id}|{backend}"]
+        return mine["served"] / max(mine["priority"], 0.01) <= min_virtual_time
+
+    def _try_claim_slot(self, backend: str) -> Optional[Path]:
+        backend_dir = self.slots_dir / backend
+        backend_dir.mkdir(parents=True, exist_ok=True)
+        for index in range(self.limits.get(backend, 1)):
+            slot_file = backend_dir / f"slot_{index}.lock"
+            self._reclaim_stale_slot(slot_file)
+            try:
+                fd = os.open(str(slot_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            with self._lock:
+                self._held_slots.add(str(slot_file))
+            return slot_file
+        return None
+
+    @staticmethod
+    def _read_slot_owner(slot_file: Path) -> Optional[int]:
+        try:
+            with open(slot_file, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return None
+
+    def _reclaim_stale_slot(self, slot_file: Path):
+        """持有者进程已退出，或槽位长时间未被心跳刷新时回收槽位"""
+        try:
+            modified = slot_file.stat().st_mtime
+        except OSError:
+            return
+        owner = self._read_slot_owner(slot_file)
+        if owner is not None and owner != os.getpid() and not _pid_alive(owner):
+            reason = f"持有进程 {owner} 已退出"
+        elif time.time() - modified > SLOT_STALE_SECONDS:
+            reason = f"超过 {SLOT_STALE_SECONDS} 秒未刷新"
+        else:
+            return
+        # 删除前再确认一次，避免删掉其他进程刚刚重新创建的槽位
+        if self._read_slot_owner(slot_file) != owner:
+            return
+        logger.warning(f"回收 {slot_file.parent.name} 槽位 {slot_file.name}: {reason}")
+        try:
+            slot_file.unlink()
+        except OSError:
+            pass
+
+    @asynccontextmanager
+    async def job(self, backend: str, story_id: str = "default", priority: float = 1.0):
+        """排队等待后端槽位，获得后执行任务，结束后释放槽位"""
+        backend = backend.lower()
+        with self._lock:
+            state = self._story_state(story_id, backend, priority)
+            state["waiting"] += 1
+        self._publish(story_id)
+        # 等待和运行期间由心跳线程刷新状态，避免被其他进程视为过期
+        self._ensure_heartbeat()
+        slot_file = None
+        try:
+            while True:
+                if self._is_my_turn(story_id, backend):
+                    slot_file = self._try_claim_slot(backend)
+                    if slot_file:
+                        break
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            with self._lock:
+                state["waiting"] -= 1
+                if slot_file:
+                    state["running"] += 1
+                    state["served"] += 1
+            self._publish(story_id)
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held_slots.discard(str(slot_file))
+            try:
+                slot_file.unlink()
+            except OSError:
+                pass
+            with self._lock:
+                state["running"] -= 1
+            self._publish(story_id)
+
+    def get_queue_state(self) -> Dict[str, Any]:
+        """汇总各后端的排队深度和运行中任务数
+
+        Returns:
+            dict: {后端: {"limit", "waiting", "running", "stories": [...]}}
+        """
+        summary = {backend: {"limit": limit, "waiting": 0, "running": 0, "stories": []}
+                   for backend, limit in self.limits.items()}
+        for story in self._read_stories():
+            backend_state = summary.setdefault(story["backend"], {"limit": self.limits.get(story["backend"], 1),
+                                                                  "waiting": 0, "running": 0, "stories": []})
+            backend_state["waiting"] += story["waiting"]
+            backend_state["running"] += story["running"]
+            backend_state["stories"].append(story)
+        return summary
+
+    def format_queue_state(self) -> str:
+        """返回便于日志和界面显示的队列状态文本"""
+        lines = []
+        for backend, state in self.get_queue_state().items():
+            lines.append(f"{backend}: 运行中 {state['running']}/{state['limit']}，排队 {state['waiting']}")
+            for story in state["stories"]:
+                lines.append(f"  - {story['story_id']} (优先级 {story['priority']}): "
+                             f"排队 {story['waiting']}，运行中 {story['running']}，已完成调度 {story['served']}")
+        return "\n".join(lines)
+
+
+# 进程内共享的调度器实例
+_scheduler: Optional[ImageJobScheduler] = None
+
+
+def get_scheduler() -> ImageJobScheduler:
+    """获取进程内共享的调度器实例"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ImageJobScheduler()
+    return _scheduler
+
+
+if __name__ == "__main__":
+    # 查看当前图像任务队列状态
+    print(get_scheduler().format_queue_state())
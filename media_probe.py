@@ -0,0 +1,153 @@
+"""媒体信息缓存模块
+
+统一获取视频/音频的分辨率、帧率、时长和流布局。结果按 路径 + 修改时间 + 文件大小
+缓存，文件被覆盖后自动失效。生成文件的处理步骤可以直接登记已知的媒体信息，
+后续步骤读取时无需再启动 ffprobe 子进程。
+"""
+import os
+import json
+import threading
+import subprocess
+from typing import Dict, Any, Optional, Tuple
+
+from errors import get_logger
+
+logger = get_logger("media_probe")
+
+# {绝对路径: ((修改时间, 文件大小), 媒体信息)}
+_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+def _file_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _is_complete(info: Dict[str, Any]) -> bool:
+    """信息中包含时长，且有视频流时包含分辨率和帧率"""
+    if info.get("duration") is None:
+        return False
+    if info.get("video_streams", 0) > 0:
+        return all(info.get(field) is not None for field in ("width", "height", "fps"))
+    return "video_streams" in info
+
+
+def _parse_frame_rate(rate: Optional[str]) -> Optional[float]:
+    if not rate:
+        return None
+    if "/" in rate:
+        num, den = rate.split("/", 1)
+        return float(num) / float(den) if float(den) else None
+    return float(rate)
+
+
+def _ffprobe(path: str) -> Optional[Dict[str, Any]]:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,width,height,r_frame_rate,duration:format=duration",
+        "-of", "json",
+        path
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+                                text=True, encoding="utf-8", errors="replace")
+        data = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        logger.error(f"使用 ffprobe 探测媒体 {path} 信息失败: {e}")
+        return None
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    duration = data.get("format", {}).get("duration")
+    if duration is None and video and video.get("duration"):
+        duration = video["duration"]
+    info = {
+        "duration": float(duration) if duration is not None else None,
+        "video_streams": sum(1 for s in streams if s.get("codec_type") == "video"),
+        "audio_streams": sum(1 for s in streams if s.get("codec_type") == "audio"),
+        "subtitle_streams": sum(1 for s in streams if s.get("codec_type") == "subtitle")
+    }
+    if video:
+        info["width"] = int(video["width"])
+        info["height"] = int(video["height"])
+        info["fps"] = _parse_frame_rate(video.get("r_frame_rate"))
+    return info
+
+
+def register_media(path: str, **info) -> None:
+    """登记刚生成的文件的媒体信息 (width/height/fps/duration/*_streams)
+
+    只登记确定的字段，缺少的字段会在读取时通过 ffprobe 补全。
+    """
+    key = _file_key(path)
+    if key is None:
+        return
+    info = {k: v for k, v in info.items() if v is not None}
+    with _lock:
+        _cache[os.path.abspath(path)] = (key, info)
+
+
+def register_derived(output_path: str, source_path: str, **overrides) -> None:
+    """登记由 source_path 经叠加/字幕等处理得到的文件
+
+    这类处理不改变分辨率、帧率和时长，直接沿用源文件已缓存的信息。
+    源文件未缓存时不登记 (不会为此启动 ffprobe)。
+    """
+    source = cached_media_info(source_path)
+    if source is None:
+        return
+    info = dict(source)
+    info.update(overrides)
+    register_media(output_path, **info)
+
+
+def cached_media_info(path: str) -> Optional[Dict[str, Any]]:
+    """只从缓存读取媒体信息，文件已变化或未缓存时返回None"""
+    key = _file_key(path)
+    with _lock:
+        entry = _cache.get(os.path.abspath(path))
+    if entry is None or entry[0] != key:
+        return None
+    return dict(entry[1])
+
+
+def get_media_info(path: str) -> Optional[Dict[str, Any]]:
+    """获取媒体信息，缓存不完整时调用 ffprobe 并更新缓存
+
+    Returns:
+        dict: {"width", "height", "fps", "duration", "video_streams", "audio_streams",
+               "subtitle_streams"}，探测失败返回None
+    """
+    info = cached_media_info(path)
+    if info is not None and _is_complete(info):
+        return info
+    if _file_key(path) is None:
+        logger.error(f"媒体文件不存在，无法探测信息: {path}")
+        return None
+
+    probed = _ffprobe(path)
+    if probed is None:
+        return info
+    # 已登记的字段比探测结果更可信 (例如按帧数计算的精确时长)
+    probed.update(info or {})
+    register_media(path, **probed)
+    logger.debug(f"探测到媒体 {os.path.basename(path)} 信息: {probed}")
+    return probed
+
+
+def get_duration(path: str) -> float:
+    """获取媒体时长 (秒)，失败返回0"""
+    info = get_media_info(path)
+    return float(info["duration"]) if info and info.get("duration") is not None else 0
+
+
+def get_video_size(path: str) -> Optional[Tuple[int, int]]:
+    """获取视频分辨率 (宽, 高)，失败返回None"""
+    info = get_media_info(path)
+    if not info or info.get("width") is None:
+        return None
+    return info["width"], info["height"]
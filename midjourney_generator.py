@@ -7,6 +7,7 @@ import string
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncio
+from PIL import Image
 
 class MidjourneyGenerator:
     def __init__(self, host=None, port=None):
@@ -348,6 +349,125 @@ class MidjourneyGenerator:
         print(f"图像生成失败，已达到最大重试次数: {prompt[:50]}...")
         return None
 
+    def split_grid_image(self, grid_path, save_paths):
+        """将四宫格图片在本地切分为四张独立图片
+
+        Args:
+            grid_path: 四宫格图片路径
+            save_paths: 最多4个保存路径，按 U1-U4 (左上、右上、左下、右下) 顺序排列
+
+        Returns:
+            list: 与 save_paths 对应的结果路径列表，失败的位置为 None
+        """
+        results = [None] * len(save_paths)
+        try:
+            with Image.open(grid_path) as grid:
+                grid = grid.convert("RGB")
+                width, height = grid.size
+                half_w, half_h = width // 2, height // 2
+                boxes = [
+                    (0, 0, half_w, half_h),
+                    (half_w, 0, width, half_h),
+                    (0, half_h, half_w, height),
+                    (half_w, half_h, width, height)
+                ]
+                for i, save_path in enumerate(save_paths[:4]):
+                    save_path_obj = Path(save_path)
+                    save_path_obj.parent.mkdir(parents=True, exist_ok=True)
+                    grid.crop(boxes[i]).save(save_path_obj)
+                    results[i] = str(save_path_obj)
+                    print(f"四宫格第 {i + 1} 格已保存到: {save_path_obj}")
+        except Exception as e:
+            print(f"切分四宫格图片失败: {e}")
+        return results
+
+    async def _upscale_and_download_async(self, task_id, index, save_path):
+        """提交单个放大任务并下载结果 (异步版本)"""
+        submission = self.submit_upscale_task(task_id, index)
+        if submission.get("code") not in [1, 21, 22]:
+            print(f"!!! 放大任务提交失败 (任务ID: {task_id}, U{index}): {submission.get('description', '未知错误')}")
+            return None
+
+        upscale_task_id = submission.get("result")
+        if not upscale_task_id:
+            print(f"!!! 放大任务提交后未获取到有效的任务ID: {submission}")
+            return None
+
+        final_result = await self.wait_for_task_completion_async(upscale_task_id)
+        if not final_result or final_result.get("status") != "SUCCESS":
+            reason = final_result.get("failReason", "未知原因") if final_result else "等待超时"
+            print(f"!!! 放大任务 {upscale_task_id} 失败或超时: {reason}")
+            return None
+
+        final_image_url = final_result.get("imageUrl")
+        if final_image_url and self.download_image(final_image_url, save_path):
+            return str(save_path)
+        print(f"!!! 放大任务 {upscale_task_id} 的图像下载失败")
+        return None
+
+    async def generate_grid_images_async(self, prompt, output_filenames, max_retries=3, aspect_ratio=None, harvest_mode="split"):
+        """用一个绘图任务的四宫格为多个场景生成图像 (异步版本)
+
+        Args:
+            prompt: 图像生成提示词
+            output_filenames: 输出文件名列表 (1-4个)，依次对应 U1-U4
+            max_retries: 最大重试次数
+            aspect_ratio: 图像比例，可选值为 "16:9", "9:16" 或 None (默认方形)
+            harvest_mode: "split" 在本地切分四宫格; "upscale" 并行放大所需的每一格
+
+        Returns:
+            list: 与 output_filenames 对应的图像路径列表，失败的位置为 None
+        """
+        prompt = str(prompt)
+        output_filenames = list(output_filenames)[:4]
+        save_paths = [self.output_dir / name for name in output_filenames]
+        results = [None] * len(save_paths)
+
+        for attempt in range(max_retries):
+            print(f"尝试生成四宫格 (第 {attempt + 1}/{max_retries} 次, {len(save_paths)} 个场景): {prompt[:50]}...")
+            initial_task_id = self.submit_imagine_task(prompt, aspect_ratio=aspect_ratio)
+            if not initial_task_id:
+                print("!!! 提交初始任务失败")
+                continue
+
+            initial_result = await self.wait_for_task_completion_async(initial_task_id)
+            if not initial_result or initial_result.get("status") != "SUCCESS":
+                reason = initial_result.get("failReason", "未知原因") if initial_result else "等待超时"
+                print(f"!!! 初始任务 {initial_task_id} 失败或超时: {reason}")
+                continue
+
+            pending = [i for i, path in enumerate(results) if path is None]
+            if harvest_mode == "split":
+                grid_url = initial_result.get("imageUrl")
+                if not grid_url:
+                    print(f"!!! 初始任务 {initial_task_id} 成功但未找到四宫格图像URL")
+                    continue
+                grid_path = self.output_dir / f"grid_{initial_task_id}.png"
+                if not self.download_image(grid_url, grid_path):
+                    continue
+                split_results = self.split_grid_image(grid_path, [save_paths[i] for i in pending])
+                for i, path in zip(pending, split_results):
+                    results[i] = path
+                try:
+                    grid_path.unlink()
+                except OSError:
+                    pass
+            else:
+                # 同一四宫格的各格放大任务互不依赖，并行提交和等待
+                upscale_results = await asyncio.gather(*[
+                    self._upscale_and_download_async(initial_task_id, i + 1, save_paths[i])
+                    for i in pending
+                ])
+                for i, path in zip(pending, upscale_results):
+                    results[i] = path
+
+            if all(results):
+                return results
+            print(f"--- 第 {attempt + 1} 次尝试未能获取全部四宫格图像 ---")
+
+        print(f"四宫格生成未全部成功 ({sum(1 for r in results if r)}/{len(results)}): {prompt[:50]}...")
+        return results
+
     def generate_image(self, prompt, output_filename=None, max_retries=3, aspect_ratio=None):
         """生成图像的完整流程
         
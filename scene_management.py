@@ -11,12 +11,16 @@ import asyncio
 from config import config
 from errors import FileError, ProcessingError, get_logger, error_handler
 from services import ServiceLocator
+from image_scheduler import get_scheduler
 # 导入 StoryAnalyzer
 from story_analyzer import StoryAnalyzer
 
 # 创建日志记录器
 logger = get_logger("scene_management")
 
+# 场景编辑器重新生成图片时在图像任务队列中的优先级权重
+SCENE_EDITOR_PRIORITY = 4.0
+
 # 修改：使用 StoryAnalyzer 中的方法重写提示词
 def rewrite_prompt_with_ai(original_prompt, retry_count=0):
     """使用 StoryAnalyzer 中的 LLM 方法重写提示词，避开敏感词
@@ -255,11 +259,13 @@ async def regenerate_scene_image_async(scene_id, scenes, image_generator_type, a
     # 重新生成图片
     logger.info(f"开始重新生成图片，场景ID: {scene_id}, 提示词: {enhanced_prompt}")
     try:
-        # 如果是 Midjourney，调用异步方法
-        if image_generator_type.lower() == "midjourney":
-            output_filepath = await image_generator.generate_image_async(enhanced_prompt, output_filename, **kwargs)
-        else: # ComfyUI 或其他保持同步调用
-            output_filepath = image_generator.generate_image(enhanced_prompt, output_filename, **kwargs)
+        # 场景编辑是交互操作，以较高优先级进入图像任务队列
+        async with get_scheduler().job(image_generator_type, story_id="scene_editor", priority=SCENE_EDITOR_PRIORITY):
+            # 如果是 Midjourney，调用异步方法
+            if image_generator_type.lower() == "midjourney":
+                output_filepath = await image_generator.generate_image_async(enhanced_prompt, output_filename, **kwargs)
+            else: # ComfyUI 或其他保持同步调用
+                output_filepath = await asyncio.to_thread(image_generator.generate_image, enhanced_prompt, output_filename, **kwargs)
 
         if not output_filepath:
             # 如果返回 None，也认为是失败
@@ -1,9 +1,29 @@
 import os
 import json
+import copy
 import shutil
+import hashlib
+import threading
 from pathlib import Path
 import traceback
 
+from config import config
+
+# 场景索引: {场景文件绝对路径: ((修改时间, 文件大小), 场景列表)}，所有 SceneManager 实例共用
+_scene_index = {}
+# 缩略图索引: {原图绝对路径: ((修改时间, 文件大小), 缩略图路径)}
+_thumbnail_index = {}
+_lock = threading.Lock()
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 class SceneManager:
     """场景管理类，负责处理场景的加载、更新、刷新等操作"""
     
@@ -12,24 +32,42 @@ class SceneManager:
         self.key_scenes_file = "output/key_scenes.json"
         self.images_dir = "output/images"
         self.modified_images_file = "output/modified_images.txt"
+        self.thumbnails_dir = os.path.join(config.get("paths", "temporary", default="temp"), "scene_thumbnails")
     
-    def load_scenes(self):
-        """加载所有场景信息"""
-        if not os.path.exists(self.key_scenes_file):
+    def _indexed_scenes(self):
+        """返回内存中的场景列表 (只读)，场景文件的修改时间或大小变化后重新读取"""
+        key = _file_key(self.key_scenes_file)
+        if key is None:
             return []
+        index_key = os.path.abspath(self.key_scenes_file)
+        with _lock:
+            entry = _scene_index.get(index_key)
+        if entry and entry[0] == key:
+            return entry[1]
         
         try:
             with open(self.key_scenes_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+                scenes = json.load(f)
         except Exception as e:
             print(f"读取场景信息出错: {e}")
             return []
+        with _lock:
+            _scene_index[index_key] = (key, scenes)
+        return scenes
+    
+    def load_scenes(self):
+        """加载所有场景信息 (返回副本，调用方可修改后通过 save_scenes 保存)"""
+        return copy.deepcopy(self._indexed_scenes())
     
     def save_scenes(self, scenes):
         """保存场景信息"""
         try:
             with open(self.key_scenes_file, "w", encoding="utf-8") as f:
                 json.dump(scenes, f, ensure_ascii=False, indent=2)
+            key = _file_key(self.key_scenes_file)
+            if key is not None:
+                with _lock:
+                    _scene_index[os.path.abspath(self.key_scenes_file)] = (key, copy.deepcopy(scenes))
             return True
         except Exception as e:
             print(f"保存场景信息出错: {e}")
@@ -37,14 +75,13 @@ class SceneManager:
     
     def get_scene_count(self):
         """获取场景总数"""
-        scenes = self.load_scenes()
-        return len(scenes)
+        return len(self._indexed_scenes())
     
     def get_scene(self, scene_idx):
         """获取指定索引的场景"""
-        scenes = self.load_scenes()
+        scenes = self._indexed_scenes()
         if 0 <= scene_idx < len(scenes):
-            return scenes[scene_idx]
+            return copy.deepcopy(scenes[scene_idx])
         return None
     
     def update_scene_prompt(self, scene_idx, prompt):
@@ -64,6 +101,67 @@ class SceneManager:
                 return image_path
         return None
     
+    def get_scene_thumbnail(self, image_path):
+        """获取场景图片的缩略图路径
+        
+        缩略图按原图路径、修改时间和大小缓存在临时目录，只有原图变化时才重新生成。
+        
+        Args:
+            image_path: 场景原图路径
+            
+        Returns:
+            str: 缩略图路径，生成失败时返回原图路径，原图不存在时返回None
+        """
+        key = _file_key(image_path)
+        if key is None:
+            return None
+        source = os.path.abspath(image_path)
+        with _lock:
+            entry = _thumbnail_index.get(source)
+        if entry and entry[0] == key and os.path.exists(entry[1]):
+            return entry[1]
+        
+        settings = config.get("scene_thumbnails", default={}) or {}
+        size = int(settings.get("size", 320))
+        quality = int(settings.get("quality", 80))
+        thumb_format = str(settings.get("format", "webp")).lower()
+        try:
+            from PIL import Image, features
+            if thumb_format == "webp" and not features.check("webp"):
+                thumb_format = "jpeg"
+            extension = "webp" if thumb_format == "webp" else "jpg"
+            signature = f"{source}|{key[0]}|{key[1]}|{size}|{quality}"
+            thumb_path = os.path.join(
+                self.thumbnails_dir,
+                f"{Path(image_path).stem}_{hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]}.{extension}"
+            )
+            if not os.path.exists(thumb_path):
+                os.makedirs(self.thumbnails_dir, exist_ok=True)
+                temp_path = f"{thumb_path}.tmp"
+                with Image.open(image_path) as img:
+                    img.thumbnail((size, size))
+                    # JPEG 不支持透明通道，WebP 只支持 RGB/RGBA
+                    if extension == "jpg":
+                        img = img.convert("RGB")
+                    elif img.mode not in ("RGB", "RGBA"):
+                        img = img.convert("RGBA")
+                    img.save(temp_path, format="WEBP" if extension == "webp" else "JPEG", quality=quality)
+                os.replace(temp_path, thumb_path)
+        except Exception as e:
+            print(f"生成缩略图失败 {image_path}: {e}，使用原图")
+            return image_path
+        
+        with _lock:
+            previous = _thumbnail_index.get(source)
+            _thumbnail_index[source] = (key, thumb_path)
+        # 原图已变化，删除旧的缩略图
+        if previous and previous[1] != thumb_path and os.path.exists(previous[1]):
+            try:
+                os.remove(previous[1])
+            except OSError:
+                pass
+        return thumb_path
+    
     def upload_scene_image(self, scene_index, image_path):
         """上传自定义图片替换场景图片
         
@@ -189,7 +287,7 @@ class SceneManager:
             }
         
         try:
-            scenes = self.load_scenes()
+            scenes = self._indexed_scenes()
                 
             scene_count = len(scenes)
             if scene_count == 0:
@@ -262,18 +360,18 @@ class SceneManager:
     
     def get_gallery_images(self):
         """获取所有场景的缩略图列表"""
-        scenes = self.load_scenes()
+        scenes = self._indexed_scenes()
         gallery_images = []
         
         for i, scene in enumerate(scenes):
             scene_id = i + 1
             image_file = scene.get("image_file", "")
             
-            # 构建图片路径
-            image_path = f"{self.images_dir}/{image_file}" if image_file else ""
-            if os.path.exists(image_path):
+            # 构建图片路径，画廊只加载缩略图
+            thumb_path = self.get_scene_thumbnail(f"{self.images_dir}/{image_file}") if image_file else None
+            if thumb_path:
                 # 添加图片和标签
-                gallery_images.append((image_path, f"场景 {scene_id}"))
+                gallery_images.append((thumb_path, f"场景 {scene_id}"))
             else:
                 # 记录缺失图片
                 print(f"场景 {scene_id} 没有图片")
@@ -308,7 +406,7 @@ class SceneManager:
             }
         
         try:
-            scenes = self.load_scenes()
+            scenes = self._indexed_scenes()
             
             # 更新滑块范围
             scene_count = len(scenes)
@@ -344,7 +442,7 @@ class SceneManager:
             
     def generate_scene_thumbnails(self):
         """生成场景缩略图HTML"""
-        scenes = self.load_scenes()
+        scenes = self._indexed_scenes()
         if not scenes:
             return ""
             
@@ -396,12 +494,12 @@ class SceneManager:
             scene_id = i + 1
             image_file = scene.get("image_file", "")
             
-            # 构建图片路径
-            image_path = f"{self.images_dir}/{image_file}" if image_file else ""
-            if os.path.exists(image_path):
+            # 构建缩略图路径
+            thumb_path = self.get_scene_thumbnail(f"{self.images_dir}/{image_file}") if image_file else None
+            if thumb_path:
                 thumbnails_html += f"""
                 <div class="scene-thumbnail" onclick="selectScene({scene_id})" id="scene-thumb-{scene_id}">
-                    <img src="file={image_path}" alt="场景 {scene_id}" />
+                    <img src="file={thumb_path}" alt="场景 {scene_id}" loading="lazy" />
                     <div class="scene-label">场景 {scene_id}</div>
                 </div>
                 """
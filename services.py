@@ -202,29 +202,29 @@ class VideoProcessorService(ABC):
     """视频处理服务接口"""
     
     @abstractmethod
-    def create_base_video(self, audio_info_file: str, output_video: str) -> str:
-        """创建基础视频
+    def create_audio_track(self, audio_info_file: str, output_audio: str) -> str:
+        """合并语音并编码为音轨
         
         Args:
             audio_info_file: 音频信息文件路径
-            output_video: 输出视频文件路径
+            output_audio: 输出音轨文件路径
             
         Returns:
-            str: 生成的视频文件路径
+            str: 生成的音轨文件路径
             
         Raises:
-            FileError: 当音频信息文件不存在或无法读取时
-            ServiceError: 当视频创建失败时
+            FileError: 当找不到任何音频文件时
+            ServiceError: 当音轨创建失败时
         """
         pass
     
     @abstractmethod
-    def create_video_with_scenes(self, key_scenes_file: str, base_video: str, output_video: str) -> str:
+    def create_video_with_scenes(self, key_scenes_file: str, audio_track: str, output_video: str) -> str:
         """创建带场景的视频
         
         Args:
             key_scenes_file: 关键场景JSON文件路径
-            base_video: 基础视频文件路径
+            audio_track: 音轨文件路径
             output_video: 输出视频文件路径
             
         Returns:
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from add_character_image import fit_character_size
+
+
+def test_full_hd_keeps_500px_box():
+    assert fit_character_size(800, 1000, 1080) == (400, 500)
+    assert fit_character_size(1000, 400, 1080) == (500, 200)
+    # 小于500像素的原图不放大
+    assert fit_character_size(300, 300, 1080) == (300, 300)
+
+
+def test_proxy_frame_scales_with_video_height():
+    width, height = fit_character_size(800, 1000, 360)
+    assert (width, height) == (132, 166)
+    assert height < 360
+
+
+@pytest.mark.parametrize("video_height", [240, 360, 480, 720, 1080, 2160])
+def test_character_keeps_same_share_of_frame(video_height):
+    _, height = fit_character_size(600, 1200, video_height)
+    assert height / video_height == pytest.approx(500 / 1080, abs=0.01)
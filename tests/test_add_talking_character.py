@@ -0,0 +1,110 @@
+import json
+import wave
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from add_talking_character import (MOUTH_MASK_SIZE, _query_mouth_spans, build_phoneme_mouth_schedule,
+                                   write_mouth_mask)
+
+
+def _mora(consonant_length, vowel, vowel_length):
+    return {"consonant_length": consonant_length, "vowel": vowel, "vowel_length": vowel_length}
+
+
+def _open_spans(states, end):
+    """把状态列表转换为张嘴区间"""
+    spans = []
+    for i, (time_point, is_open) in enumerate(states):
+        if is_open:
+            spans.append((time_point, states[i + 1][0] if i + 1 < len(states) else end))
+    return spans
+
+
+def test_query_spans_follow_mora_timing_and_speed():
+    query = {
+        "speedScale": 2.0,
+        "prePhonemeLength": 0.1,
+        "accent_phrases": [
+            {
+                "moras": [_mora(0.05, "a", 0.1), _mora(None, "N", 0.08), _mora(0.04, "U", 0.06)],
+                "pause_mora": {"vowel": "pau", "vowel_length": 0.2}
+            },
+            {"moras": [_mora(None, "o", 0.12)]}
+        ]
+    }
+    spans = _query_mouth_spans(query)
+    # 撥音 N 和清音化元音 U 闭嘴，停顿 0.2 秒按语速缩放为 0.1 秒
+    assert spans == [pytest.approx((0.075, 0.125)), pytest.approx((0.315, 0.375))]
+
+
+def test_query_pause_length_override_is_scaled():
+    query = {
+        "speedScale": 1.0,
+        "pauseLength": 0.4,
+        "pauseLengthScale": 0.5,
+        "accent_phrases": [
+            {"moras": [_mora(None, "a", 0.1)], "pause_mora": {"vowel": "pau", "vowel_length": 1.0}},
+            {"moras": [_mora(None, "e", 0.1)]}
+        ]
+    }
+    assert _query_mouth_spans(query) == [pytest.approx((0.0, 0.1)), pytest.approx((0.3, 0.4))]
+
+
+def _write_sentence(tmp_path, name, seconds, moras):
+    wav_file = tmp_path / f"{name}.wav"
+    with wave.open(str(wav_file), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(8000)
+        wf.writeframes(b"\0\0" * int(8000 * seconds))
+    query = {"speedScale": 1.0, "accent_phrases": [{"moras": moras}]}
+    (tmp_path / f"{name}.query.json").write_text(json.dumps(query), encoding="utf-8")
+    return {"audio_file": str(wav_file)}
+
+
+def test_schedule_offsets_sentences_by_wav_length(tmp_path):
+    audio_info = {"audio_files": [
+        # 首尾相接的两个元音合并为一个张嘴区间
+        _write_sentence(tmp_path, "s1", 1.0, [_mora(0.1, "a", 0.2), _mora(None, "i", 0.2)]),
+        # 第二句从第一句WAV结束处开始；过短的张嘴被过滤
+        _write_sentence(tmp_path, "s2", 1.5, [_mora(0.2, "u", 0.02), _mora(0.3, "o", 0.25)])
+    ]}
+    audio_info_file = tmp_path / "audio_info.json"
+    audio_info_file.write_text(json.dumps(audio_info), encoding="utf-8")
+
+    states = build_phoneme_mouth_schedule(str(audio_info_file), min_duration=0.05)
+    assert states[0] == (0.0, False)
+    assert _open_spans(states, 2.5) == [pytest.approx((0.1, 0.5)), pytest.approx((1.52, 1.77))]
+
+
+def test_schedule_requires_every_query(tmp_path):
+    entry = _write_sentence(tmp_path, "s1", 1.0, [_mora(None, "a", 0.2)])
+    (tmp_path / "s1.query.json").unlink()
+    audio_info_file = tmp_path / "audio_info.json"
+    audio_info_file.write_text(json.dumps({"audio_files": [entry]}), encoding="utf-8")
+
+    assert build_phoneme_mouth_schedule(str(audio_info_file)) is None
+
+
+def test_mouth_mask_has_one_frame_per_video_frame(tmp_path):
+    mask_path = tmp_path / "mask.raw"
+    states = [(0.0, False), (1.0, True), (1.5, False), (3.5, True)]
+    frame_count = write_mouth_mask(states, 5.0, 30, str(mask_path))
+
+    data = mask_path.read_bytes()
+    frame_size = MOUTH_MASK_SIZE * MOUTH_MASK_SIZE
+    assert frame_count == 150
+    assert len(data) == frame_count * frame_size
+    frames = [data[i * frame_size] for i in range(frame_count)]
+    assert set(data[:frame_size]) == {0}
+    expected = [255 if 30 <= i < 45 or i >= 105 else 0 for i in range(frame_count)]
+    assert frames == expected
+
+
+def test_mouth_mask_covers_fractional_frame_rates(tmp_path):
+    mask_path = tmp_path / "mask.raw"
+    assert write_mouth_mask([(0.0, True)], 10.0, 29.97, str(mask_path)) == 300
+    assert set(mask_path.read_bytes()) == {255}
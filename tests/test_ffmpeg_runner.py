@@ -0,0 +1,72 @@
+import io
+import subprocess
+
+import pytest
+
+import encoding_profiles
+import ffmpeg_runner
+from encoding_profiles import FRAGMENTED_MP4_FLAGS
+
+
+class _FakeProcess:
+    def __init__(self, args, **kwargs):
+        self.args = args
+        self.stdout = io.BytesIO(b"out_time_us=1000000\nprogress=end\n")
+        self.stderr = io.BytesIO(b"")
+
+    def wait(self):
+        return 0
+
+
+@pytest.fixture
+def launched(monkeypatch):
+    commands = []
+
+    def popen(args, **kwargs):
+        commands.append(args)
+        return _FakeProcess(args, **kwargs)
+
+    monkeypatch.setattr(ffmpeg_runner.subprocess, "Popen", popen)
+    monkeypatch.setattr(encoding_profiles, "get_progressive_mode", lambda: "hls")
+    return commands
+
+
+def _overlay_cmd(output_file):
+    return ["ffmpeg", "-i", "in.mp4", "-i", "char.png",
+            "-filter_complex", "overlay=10:10", "-c:v", "libx264", "-movflags", "+faststart",
+            "-y", output_file]
+
+
+def test_hls_fallback_writes_fragmented_mp4(launched, tmp_path, capsys):
+    output_file = str(tmp_path / "out.mp4")
+    ffmpeg_runner.run_ffmpeg(_overlay_cmd(output_file), duration=1.0, live_preview=True)
+
+    cmd = launched[0]
+    assert "tee" not in cmd
+    assert cmd[-1] == output_file
+    assert cmd.count("-movflags") == 1
+    assert cmd[cmd.index("-movflags") + 1] == FRAGMENTED_MP4_FLAGS
+    assert ffmpeg_runner.parse_live_preview_marker(capsys.readouterr().out.splitlines()[0]) == output_file
+
+
+def test_mapped_filter_graph_uses_hls_tee(launched, tmp_path, capsys):
+    output_file = str(tmp_path / "out.mp4")
+    cmd = _overlay_cmd(output_file)
+    cmd[cmd.index("-filter_complex") + 1] = "[0:v][1:v]overlay=10:10[out_v]"
+    cmd[-3:-3] = ["-map", "[out_v]", "-map", "0:a?"]
+    ffmpeg_runner.run_ffmpeg(cmd, duration=1.0, live_preview=True)
+
+    launched_cmd = launched[0]
+    assert launched_cmd[-3:-1] == ["-f", "tee"]
+    assert "-movflags" not in launched_cmd
+    preview = ffmpeg_runner.parse_live_preview_marker(capsys.readouterr().out.splitlines()[0])
+    assert preview == ffmpeg_runner._hls_playlist_path(output_file)
+
+
+def test_non_mp4_output_is_left_unchanged(launched, tmp_path):
+    output_file = str(tmp_path / "out.mkv")
+    cmd = _overlay_cmd(output_file)
+    result = ffmpeg_runner.run_ffmpeg(cmd, duration=1.0, live_preview=True)
+
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert launched[0][4:] == cmd[1:]
@@ -0,0 +1,48 @@
+import pytest
+
+# full_process 在导入时加载完整的处理流水线 (MeCab、图像生成器等)
+full_process = pytest.importorskip("full_process")
+
+
+def _scenes(*prompts):
+    return [{"scene_id": i + 1, "prompt": prompt} for i, prompt in enumerate(prompts)]
+
+
+def test_grid_groups_similar_adjacent_scenes():
+    scenes = _scenes("red castle at night", "red castle at night rain", "blue ocean waves", "red castle at night")
+    groups = full_process.group_scenes_for_grid(scenes)
+    assert [[index for index, _ in group] for group in groups] == [[0, 1], [2], [3]]
+
+
+def test_grid_groups_are_limited_to_four_scenes():
+    scenes = _scenes(*["forest path in autumn"] * 6)
+    groups = full_process.group_scenes_for_grid(scenes)
+    assert [len(group) for group in groups] == [4, 2]
+
+
+def test_grid_never_groups_non_dict_scenes():
+    scenes = ["forest path", "forest path", {"prompt": "forest path"}]
+    groups = full_process.group_scenes_for_grid(scenes)
+    assert [[index for index, _ in group] for group in groups] == [[0], [1], [2]]
+
+
+def test_duplicates_map_to_first_representative():
+    scenes = _scenes("old man walking in the rain", "blue ocean waves", "old man walking in rain",
+                     "blue ocean waves at dawn", "old man walking in the rain")
+    scenes.insert(2, {"scene_id": 99})
+    duplicates = full_process.find_duplicate_scenes(scenes, threshold=0.75)
+    assert duplicates == {3: 0, 5: 0, 4: 1}
+
+
+def test_duplicates_threshold_is_inclusive():
+    scenes = _scenes("cat dog bird fish", "cat dog bird frog")
+    assert full_process.find_duplicate_scenes(scenes, threshold=0.6) == {1: 0}
+    assert full_process.find_duplicate_scenes(scenes, threshold=0.61) == {}
+
+
+def test_parse_output_resolutions():
+    assert full_process.parse_output_resolutions(None) == []
+    assert full_process.parse_output_resolutions("1920x1080") == [(1920, 1080)]
+    assert full_process.parse_output_resolutions(["1920x1080,1080X1920", "1921x1081", "bad", "0x720", "720x1280"]) == [
+        (1920, 1080), (1080, 1920), (720, 1280)
+    ]
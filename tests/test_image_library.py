@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from image_library import ImageLibrary, tokenize_prompt
+
+
+def _make_image(path, index):
+    # 每张图像的尺寸不同，内容哈希互不相同
+    Image.new("RGB", (8 + index % 50, 8 + index // 50), (index % 256, 0, 0)).save(path)
+    return str(path)
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def test_tokenize_prompt_splits_and_drops_stop_terms():
+    assert tokenize_prompt("A cat, sitting on the roof。夜晚（月光）, high quality") == {
+        "cat", "sitting", "roof", "夜晚", "月光"
+    }
+
+
+def test_find_similar_respects_scope_and_threshold(tmp_path):
+    library = ImageLibrary(str(tmp_path / "library"))
+    cat = library.add_image(_make_image(tmp_path / "0.png", 0), "cat on a red roof at night", "anime", "16:9")
+    library.add_image(_make_image(tmp_path / "1.png", 1), "cat on a red roof at night", "anime", "9:16")
+    library.add_image(_make_image(tmp_path / "2.png", 2), "dog in a green field", "anime", "16:9")
+
+    matches = library.find_similar("red roof at night with a cat", "anime", "16:9", min_score=0.6)
+    assert [match["id"] for match in matches] == [cat]
+    assert matches[0]["score"] == pytest.approx(1.0)
+    assert library.find_similar("cat on a red roof at night", "realistic", "16:9") == []
+    assert library.find_similar("cat in a green field", "anime", "16:9", min_score=0.9) == []
+    library.close()
+
+
+def test_find_similar_matches_brute_force(tmp_path):
+    rng = random.Random(7)
+    common = ["cinematic", "lighting", "8k", "anime", "style"]
+    vocab = [f"w{i}" for i in range(60)]
+    library = ImageLibrary(str(tmp_path / "library"))
+    entries = {}
+    for index in range(300):
+        prompt = " ".join(common[:rng.randint(2, 5)] + rng.sample(vocab, rng.randint(2, 8)))
+        entry_id = library.add_image(_make_image(tmp_path / f"{index}.png", index), prompt, "s", "16:9")
+        entries[entry_id] = tokenize_prompt(prompt)
+
+    for _ in range(50):
+        query = " ".join(common[:rng.randint(0, 5)] + rng.sample(vocab, rng.randint(1, 8)) + ["unseen"])
+        query_terms = tokenize_prompt(query)
+        for min_score in (0.2, 0.4, 0.6, 0.8):
+            expected = {entry_id for entry_id, terms in entries.items() if _jaccard(query_terms, terms) >= min_score}
+            found = library.find_similar(query, "s", "16:9", min_score=min_score, limit=len(entries))
+            assert {match["id"] for match in found} == expected
+            for match in found:
+                assert match["score"] == pytest.approx(_jaccard(query_terms, entries[match["id"]]))
+    library.close()
+
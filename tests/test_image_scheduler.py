@@ -0,0 +1,79 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import image_scheduler
+from image_scheduler import ImageJobScheduler
+
+
+def _waiting(scheduler, story_id, backend, served, priority=1.0):
+    state = scheduler._story_state(story_id, backend, priority)
+    state["waiting"] = 1
+    state["served"] = served
+    scheduler._publish(story_id)
+
+
+def test_story_with_least_weighted_service_goes_first(tmp_path):
+    scheduler = ImageJobScheduler(state_dir=str(tmp_path), limits={"comfyui": 1})
+    _waiting(scheduler, "big", "comfyui", served=4)
+    _waiting(scheduler, "small", "comfyui", served=1)
+    _waiting(scheduler, "vip", "comfyui", served=4, priority=4.0)
+
+    assert scheduler._is_my_turn("small", "comfyui")
+    assert scheduler._is_my_turn("vip", "comfyui")
+    assert not scheduler._is_my_turn("big", "comfyui")
+
+
+def test_backends_are_scheduled_independently(tmp_path):
+    scheduler = ImageJobScheduler(state_dir=str(tmp_path))
+    _waiting(scheduler, "big", "midjourney", served=10)
+    _waiting(scheduler, "small", "comfyui", served=0)
+
+    assert scheduler._is_my_turn("big", "midjourney")
+
+
+def test_late_story_is_not_starved(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_scheduler, "POLL_INTERVAL", 0.01)
+    scheduler = ImageJobScheduler(state_dir=str(tmp_path), limits={"comfyui": 1})
+    order = []
+
+    async def run_job(story_id):
+        async with scheduler.job("comfyui", story_id=story_id):
+            order.append(story_id)
+            await asyncio.sleep(0.05)
+
+    async def main():
+        first = [asyncio.create_task(run_job("a")) for _ in range(4)]
+        await asyncio.sleep(0.02)
+        second = [asyncio.create_task(run_job("b")) for _ in range(2)]
+        await asyncio.gather(*first, *second)
+
+    asyncio.run(main())
+    assert sorted(order) == ["a", "a", "a", "a", "b", "b"]
+    # 先到的故事已占用一个槽位，后到的故事两个任务都应在先到故事的最后一个任务之前完成调度
+    assert [i for i, story in enumerate(order) if story == "b"][-1] < 4
+    assert not list((tmp_path / "stories").glob("*.json"))
+    assert not list((tmp_path / "slots" / "comfyui").glob("*.lock"))
+
+
+def test_slot_of_dead_process_is_reclaimed(tmp_path):
+    scheduler = ImageJobScheduler(state_dir=str(tmp_path), limits={"comfyui": 1})
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    slot_dir = tmp_path / "slots" / "comfyui"
+    slot_dir.mkdir(parents=True, exist_ok=True)
+    (slot_dir / "slot_0.lock").write_text(str(dead.pid))
+
+    slot_file = scheduler._try_claim_slot("comfyui")
+    assert slot_file is not None
+    assert slot_file.read_text() == str(os.getpid())
+
+
+def test_slot_of_live_process_is_kept(tmp_path):
+    scheduler = ImageJobScheduler(state_dir=str(tmp_path), limits={"comfyui": 1})
+    slot_dir = tmp_path / "slots" / "comfyui"
+    slot_dir.mkdir(parents=True, exist_ok=True)
+    (slot_dir / "slot_0.lock").write_text(str(os.getppid()))
+
+    assert scheduler._try_claim_slot("comfyui") is None
@@ -0,0 +1,74 @@
+import math
+import random
+
+import pytest
+
+from config import config
+from video_processor import VideoProcessor, plan_scene_effects, plan_segment_frames
+
+
+def _random_scene_starts(rng, count):
+    starts, t = [], 0.0
+    for _ in range(count):
+        t += rng.uniform(0.3, 8.0)
+        starts.append(t)
+    return starts, t + rng.uniform(0.3, 8.0)
+
+
+@pytest.mark.parametrize("fps", [15, 24, 25, 30, 60])
+def test_segment_frames_sum_to_single_pass_count(fps):
+    rng = random.Random(fps)
+    for _ in range(200):
+        starts, total = _random_scene_starts(rng, rng.randint(1, 40))
+        segments = plan_segment_frames(starts, total, fps)
+        assert segments[0][0] == 0
+        assert sum(end - start for start, end in segments) == math.ceil(round(total * fps, 6))
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            assert end == start
+        assert all(end > start for start, end in segments)
+
+
+def test_segment_boundaries_snap_to_nearest_frame():
+    assert plan_segment_frames([1.01, 2.49], 3.0, 30) == [(0, 30), (30, 75), (75, 90)]
+
+
+def test_boundaries_outside_timeline_are_dropped():
+    assert plan_segment_frames([0.0, 0.01, 5.0, 10.0], 4.0, 25) == [(0, 100)]
+
+
+def test_moviepy_duration_yields_exact_frame_count():
+    np = pytest.importorskip("numpy")
+    # MoviePy 按 np.arange(0, duration, 1/fps) 取帧，渲染时长为 (n - 0.5) / fps
+    rng = random.Random(0)
+    for fps in (24, 25, 30, 60):
+        starts, total = _random_scene_starts(rng, 500)
+        for start, end in plan_segment_frames(starts, total, fps):
+            frame_count = end - start
+            assert len(np.arange(0, (frame_count - 0.5) / fps, 1.0 / fps)) == frame_count
+
+
+def test_scene_effects_are_stable_and_leave_global_random_alone():
+    random.seed(123)
+    expected_next = random.random()
+    random.seed(123)
+    effects = plan_scene_effects(50)
+    assert random.random() == expected_next
+    assert effects == plan_scene_effects(50)
+    # 场景数量不同时，前面场景的效果不变
+    assert plan_scene_effects(10) == effects[:10]
+    for effect_type, pan_direction in effects:
+        assert effect_type in (0, 1, 2)
+        assert 0 <= pan_direction <= 3
+        if effect_type != 0:
+            assert pan_direction == 0
+
+
+def test_explicit_resolution_leaves_global_config_alone():
+    configured = config.get("video", "resolution", default=(1920, 1080))
+    processor = VideoProcessor(engine="ffmpeg", resolution=(1080, 1920))
+    assert processor.resolution == (1080, 1920)
+    proxy = VideoProcessor(engine="ffmpeg", proxy=True, resolution=(1080, 1920))
+    proxy_height = int((config.get("video", "proxy", default={}) or {}).get("height", 360))
+    assert proxy.resolution[1] == proxy_height
+    assert proxy.resolution[0] == int(round(1080 * proxy_height / 1920 / 2)) * 2
+    assert config.get("video", "resolution", default=(1920, 1080)) == configured
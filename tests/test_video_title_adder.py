@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from video_title_adder import _write_title_timeline
+
+
+def _read_timeline(timeline_file):
+    """解析 ffconcat 列表为 [(文件名, 时长或None), ...]"""
+    entries = []
+    with open(timeline_file, encoding="utf-8") as f:
+        assert f.readline().strip() == "ffconcat version 1.0"
+        for line in f:
+            key, value = line.strip().split(" ", 1)
+            if key == "file":
+                entries.append([os.path.basename(value.strip("'")), None])
+            else:
+                entries[-1][1] = float(value)
+    return entries
+
+
+def _title(cache_dir, name, start, end):
+    path = os.path.join(cache_dir, f"{name}.png")
+    Image.new("RGBA", (32, 18), (255, 255, 255, 255)).save(path)
+    return start, end, name, path
+
+
+def test_timeline_splits_at_title_boundaries(tmp_path):
+    cache_dir = str(tmp_path)
+    titles = [_title(cache_dir, "a", 1.0, 3.0), _title(cache_dir, "b", 2.0, 5.0)]
+    timeline_file = str(tmp_path / "titles.ffconcat")
+    _write_title_timeline(titles, 32, 18, cache_dir, timeline_file)
+
+    entries = _read_timeline(timeline_file)
+    blank = "title_blank_32x18.png"
+    assert [name for name, _ in entries[:4]] == [blank, "a.png", entries[2][0], "b.png"]
+    assert entries[2][0] not in (blank, "a.png", "b.png")  # 两个标题同时可见时的合成图片
+    assert [duration for _, duration in entries[:4]] == pytest.approx([1.0, 1.0, 1.0, 2.0])
+    # 最后一个标题结束后显示透明图片，列表末尾重复最后一个文件
+    assert entries[4:] == [[blank, None], [blank, None]]
+    assert sum(duration for _, duration in entries if duration) == pytest.approx(5.0)
+
+
+def test_adjacent_segments_with_same_image_are_merged(tmp_path):
+    cache_dir = str(tmp_path)
+    first = _title(cache_dir, "a", 0.0, 2.0)
+    titles = [first, (2.0, 4.5, first[2], first[3])]
+    timeline_file = str(tmp_path / "titles.ffconcat")
+    _write_title_timeline(titles, 32, 18, cache_dir, timeline_file)
+
+    entries = _read_timeline(timeline_file)
+    assert entries[0] == ["a.png", pytest.approx(4.5)]
+    assert len(entries) == 3
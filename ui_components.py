@@ -2,6 +2,8 @@ import gradio as gr
 from typing import Dict, List, Any, Optional, Union
 from video_processing import process_story
 from ui_helpers import list_input_files, get_available_fonts, list_all_fonts, list_character_images, format_text_for_shorts_gpt
+from encoding_profiles import get_profile_names, DEFAULT_PROFILE, PROGRESSIVE_MODES
+from add_subtitles import SUBTITLE_MODES
 
 # 常量定义
 DEFAULT_FONT_SIZE = 18
@@ -16,6 +18,7 @@ COMFYUI_STYLES = ["默认(电影)", "水墨", "清新二次元", "古风", "童
 IMAGE_STYLE_TYPES = ["无风格", "电影级品质", "水墨画风格", "油画风格", "动漫风格", "写实风格", "梦幻风格", "自定义风格"]
 VIDEO_RESOLUTIONS = ["16:9 (1920x1080)", "9:16 (1080x1920)"]
 VIDEO_ENGINES = ["auto", "ffmpeg", "moviepy"]
+VIDEO_PROFILES = get_profile_names()
 
 def show_upload_panel() -> gr.components.Component:
     """显示上传图片面板
@@ -189,6 +192,13 @@ def _create_subtitle_settings() -> tuple:
             step=1,
             info="调整字幕距离底部的距离 (单位: 像素)"
             )
+    with gr.Row():
+        subtitle_mode = gr.Radio(
+            choices=SUBTITLE_MODES,
+            value="burn",
+            label="字幕输出方式",
+            info="burn 烧录进画面；soft 封装为可开关的字幕轨，sidecar 输出外挂 .srt，两者都不重新编码视频 (字体样式仅对 burn 有效)"
+        )
     
     # 字体说明和管理收起到折叠面板中
     with gr.Accordion("字体管理", open=False):
@@ -208,7 +218,7 @@ def _create_subtitle_settings() -> tuple:
             visible=False
         )
     
-    return font_name, refresh_fonts_button, font_size, font_color, bg_opacity, subtitle_vertical_offset, show_all_fonts_button, all_fonts_output
+    return font_name, refresh_fonts_button, font_size, font_color, bg_opacity, subtitle_vertical_offset, subtitle_mode, show_all_fonts_button, all_fonts_output
 
 def _create_voice_settings() -> tuple:
     """创建声音设置区域
@@ -345,7 +355,7 @@ def create_main_ui() -> Dict[str, Any]:
                     voice_dropdown, speed_scale_slider_component = _create_voice_settings()
                     
                     # 创建字幕设置区域 - 直接展开而不是放在折叠面板中
-                    font_name, refresh_fonts_button, font_size, font_color, bg_opacity, subtitle_vertical_offset, show_all_fonts_button, all_fonts_output = _create_subtitle_settings()
+                    font_name, refresh_fonts_button, font_size, font_color, bg_opacity, subtitle_vertical_offset, subtitle_mode, show_all_fonts_button, all_fonts_output = _create_subtitle_settings()
                 
                 with gr.TabItem("角色与效果"):
                     # 创建其他设置区域 - 直接展开而不是放在折叠面板中
@@ -360,6 +370,24 @@ def create_main_ui() -> Dict[str, Any]:
                         label="视频处理引擎",
                         info="选择视频生成引擎，auto会自动选择最适合的引擎"
                     )
+                    video_profile = gr.Radio(
+                        choices=VIDEO_PROFILES,
+                        value=DEFAULT_PROFILE,
+                        label="视频编码配置",
+                        info="draft 出片最快，final 画质最高但最慢，standard 为 libx264 默认参数 (默认)"
+                    )
+                    progressive_output = gr.Radio(
+                        choices=PROGRESSIVE_MODES,
+                        value="off",
+                        label="边渲染边观看",
+                        info="fmp4 输出分片MP4，hls 另外输出HLS播放列表，视频开始写入后即可在右侧播放"
+                    )
+                    output_resolutions = gr.Textbox(
+                        value="",
+                        label="多画幅输出",
+                        placeholder="例如: 1920x1080,1080x1920",
+                        info="填写多个分辨率时一次生成所有画幅版本 (会说话的角色改用静态角色图片)，留空则只输出一个版本"
+                    )
                     # --- Add new Slider for Max Scene Duration ---
                     max_scene_duration_slider_component = gr.Slider( # Renamed variable to avoid conflict if already in components
                         minimum=1.0, maximum=20.0, value=5.0, step=0.5,
@@ -367,6 +395,11 @@ def create_main_ui() -> Dict[str, Any]:
                         info="控制单个场景的最长持续时间，值越小场景越多，节奏越快。",
                         interactive=True
                     )
+                    draft_preview = gr.Checkbox(
+                        label="草稿预览模式 (仅ComfyUI)",
+                        value=False,
+                        info="先用低质量图像快速生成可预览的视频，再在后台升级为高质量图像并重新合成"
+                    )
                 with gr.Column(scale=2):
                     one_click_process_button = gr.Button("一键生成", variant="primary", size="lg")
         
@@ -397,12 +430,17 @@ def create_main_ui() -> Dict[str, Any]:
         "font_color": font_color,
         "bg_opacity": bg_opacity,
         "subtitle_vertical_offset": subtitle_vertical_offset,
+        "subtitle_mode": subtitle_mode,
         "show_all_fonts_button": show_all_fonts_button,
         "all_fonts_output": all_fonts_output,
         "voice_dropdown": voice_dropdown,
         "speed_scale_slider": speed_scale_slider_component,
         "video_engine": video_engine,
+        "video_profile": video_profile,
+        "progressive_output": progressive_output,
+        "output_resolutions": output_resolutions,
         "max_scene_duration_slider": max_scene_duration_slider_component,
+        "draft_preview": draft_preview,
         "one_click_process_button": one_click_process_button,
         "output_text": output_text,
         "output_video": output_video
@@ -359,6 +359,7 @@ def cleanup_output_directories() -> str:
     root_files_to_clean = [
         f"{OUTPUT_DIR}/key_scenes.json",
         f"{OUTPUT_DIR}/base_video.mp4",
+        f"{OUTPUT_DIR}/audio/audio_track.m4a",
         f"{OUTPUT_DIR}/final_video_moviepy.mp4",
         f"{OUTPUT_DIR}/temp_video_with_character.mp4"
     ]
@@ -15,6 +15,7 @@ import io
 from ui_helpers import extract_voice_id, cleanup_output_directories
 from config import config
 import shutil
+from ffmpeg_runner import parse_progress_marker, parse_live_preview_marker
 
 # 常量定义
 INPUT_TEXTS_DIR = "input_texts"
@@ -67,6 +68,11 @@ class VideoProcessingConfig:
     # 视频设置
     video_engine: str = "auto"
     video_resolution: str = "auto"
+    draft_preview: bool = False
+    video_profile: Optional[str] = None
+    subtitle_mode: str = "burn"
+    progressive_output: str = "off"
+    output_resolutions: str = ""
 
 def validate_inputs(config: VideoProcessingConfig) -> Optional[str]:
     """验证输入配置
@@ -149,10 +155,22 @@ def build_command(input_file: str, config: VideoProcessingConfig, subtitle_verti
     
     # 添加配置参数
     _add_audio_params(cmd, service_type, speaker_id, voice_preset, speed_scale)
-    _add_video_params(cmd, config.video_engine)
+    _add_video_params(cmd, config.video_engine, config.video_profile)
+    if config.draft_preview and config.image_generator_type == "comfyui":
+        cmd.append("--draft_preview")
+        print("添加参数: --draft_preview (草稿预览模式)")
     _add_image_params(cmd, config.image_generator_type, config.aspect_ratio, 
                       config.image_style_type, config.custom_style, config.comfyui_style)
     _add_subtitle_params(cmd, config.font_name, config.font_size, config.font_color, config.bg_opacity, subtitle_vertical_offset)
+    if config.subtitle_mode and config.subtitle_mode != "burn":
+        cmd.extend(["--subtitle_mode", config.subtitle_mode])
+        print(f"添加字幕输出方式: --subtitle_mode {config.subtitle_mode}")
+    if config.progressive_output and config.progressive_output != "off":
+        cmd.extend(["--progressive_output", config.progressive_output])
+        print(f"添加渐进输出参数: --progressive_output {config.progressive_output}")
+    if config.output_resolutions and config.output_resolutions.strip():
+        cmd.extend(["--output_resolutions", config.output_resolutions.strip()])
+        print(f"添加多画幅输出参数: --output_resolutions {config.output_resolutions.strip()}")
     _add_character_params(cmd, config.character_image, config.preserve_line_breaks, 
                          config.talking_character, config.closed_mouth_image, 
                          config.open_mouth_image, config.audio_sensitivity)
@@ -196,16 +214,20 @@ def _add_audio_params(cmd: List[str], service_type: str, speaker_id: int, voice_
         cmd.extend(["--speed", str(speed_scale)])
         print(f"添加语速调整: {speed_scale}")
 
-def _add_video_params(cmd: List[str], video_engine: str) -> None:
+def _add_video_params(cmd: List[str], video_engine: str, video_profile: Optional[str] = None) -> None:
     """添加视频相关参数
     
     Args:
         cmd: 命令行参数列表
         video_engine: 视频引擎
+        video_profile: 视频编码配置名称
     """
     # 添加视频引擎参数
     cmd.extend(["--video_engine", video_engine])
     print(f"添加视频引擎参数: --video_engine {video_engine}")
+    if video_profile:
+        cmd.extend(["--video_profile", video_profile])
+        print(f"添加视频编码配置参数: --video_profile {video_profile}")
 
 def _add_image_params(cmd: List[str], generator_type: str, aspect_ratio: str, 
                      style_type: str, custom_style: Optional[str], comfyui_style: Optional[str]) -> None:
@@ -395,7 +417,12 @@ def process_story(
     closed_mouth_image: Optional[str] = None, 
     open_mouth_image: Optional[str] = None, 
     audio_sensitivity: float = DEFAULT_AUDIO_SENSITIVITY, 
-    max_scene_duration_from_ui: float = 5.0 
+    max_scene_duration_from_ui: float = 5.0,
+    draft_preview: bool = False,
+    video_profile: Optional[str] = None,
+    subtitle_mode: str = "burn",
+    progressive_output: str = "off",
+    output_resolutions: str = ""
 ) -> Generator[Union[Tuple[str, Optional[str], str]], None, None]:
     """处理故事文本并生成视频，捕获日志信息
         
@@ -440,6 +467,11 @@ def process_story(
             voice_dropdown=voice_dropdown, video_engine=video_engine, video_resolution=video_resolution,
             talking_character=talking_character, closed_mouth_image=closed_mouth_image,
             open_mouth_image=open_mouth_image, audio_sensitivity=audio_sensitivity,
+            draft_preview=draft_preview,
+            video_profile=video_profile,
+            subtitle_mode=subtitle_mode,
+            progressive_output=progressive_output,
+            output_resolutions=output_resolutions,
             # Ensure mj_concurrency, speed_scale, no_regenerate_images are handled by config or passed separately
     )
     
@@ -493,22 +525,46 @@ def process_story(
             "处理过程中发生错误": "处理失败！", # Add error detection
         }
         current_stage_message = "正在执行..." # Initial stage message
+        draft_video_path = None # 草稿预览模式下先生成的草稿视频
+        process_notices = [] # 处理过程中的降级提示，显示在最终状态中
 
         if process.stdout: # Correct indentation
             for line in iter(process.stdout.readline, ''):
                 if line:
+                    cleaned_line = line.strip()
+                    # ffmpeg 编码进度只更新状态显示，不写入日志区域
+                    # 渐进输出开始写入后立即交给播放器，无需等待最终视频
+                    preview_path = parse_live_preview_marker(cleaned_line)
+                    if preview_path:
+                        draft_video_path = preview_path
+                        yield f"{current_stage_message}\n正在渲染，可边渲染边观看", draft_video_path, log_stream.getvalue()
+                        continue
+                    progress_text = parse_progress_marker(cleaned_line)
+                    if progress_text:
+                        yield f"{current_stage_message}\n编码进度: {progress_text}", draft_video_path, log_stream.getvalue()
+                        continue
                     log_stream.write(line) 
                     
                     # --- Check for stage update --- 
-                    cleaned_line = line.strip()
                     for keyword, stage_msg in stage_keywords.items():
                         if keyword in cleaned_line:
                             current_stage_message = stage_msg
                             logger.info(f"检测到新阶段: {current_stage_message}") # Log stage change
                             break # Use the first keyword found on the line
                     
+                    # 草稿视频生成后立即返回给界面，高质量版本仍在后台生成
+                    if "DRAFT_VIDEO_PATH_MARKER:" in cleaned_line:
+                        draft_video_path = cleaned_line.split("DRAFT_VIDEO_PATH_MARKER:", 1)[1].strip()
+                        current_stage_message = "草稿视频已生成，正在后台生成高质量版本..."
+                    
+                    if "PROCESS_NOTICE_MARKER:" in cleaned_line:
+                        notice = cleaned_line.split("PROCESS_NOTICE_MARKER:", 1)[1].strip()
+                        if notice not in process_notices:
+                            process_notices.append(notice)
+                        current_stage_message = f"{current_stage_message}\n注意: {notice}"
+                    
                     # Yield the potentially updated status message
-                    yield current_stage_message, None, log_stream.getvalue() 
+                    yield current_stage_message, draft_video_path, log_stream.getvalue() 
             # Ensure stdout is closed if loop finishes
             if process.stdout and not process.stdout.closed:
                 process.stdout.close()
@@ -530,6 +586,8 @@ def process_story(
         if final_video_path:
             success_msg = f"处理完成！视频已保存到: {final_video_path}"
             status_message = "处理完成！" # Update final status on success
+            if process_notices:
+                status_message += "\n" + "\n".join(f"注意: {notice}" for notice in process_notices)
             logger.info(success_msg)
         else:
             error_msg = "错误: 处理完成，但未找到输出视频文件。"
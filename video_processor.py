@@ -12,12 +12,16 @@ import time
 import re
 import math
 import random
+import bisect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional, Union
 
 # 检查MoviePy可用性
 MOVIEPY_AVAILABLE = False
 try:
+    import numpy as np
     from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips
     try:
         from moviepy.video.fx.resize import resize
@@ -31,6 +35,9 @@ except ImportError:
 from config import config
 from errors import get_logger, error_handler, VideoProcessingError, FileError
 from services import VideoProcessorService, ServiceFactory
+from encoding_profiles import ffmpeg_video_args, moviepy_write_kwargs
+from ffmpeg_runner import run_ffmpeg
+from media_probe import register_media, register_derived, get_media_info, get_duration, get_video_size
 
 # 创建日志记录器
 logger = get_logger("video_processor")
@@ -38,7 +45,8 @@ logger = get_logger("video_processor")
 class VideoProcessor(VideoProcessorService):
     """统一的视频处理器类，支持使用FFmpeg或MoviePy处理视频"""
     
-    def __init__(self, engine: str = "auto", effect_video_dir: Optional[str] = None):
+    def __init__(self, engine: str = "auto", effect_video_dir: Optional[str] = None, proxy: bool = False,
+                 profile: Optional[str] = None, resolution: Optional[Tuple[int, int]] = None):
         """初始化视频处理器
         
         Args:
@@ -47,14 +55,33 @@ class VideoProcessor(VideoProcessorService):
                    - "moviepy": 使用MoviePy库
                    - "auto": 自动选择可用的引擎，优先FFmpeg
             effect_video_dir: 特效视频素材所在的目录 (可选)
+            proxy: 代理预览模式，按 video.proxy 配置以低分辨率、低帧率渲染，
+                   场景片段缓存在单独的目录中，不影响正式渲染的缓存
+            profile: 编码配置名称，默认使用 video.encoding_profile (代理预览模式默认使用 video.proxy 中的配置)。
+                     编码配置只属于这个处理器，不修改全局配置，同一进程中的其他渲染不受影响
+            resolution: 输出分辨率 (宽, 高)，默认使用 video.resolution；代理预览模式按此分辨率的宽高比缩小
         """
         self.engine = self._select_engine(engine)
-        # 从配置中获取分辨率设置
-        self.resolution = config.get("video", "resolution", default=(1920, 1080))
+        # 未指定时从配置中获取分辨率设置
+        self.resolution = tuple(resolution) if resolution else config.get("video", "resolution", default=(1920, 1080))
         self.fps = config.get("video", "fps", default=30)
         self.max_retries = config.get("processing", "max_retries", default=3)
         self.retry_delay = config.get("processing", "retry_delay", default=1.0)
+        self.scene_encode_threads = max(1, int(config.get("video", "scene_encode_threads", default=2)))
         self.effect_video_dir = effect_video_dir
+        self.proxy = proxy
+        self.clips_dir_name = "scene_clips"
+        self.profile = profile or config.get("video", "encoding_profile")
+        if proxy:
+            proxy_settings = config.get("video", "proxy", default={}) or {}
+            proxy_height = int(proxy_settings.get("height", 360))
+            # 保持宽高比，宽度取偶数 (yuv420p 要求)
+            proxy_width = int(round(self.resolution[0] * proxy_height / self.resolution[1] / 2)) * 2
+            self.resolution = (proxy_width, proxy_height)
+            self.fps = int(proxy_settings.get("fps", 15))
+            self.clips_dir_name = "scene_clips_proxy"
+            self.profile = profile or proxy_settings.get("profile", "draft")
+            logger.info(f"代理预览模式: {proxy_width}x{proxy_height}@{self.fps}fps")
         if self.effect_video_dir:
             logger.info(f"特效视频目录设置为: {self.effect_video_dir}")
             
@@ -90,7 +117,8 @@ class VideoProcessor(VideoProcessorService):
             # 再次尝试导入 MoviePy
             if not MOVIEPY_AVAILABLE:
                 try:
-                    global VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips, resize
+                    global VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips, resize, np
+                    import numpy as np
                     from moviepy.editor import VideoFileClip, AudioFileClip, ImageClip, concatenate_videoclips
                     try:
                         from moviepy.video.fx.resize import resize
@@ -141,6 +169,35 @@ class VideoProcessor(VideoProcessorService):
             logger.warning(f"FFmpeg不可用: {e}")
             return False
     
+    def _scene_encode_workers(self) -> int:
+        """并行编码场景片段的进程数，默认按CPU核心数和每片段线程数计算"""
+        workers = config.get("video", "scene_encode_workers", default=0)
+        if workers and workers > 0:
+            return int(workers)
+        return max(1, (os.cpu_count() or 1) // self.scene_encode_threads)
+    
+    def _run_ffmpeg(self, cmd: List[str], live_preview: bool = False) -> subprocess.CompletedProcess:
+        """执行ffmpeg命令并上报进度，失败时抛出 CalledProcessError"""
+        return run_ffmpeg(cmd, text=False, live_preview=live_preview)
+    
+    def _file_hash(self, file_path: str) -> str:
+        """计算文件内容的SHA1，用作场景片段缓存的输入签名"""
+        digest = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _load_clip_manifest(self, manifest_file: str) -> Dict[str, str]:
+        """读取场景片段缓存清单 {片段路径: 输入签名}"""
+        if os.path.exists(manifest_file):
+            try:
+                with open(manifest_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"读取场景片段缓存清单失败，将重新编码所有场景: {e}")
+        return {}
+    
     def _with_retry(self, func, *args, error_msg="操作失败", **kwargs):
         """带有重试功能的函数调用
         
@@ -175,255 +232,78 @@ class VideoProcessor(VideoProcessorService):
         else:
             raise VideoProcessingError(f"{error_msg}，未知错误")
     
-    @error_handler(error_message="创建基础视频失败")
-    def create_base_video(self, audio_info_file: str, output_video: str) -> str:
-        """创建基础视频（带有纯色背景和音频）
+    @error_handler(error_message="创建音轨失败")
+    def create_audio_track(self, audio_info_file: str, output_audio: str) -> str:
+        """合并所有语音文件并一次性编码为AAC音轨
+        
+        后续的场景合成、角色叠加、字幕、标题和特效步骤都直接流复制这条音轨，
+        不再需要黑色基础视频，也避免AAC多次编码带来的音质损失。
         
         Args:
             audio_info_file: 包含音频信息的JSON文件路径
-            output_video: 输出视频文件路径
+            output_audio: 输出音轨文件路径 (.m4a)
             
         Returns:
-            str: 输出视频文件路径
+            str: 输出音轨文件路径
         """
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_video)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-        
-        # 基础视频创建始终使用FFmpeg，不考虑引擎设置
-        logger.info("创建基础视频 (始终使用FFmpeg引擎)")
-        try:
-            return self._create_base_video_ffmpeg(audio_info_file, output_video)
-        except Exception as e:
-            logger.error(f"使用FFmpeg创建基础视频失败: {str(e)}")
-            # 如果ffmpeg失败且MoviePy可用，仍尝试使用它作为备选
-            if MOVIEPY_AVAILABLE:
-                logger.info("尝试使用MoviePy作为基础视频创建的备选方案...")
-                return self._create_base_video_moviepy(audio_info_file, output_video)
-            else:
-                raise VideoProcessingError("创建基础视频失败，且无可用备选方案", details={"error": str(e)})
-    
-    def _create_base_video_ffmpeg(self, audio_info_file: str, output_video: str) -> str:
-        """使用FFmpeg创建基础视频"""
-        # 读取音频信息
         with open(audio_info_file, "r", encoding="utf-8") as f:
             audio_info = json.load(f)
         
-        total_duration = audio_info.get("total_duration", 0)
-        
-        # 检查是否有直接的output_audio字段
-        audio_file = audio_info.get("output_audio")
-        
-        # 如果没有output_audio字段，尝试合并所有音频文件
-        if not audio_file or not os.path.exists(audio_file):
-            logger.info("未找到合并后的音频文件，将尝试合并所有音频文件...")
-            
-            # 创建临时合并文件
-            merged_audio = os.path.join(os.path.dirname(audio_info_file), "merged_audio.wav")
-            
-            # 创建音频文件列表
-            audio_files = []
+        # 优先使用已合并的音频，否则按顺序拼接所有语音文件
+        audio_files = []
+        merged_audio = audio_info.get("output_audio")
+        if merged_audio and os.path.exists(merged_audio):
+            audio_files.append(merged_audio)
+        else:
             for audio_info_item in audio_info.get("audio_files", []):
                 audio_item_file = audio_info_item.get("audio_file")
                 if audio_item_file:
                     # 确保路径是绝对路径
                     if not os.path.isabs(audio_item_file):
                         audio_item_file = os.path.join(os.path.dirname(audio_info_file), audio_item_file)
-                    
                     if os.path.exists(audio_item_file):
-                        audio_files.append(audio_item_file)
-            
-            if not audio_files:
-                raise FileNotFoundError("无法找到任何音频文件，无法继续创建视频")
-            
-            # 创建临时文件来保存合并列表
-            with open("temp_audio_list.txt", "w", encoding="utf-8") as f:
-                for file in audio_files:
-                    f.write(f"file '{file}'\n")
-            
-            # 使用ffmpeg合并音频文件
-            try:
-                subprocess.run(
-                    ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", "temp_audio_list.txt", "-c", "copy", merged_audio],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True,
-                    shell=(platform.system() == "Windows")
-                )
-                logger.info(f"成功合并音频文件: {merged_audio}")
-                
-                # 更新音频文件路径
-                audio_file = merged_audio
-            except subprocess.CalledProcessError as e:
-                logger.error(f"合并音频文件失败: {e.stderr.decode() if e.stderr else str(e)}")
-                if os.path.exists("temp_audio_list.txt"):
-                    os.remove("temp_audio_list.txt")
-                raise
-            except Exception as e:
-                logger.error(f"合并音频文件时发生错误: {str(e)}")
-                if os.path.exists("temp_audio_list.txt"):
-                    os.remove("temp_audio_list.txt")
-                raise
+                        audio_files.append(os.path.abspath(audio_item_file))
+        
+        if not audio_files:
+            raise FileError("无法找到任何音频文件，无法继续创建视频", details={"audio_info_file": audio_info_file})
+        total_duration = audio_info.get("total_duration") or None
         
-        if not audio_file or not os.path.exists(audio_file):
-            raise FileNotFoundError(f"最终音频文件不存在: {audio_file}")
+        output_dir = os.path.dirname(output_audio)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
         
-        logger.info(f"使用音频文件: {audio_file}")
+        list_file = f"{output_audio}.txt"
+        with open(list_file, "w", encoding="utf-8") as f:
+            for file in audio_files:
+                f.write(f"file '{os.path.abspath(file)}'\n")
         
-        # 使用ffmpeg创建基础视频
         try:
-            # 构建ffmpeg命令
-            cmd = [
+            self._run_ffmpeg([
                 "ffmpeg", "-y",
-                "-f", "lavfi",
-                "-i", f"color=c=black:s={self.resolution[0]}x{self.resolution[1]}:r={self.fps}",
-                "-i", audio_file,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-shortest",
-                output_video
-            ]
-            
-            # 执行命令
-            subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                shell=(platform.system() == "Windows")
-            )
-            
-            logger.info(f"成功创建基础视频: {output_video}")
-            return output_video
-            
+                "-f", "concat", "-safe", "0", "-i", list_file,
+                "-vn", "-c:a", "aac",
+                output_audio
+            ])
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg命令执行失败: {e.stderr.decode() if e.stderr else str(e)}")
-            raise VideoProcessingError("创建基础视频失败", details={"ffmpeg_error": str(e)})
-        except Exception as e:
-            logger.error(f"创建基础视频时发生错误: {str(e)}")
-            raise VideoProcessingError("创建基础视频失败", details={"error": str(e)})
+            raise VideoProcessingError("创建音轨失败", details={"ffmpeg_error": str(e)})
+        finally:
+            if os.path.exists(list_file):
+                os.remove(list_file)
+        
+        register_media(output_audio, duration=total_duration, video_streams=0, audio_streams=1, subtitle_streams=0)
+        logger.info(f"成功创建音轨: {output_audio} (合并 {len(audio_files)} 个音频文件)")
+        return output_audio
     
-    def _create_base_video_moviepy(self, audio_info_file: str, output_video: str) -> str:
-        """使用MoviePy创建基础视频"""
-        # 读取音频信息
-        with open(audio_info_file, "r", encoding="utf-8") as f:
-            audio_info = json.load(f)
-        
-        # 检查是否有直接的output_audio字段
-        audio_file = audio_info.get("output_audio")
-        
-        # 如果没有output_audio字段，尝试合并所有音频文件
-        if not audio_file or not os.path.exists(audio_file):
-            logger.info("未找到合并后的音频文件，将尝试合并所有音频文件...")
-            
-            # 创建临时合并文件
-            merged_audio = os.path.join(os.path.dirname(audio_info_file), "merged_audio.wav")
-            
-            # 使用ffmpeg合并文件（更简单）
-            try:
-                # 先创建合并列表
-                audio_files = []
-                for audio_info_item in audio_info.get("audio_files", []):
-                    audio_item_file = audio_info_item.get("audio_file")
-                    if audio_item_file:
-                        # 确保路径是绝对路径
-                        if not os.path.isabs(audio_item_file):
-                            audio_item_file = os.path.join(os.path.dirname(audio_info_file), audio_item_file)
-                        
-                        if os.path.exists(audio_item_file):
-                            audio_files.append(audio_item_file)
-                
-                if not audio_files:
-                    raise FileNotFoundError("无法找到任何音频文件，无法继续创建视频")
-                
-                # 使用MoviePy合并音频文件
-                audio_clips = [AudioFileClip(file) for file in audio_files]
-                final_audio = concatenate_videoclips(audio_clips)
-                final_audio.write_audiofile(merged_audio)
-                
-                # 关闭音频剪辑
-                for clip in audio_clips:
-                    clip.close()
-                final_audio.close()
-                
-                logger.info(f"成功合并音频文件: {merged_audio}")
-                
-                # 更新音频文件路径
-                audio_file = merged_audio
-            except Exception as e:
-                logger.error(f"合并音频文件失败: {str(e)}")
-                
-                # 尝试使用FFmpeg作为备选
-                logger.info("尝试使用FFmpeg合并音频文件...")
-                with open("temp_audio_list.txt", "w", encoding="utf-8") as f:
-                    for file in audio_files:
-                        f.write(f"file '{file}'\n")
-                
-                try:
-                    subprocess.run(
-                        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", "temp_audio_list.txt", "-c", "copy", merged_audio],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        check=True,
-                        shell=(platform.system() == "Windows")
-                    )
-                    logger.info(f"成功使用FFmpeg合并音频文件: {merged_audio}")
-                    
-                    # 更新音频文件路径
-                    audio_file = merged_audio
-                except Exception as e2:
-                    logger.error(f"使用FFmpeg合并音频文件失败: {str(e2)}")
-                    raise
-                finally:
-                    if os.path.exists("temp_audio_list.txt"):
-                        os.remove("temp_audio_list.txt")
-        
-        if not audio_file or not os.path.exists(audio_file):
-            raise FileNotFoundError(f"最终音频文件不存在: {audio_file}")
-        
-        logger.info(f"使用音频文件: {audio_file}")
-        
-        # 创建音频剪辑
-        audio_clip = AudioFileClip(audio_file)
-        
-        # 使用配置的分辨率设置
-        width, height = self.resolution
-        logger.info(f"创建基础视频，使用分辨率: {width}x{height}")
-        
-        # 创建黑色背景视频
-        black_clip = ImageClip(
-            (width, height), 
-            color=(0, 0, 0), 
-            duration=audio_clip.duration
-        )
-        
-        # 添加音频
-        video_clip = black_clip.set_audio(audio_clip)
-        
-        # 导出视频
-        video_clip.write_videofile(
-            output_video,
-            codec="libx264",
-            audio_codec="aac",
-            fps=24
-        )
-        
-        # 清理
-        video_clip.close()
-        audio_clip.close()
-        
-        return output_video
-    
-    def create_video_with_scenes(self, key_scenes_file: str, base_video: str, output_video: str, use_fade_transitions: bool = True) -> str:
+    def create_video_with_scenes(self, key_scenes_file: str, audio_track: str, output_video: str, use_fade_transitions: bool = True) -> str:
         """
         使用场景图片创建视频
         
         Args:
             key_scenes_file: 包含场景信息的JSON文件路径
-            base_video: 基础视频文件路径
+            audio_track: 音轨文件路径 (由 create_audio_track 生成，旧的基础视频同样可用)
             output_video: 输出视频文件路径
-            use_fade_transitions: 是否为MoviePy场景切换使用淡入淡出效果
+            use_fade_transitions: 是否为场景切换使用淡入淡出效果
             
         Returns:
             str: 输出视频文件路径
@@ -431,28 +311,86 @@ class VideoProcessor(VideoProcessorService):
         # 根据选择的引擎调用不同的实现
         if self.engine == "ffmpeg":
             try:
-                return self._create_video_with_scenes_ffmpeg(key_scenes_file, base_video, output_video)
+                return self._create_video_with_scenes_ffmpeg(key_scenes_file, audio_track, output_video, use_fade_transitions=use_fade_transitions)
             except Exception as e:
                 logger.error(f"使用FFmpeg处理场景视频失败: {str(e)}")
                 if MOVIEPY_AVAILABLE:
                     logger.info("尝试使用MoviePy作为备选...")
-                    return self._create_video_with_scenes_moviepy(key_scenes_file, base_video, output_video, use_fade_transitions=use_fade_transitions)
+                    return self._create_video_with_scenes_moviepy(key_scenes_file, audio_track, output_video, use_fade_transitions=use_fade_transitions)
                 else:
                     raise
         else:  # moviepy
             if not MOVIEPY_AVAILABLE:
                 logger.warning("MoviePy不可用，尝试使用FFmpeg作为备选...")
-                return self._create_video_with_scenes_ffmpeg(key_scenes_file, base_video, output_video)
+                return self._create_video_with_scenes_ffmpeg(key_scenes_file, audio_track, output_video, use_fade_transitions=use_fade_transitions)
             
             try:
-                return self._create_video_with_scenes_moviepy(key_scenes_file, base_video, output_video, use_fade_transitions=use_fade_transitions)
+                return self._create_video_with_scenes_moviepy(key_scenes_file, audio_track, output_video, use_fade_transitions=use_fade_transitions)
             except Exception as e:
                 logger.error(f"使用MoviePy处理场景视频失败: {str(e)}")
                 logger.info("尝试使用FFmpeg作为备选...")
-                return self._create_video_with_scenes_ffmpeg(key_scenes_file, base_video, output_video)
+                return self._create_video_with_scenes_ffmpeg(key_scenes_file, audio_track, output_video, use_fade_transitions=use_fade_transitions)
+    
+    def _build_ken_burns_filter(self, frames: int, effect_type: int, pan_direction: int, use_fade_transitions: bool) -> str:
+        """构建与MoviePy引擎相同效果的 zoompan/crop/fade 滤镜链
+        
+        图片先按安全边距放大并居中裁剪到视频宽高比，再由 zoompan 逐帧选取可见区域。
+        为减小 zoompan 坐标取整带来的抖动，裁剪后的图片按2倍超采样。
+        
+        Args:
+            frames: 场景输出帧数 (由 plan_segment_frames 按累计边界确定)
+            effect_type: 0=缓慢平移, 1=缓慢放大, 2=缓慢缩小
+            pan_direction: 平移方向 0=左到右, 1=右到左, 2=上到下, 3=下到上
+            use_fade_transitions: 是否添加淡入淡出
+            
+        Returns:
+            str: 滤镜字符串
+        """
+        video_width, video_height = self.resolution
+        safe_margin_factor = 1.15
+        supersample = 2
+        cover_width = int(video_width * safe_margin_factor * supersample) // 2 * 2
+        cover_height = int(video_height * safe_margin_factor * supersample) // 2 * 2
+        duration = frames / self.fps
+        progress = f"on/{frames}"
+        
+        # zoompan 的 zoom 相对于裁剪后的图片，安全边距对应 zoom=1.15
+        if effect_type == 1:  # 缓慢放大 1.0 -> 1.03
+            zoom = f"{safe_margin_factor}*(1+0.03*{progress})"
+        elif effect_type == 2:  # 缓慢缩小，从安全边距的80%缩小到1.005
+            start_scale = 1.0 + (safe_margin_factor - 1.0) * 0.8
+            zoom = f"{safe_margin_factor}*({start_scale}+({1.005 - start_scale})*{progress})"
+        else:
+            zoom = f"{safe_margin_factor}"
+        
+        x = "(iw-iw/zoom)/2"
+        y = "(ih-ih/zoom)/2"
+        if effect_type == 0:  # 缓慢平移，幅度为图片短边的3%
+            pan_distance = min(cover_width, cover_height) * 0.03
+            if pan_direction == 0:  # 从左到右
+                x += f"+{pan_distance / 2:.2f}-{pan_distance:.2f}*{progress}"
+            elif pan_direction == 1:  # 从右到左
+                x += f"-{pan_distance / 2:.2f}+{pan_distance:.2f}*{progress}"
+            elif pan_direction == 2:  # 从上到下
+                y += f"+{pan_distance / 2:.2f}-{pan_distance:.2f}*{progress}"
+            else:  # 从下到上
+                y += f"-{pan_distance / 2:.2f}+{pan_distance:.2f}*{progress}"
+        
+        filters = [
+            f"scale={cover_width}:{cover_height}:force_original_aspect_ratio=increase",
+            f"crop={cover_width}:{cover_height}",
+            f"zoompan=z='{zoom}':x='{x}':y='{y}':d={frames}:s={video_width}x{video_height}:fps={self.fps}"
+        ]
+        if use_fade_transitions:
+            # 较短场景使用较短的淡入淡出时间：最长0.5秒，或者场景时长的1/10
+            fade_duration = min(0.5, duration / 10)
+            filters.append(f"fade=t=in:st=0:d={fade_duration:.3f}")
+            filters.append(f"fade=t=out:st={max(0.0, duration - fade_duration):.3f}:d={fade_duration:.3f}")
+        filters.append("format=yuv420p")
+        return ",".join(filters)
     
-    def _create_video_with_scenes_ffmpeg(self, key_scenes_file: str, base_video: str, output_video: str) -> str:
-        """使用FFmpeg创建带有场景的视频"""
+    def _create_video_with_scenes_ffmpeg(self, key_scenes_file: str, audio_track: str, output_video: str, use_fade_transitions: bool = True) -> str:
+        """使用FFmpeg创建带有场景的视频，使用 zoompan 实现与MoviePy相同的电影级动画效果"""
         try:
             # 读取场景信息
             with open(key_scenes_file, "r", encoding="utf-8") as f:
@@ -462,104 +400,113 @@ class VideoProcessor(VideoProcessorService):
             temp_dir = os.path.join(os.path.dirname(output_video), "temp_scenes")
             os.makedirs(temp_dir, exist_ok=True)
             
-            # 处理每个场景
-            scene_videos = []
+            # 场景片段缓存目录：图片内容、滤镜和编码参数都未变化的场景直接复用上次编码的片段
+            clips_dir = os.path.join(os.path.dirname(output_video), self.clips_dir_name)
+            os.makedirs(clips_dir, exist_ok=True)
+            clips_manifest_file = os.path.join(clips_dir, "clips.json")
+            clips_manifest = self._load_clip_manifest(clips_manifest_file)
+            encode_args = ffmpeg_video_args(self.profile, threads=self.scene_encode_threads)
+            
+            # 与MoviePy引擎相同的效果选择 (按场景序号，不受跳过的场景影响)
+            effects = plan_scene_effects(len(scenes))
+            valid_scenes = []
             for i, scene in enumerate(scenes):
                 scene_image = scene.get("image_file")
+                if scene_image and not os.path.exists(scene_image):
+                    scene_image = os.path.join("output/images", scene_image)
                 if not scene_image or not os.path.exists(scene_image):
                     logger.warning(f"场景 {i+1} 的图片不存在: {scene_image}")
                     continue
+                valid_scenes.append((i, scene, scene_image))
+            if not valid_scenes:
+                raise VideoProcessingError("没有有效的场景视频可以处理")
+            
+            # 每个场景的帧数由累计的场景边界决定 (与MoviePy引擎相同)，
+            # 逐场景取整的误差不会在长故事中累积，画面不会逐渐偏离音轨
+            audio_duration = get_duration(audio_track)
+            timeline_duration = audio_duration or valid_scenes[-1][1].get("end_time", 0)
+            boundary_frames = {}
+            for index, (_, scene, _) in enumerate(valid_scenes):
+                # 第一个场景从0开始；开始帧相同的场景只保留最后一个
+                frame = 0 if index == 0 else int(round(scene.get("start_time", 0) * self.fps))
+                boundary_frames[frame] = index
+            segments = plan_segment_frames([scene.get("start_time", 0) for _, scene, _ in valid_scenes[1:]],
+                                           timeline_duration, self.fps)
+            
+            # 处理每个场景
+            scene_videos = []
+            encode_jobs = []
+            reused_count = 0
+            video_total = 0.0
+            for start_frame, end_frame in segments:
+                i, scene, scene_image = valid_scenes[boundary_frames[start_frame]]
+                frames = end_frame - start_frame
                 
                 # 创建场景视频
-                scene_video = os.path.join(temp_dir, f"scene_{i+1}.mp4")
-                start_time = scene.get("start_time", 0)
-                duration = scene.get("duration", 0)
+                scene_video = os.path.join(clips_dir, f"scene_{i+1}.mp4")
+                
+                # 电影效果类型 (0=缓慢平移, 1=缓慢放大, 2=缓慢缩小)
+                effect_type, pan_direction = effects[i]
+                video_filter = self._build_ken_burns_filter(frames, effect_type, pan_direction, use_fade_transitions)
+                video_total += frames / self.fps
+                
+                clip_signature = f"{self._file_hash(scene_image)}|{video_filter}|{' '.join(encode_args)}"
+                if clips_manifest.get(scene_video) == clip_signature and os.path.exists(scene_video):
+                    scene_videos.append(scene_video)
+                    reused_count += 1
+                    continue
                 
-                # 构建ffmpeg命令
+                # 构建ffmpeg命令 (每个片段只用少量线程，由进程池并行编码多个片段)
                 cmd = [
                     "ffmpeg", "-y",
-                    "-loop", "1",
                     "-i", scene_image,
-                    "-c:v", "libx264",
-                    "-t", str(duration),
-                    "-vf", f"scale={self.resolution[0]}:{self.resolution[1]}:force_original_aspect_ratio=decrease,pad={self.resolution[0]}:{self.resolution[1]}:(ow-iw)/2:(oh-ih)/2",
+                    "-vf", video_filter,
+                    "-frames:v", str(frames),
+                    *encode_args,
                     scene_video
                 ]
-                
-                # 执行命令
-                subprocess.run(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True,
-                    shell=(platform.system() == "Windows")
-                )
-                
+                encode_jobs.append((scene_video, clip_signature, cmd))
                 scene_videos.append(scene_video)
             
-            if not scene_videos:
-                raise VideoProcessingError("没有有效的场景视频可以处理")
+            if encode_jobs:
+                workers = min(len(encode_jobs), self._scene_encode_workers())
+                logger.info(f"并行编码 {len(encode_jobs)} 个场景片段: {workers} 个进程，每个进程 {self.scene_encode_threads} 个线程")
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(self._run_ffmpeg, cmd): (scene_video, clip_signature)
+                               for scene_video, clip_signature, cmd in encode_jobs}
+                    for future in as_completed(futures):
+                        scene_video, clip_signature = futures[future]
+                        # 编码失败时抛出 CalledProcessError，由下方统一处理
+                        future.result()
+                        clips_manifest[scene_video] = clip_signature
+            
+            with open(clips_manifest_file, "w", encoding="utf-8") as f:
+                json.dump(clips_manifest, f, ensure_ascii=False, indent=2)
+            logger.info(f"场景片段: 共 {len(scene_videos)} 个，复用缓存 {reused_count} 个，重新编码 {len(scene_videos) - reused_count} 个")
             
             # 创建场景列表文件
             scene_list_file = os.path.join(temp_dir, "scene_list.txt")
             with open(scene_list_file, "w", encoding="utf-8") as f:
                 for video in scene_videos:
-                    f.write(f"file '{video}'\n")
+                    f.write(f"file '{os.path.abspath(video)}'\n")
             
-            # 合并所有场景视频
-            merged_video = os.path.join(temp_dir, "merged_scenes.mp4")
+            # 流复制拼接所有场景片段，并直接流复制已编码的音轨
             cmd = [
                 "ffmpeg", "-y",
                 "-f", "concat",
                 "-safe", "0",
                 "-i", scene_list_file,
+                "-i", audio_track,
+                "-map", "0:v",
+                "-map", "1:a",
                 "-c", "copy",
-                merged_video
-            ]
-            
-            subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                shell=(platform.system() == "Windows")
-            )
-            
-            # 从基础视频中提取音频
-            audio_file = os.path.join(temp_dir, "audio.aac")
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", base_video,
-                "-vn",
-                "-acodec", "copy",
-                audio_file
-            ]
-            
-            subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                shell=(platform.system() == "Windows")
-            )
-            
-            # 合并视频和音频
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", merged_video,
-                "-i", audio_file,
-                "-c:v", "copy",
-                "-c:a", "aac",
+                "-shortest",
                 output_video
             ]
-            
-            subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                shell=(platform.system() == "Windows")
-            )
+            self._run_ffmpeg(cmd)
+            register_media(output_video, width=self.resolution[0], height=self.resolution[1], fps=self.fps,
+                           duration=min(video_total, audio_duration) if audio_duration else None,
+                           video_streams=1, audio_streams=1, subtitle_streams=0)
             
             # 清理临时文件
             shutil.rmtree(temp_dir, ignore_errors=True)
@@ -574,8 +521,81 @@ class VideoProcessor(VideoProcessorService):
             logger.error(f"创建场景视频时发生错误: {str(e)}")
             raise VideoProcessingError("创建场景视频失败", details={"error": str(e)})
     
-    def _create_video_with_scenes_moviepy(self, key_scenes_file: str, base_video: str, output_video: str, use_fade_transitions: bool = True) -> str:
-        """使用MoviePy和场景图片创建视频，添加电影级动画效果"""
+    def _plan_scene_motion(self, duration: float, img_width: float, img_height: float,
+                           effect_type: int, pan_direction: int) -> Tuple[Any, Any, Any]:
+        """预先计算场景每一帧的仿射变换 (缩放比例和图片左上角在视频中的位置)
+        
+        效果参数与原MoviePy实现一致：平移幅度为图片短边的3%，放大 1.0->1.03，
+        缩小从安全边距的80%到1.005。
+        
+        Returns:
+            Tuple: (scale, pos_x, pos_y) 三个长度为帧数的NumPy数组
+        """
+        video_width, video_height = self.resolution
+        frames = max(1, int(math.ceil(duration * self.fps)))
+        progress = np.arange(frames) / self.fps / duration
+        
+        if effect_type == 0:  # 缓慢平移
+            pan_distance = min(img_width, img_height) * 0.03
+            scale = np.ones(frames)
+            pos_x = np.full(frames, -img_width / 2 + video_width / 2)
+            pos_y = np.full(frames, -img_height / 2 + video_height / 2)
+            if pan_direction == 0:  # 从左到右
+                pos_x = pos_x - pan_distance / 2 + progress * pan_distance
+            elif pan_direction == 1:  # 从右到左
+                pos_x = pos_x + pan_distance / 2 - progress * pan_distance
+            elif pan_direction == 2:  # 从上到下
+                pos_y = pos_y - pan_distance / 2 + progress * pan_distance
+            else:  # 从下到上
+                pos_y = pos_y + pan_distance / 2 - progress * pan_distance
+        else:
+            if effect_type == 1:  # 缓慢放大
+                start_scale, end_scale = 1.0, 1.03
+            else:  # 缓慢缩小
+                start_scale, end_scale = 1.0 + (1.15 - 1.0) * 0.8, 1.005
+            scale = start_scale + (end_scale - start_scale) * progress
+            # 保持居中
+            pos_x = -img_width * scale / 2 + video_width / 2
+            pos_y = -img_height * scale / 2 + video_height / 2
+        return scale, pos_x, pos_y
+    
+    def _render_scene_frame(self, image: Any, scale: float, pos_x: float, pos_y: float, subpixel: bool) -> Any:
+        """按仿射参数从缓存的图片数组中采样出一帧
+        
+        视频像素 (u, v) 对应图片坐标 ((u - pos_x) / scale, (v - pos_y) / scale)。
+        """
+        video_width, video_height = self.resolution
+        img_h, img_w = image.shape[:2]
+        src_x = (np.arange(video_width) - pos_x) / scale
+        src_y = (np.arange(video_height) - pos_y) / scale
+        
+        if not subpixel:
+            xi = np.clip(np.rint(src_x).astype(np.intp), 0, img_w - 1)
+            yi = np.clip(np.rint(src_y).astype(np.intp), 0, img_h - 1)
+            return image[yi[:, None], xi[None, :]]
+        
+        # 双线性插值，使缓慢的平移和缩放没有逐像素跳动
+        src_x = np.clip(src_x, 0, img_w - 1)
+        src_y = np.clip(src_y, 0, img_h - 1)
+        x0 = np.floor(src_x).astype(np.intp)
+        y0 = np.floor(src_y).astype(np.intp)
+        x1 = np.minimum(x0 + 1, img_w - 1)
+        y1 = np.minimum(y0 + 1, img_h - 1)
+        fx = (src_x - x0)[None, :, None].astype(np.float32)
+        fy = (src_y - y0)[:, None, None].astype(np.float32)
+        top = image[y0[:, None], x0[None, :]] * (1 - fx) + image[y0[:, None], x1[None, :]] * fx
+        bottom = image[y1[:, None], x0[None, :]] * (1 - fx) + image[y1[:, None], x1[None, :]] * fx
+        return (top * (1 - fy) + bottom * fy).astype(np.uint8)
+    
+    def _create_video_with_scenes_moviepy(self, key_scenes_file: str, audio_track: str, output_video: str, use_fade_transitions: bool = True) -> str:
+        """使用MoviePy和场景图片创建视频，添加电影级动画效果
+        
+        每个场景的图片只缩放一次并缓存为NumPy数组，每帧根据预先计算的仿射参数
+        直接采样出画面，只处理时间t处正在显示的场景，原始帧直接交给ffmpeg写入器编码。
+        画面渲染完成后由ffmpeg流复制混入音轨。
+        """
+        from PIL import Image
+        
         # 读取场景信息
         with open(key_scenes_file, "r", encoding="utf-8") as f:
             scenes = json.load(f)
@@ -585,220 +605,263 @@ class VideoProcessor(VideoProcessorService):
         os.makedirs(images_dir, exist_ok=True)
         logger.info(f"确保图片目录存在: {images_dir}")
         
-        # 加载基础视频
-        base_clip = VideoFileClip(base_video)
+        # 音轨只用于确定视频时长
+        total_duration = get_duration(audio_track)
         # 使用配置的分辨率设置
         video_width, video_height = self.resolution
         logger.info(f"使用配置的视频分辨率: {video_width}x{video_height}")
         
-        # 如果没有场景，直接返回基础视频
+        # 如果没有场景，输出黑色画面
         if not scenes:
-            logger.info("没有场景信息，直接使用基础视频")
-            base_clip.write_videofile(output_video, codec="libx264", audio_codec="aac", fps=24)
-            base_clip.close()
-            return output_video
+            logger.info("没有场景信息，输出黑色画面")
         
         # 打印所有场景信息
         logger.info(f"读取到 {len(scenes)} 个场景")
+        subpixel = config.get("video", "moviepy_subpixel", default=True)
+        safe_margin_factor = 1.15
+        video_aspect = video_width / video_height
         
-        # 创建所有场景的图片剪辑
-        clips = [base_clip]  # 首先添加基础视频
-        
-        # 为每个场景设置固定的随机种子，确保效果一致
-        random.seed(42)
+        # 与FFmpeg引擎相同的效果选择 (按场景序号，不受跳过的场景影响)
+        effects = plan_scene_effects(len(scenes))
         
-        # 处理每个场景
+        # 每个场景的时间范围、图片路径和逐帧仿射参数
+        scene_plans = []
         for i, scene in enumerate(scenes):
-            try:
-                # 获取场景时间信息
-                start_time = scene.get("start_time", 0)
-                end_time = scene.get("end_time", 0)
-                duration = end_time - start_time
-                image_file = scene.get("image_file", "")
-                
-                if not image_file:
-                    logger.warning(f"场景 {i+1} 缺少图片文件名，跳过")
-                    continue
-                
-                # 构造图像路径
-                image_path = f"output/images/{image_file}"
-                
-                # 打印路径检查信息
-                logger.info(f"检查图片路径: {image_path}")
-                
-                if not os.path.exists(image_path):
-                    logger.warning(f"警告: 图像文件不存在: {image_path}")
-                    # 尝试检查其他可能的位置
-                    alt_path = f"output/{image_file}"
-                    if os.path.exists(alt_path):
-                        logger.info(f"找到替代位置的图像: {alt_path}")
-                        # 复制到正确位置
-                        shutil.copy(alt_path, image_path)
-                        logger.info(f"已复制图像到: {image_path}")
-                    else:
-                        logger.warning(f"无法找到场景 {i+1} 的图片，跳过")
-                        continue
+            # 获取场景时间信息
+            start_time = scene.get("start_time", 0)
+            end_time = scene.get("end_time", 0)
+            duration = end_time - start_time
+            image_file = scene.get("image_file", "")
+            
+            if not image_file:
+                logger.warning(f"场景 {i+1} 缺少图片文件名，跳过")
+                continue
+            if duration <= 0:
+                logger.warning(f"场景 {i+1} 时长无效 ({duration})，跳过")
+                continue
+            
+            # 构造图像路径
+            image_path = f"output/images/{image_file}"
+            if not os.path.exists(image_path):
+                logger.warning(f"警告: 图像文件不存在: {image_path}")
+                # 尝试检查其他可能的位置
+                alt_path = f"output/{image_file}"
+                if os.path.exists(alt_path):
+                    logger.info(f"找到替代位置的图像: {alt_path}")
+                    # 复制到正确位置
+                    shutil.copy(alt_path, image_path)
+                    logger.info(f"已复制图像到: {image_path}")
                 else:
-                    logger.info(f"找到图片: {image_path}")
-                
-                logger.info(f"处理图片: {image_path}")
-                
-                # 随机选择电影效果类型 (0=缓慢平移, 1=缓慢放大, 2=缓慢缩小)
-                effect_type = random.randint(0, 2)
-                
-                # 加载图片
-                img_clip = ImageClip(image_path)
-                
-                # 计算图片和视频的宽高比
-                img_aspect = img_clip.w / img_clip.h
-                video_aspect = video_width / video_height
+                    logger.warning(f"无法找到场景 {i+1} 的图片，跳过")
+                    continue
+            
+            try:
+                # 电影效果类型 (0=缓慢平移, 1=缓慢放大, 2=缓慢缩小)
+                effect_type, pan_direction = effects[i]
                 
-                # 确保图片覆盖整个视频区域 - 减小安全边距
-                safe_margin_factor = 1.15 # Changed from 1.08 to 1.15
+                # 确保图片覆盖整个视频区域
+                with Image.open(image_path) as img:
+                    img_aspect = img.width / img.height
                 if img_aspect > video_aspect:  # 图片更宽
-                    # 高度匹配视频，宽度按比例
                     img_height = video_height * safe_margin_factor
                     img_width = img_height * img_aspect
                 else:  # 图片更高或相等
-                    # 宽度匹配视频，高度按比例
                     img_width = video_width * safe_margin_factor
                     img_height = img_width / img_aspect
                 
-                # 调整图片大小
-                img_clip = img_clip.resize(width=img_width, height=img_height)
-                
-                # 应用效果
-                if effect_type == 0:  # 缓慢平移
-                    # 随机选择平移方向
-                    pan_direction = random.randint(0, 3)  # 0=左到右, 1=右到左, 2=上到下, 3=下到上
-                    
-                    # 计算平移距离 - 减小移动幅度
-                    pan_distance = min(img_width, img_height) * 0.03 # Changed from 0.05
-                    
-                    # 定义位置函数
-                    def pos_func(t):
-                        # 线性移动，确保整个持续时间内都在移动
-                        progress = t / duration
-                        
-                        if pan_direction == 0:  # 从左到右
-                            x = -img_width/2 + video_width/2 - pan_distance/2 + progress * pan_distance
-                            y = -img_height/2 + video_height/2
-                        elif pan_direction == 1:  # 从右到左
-                            x = -img_width/2 + video_width/2 + pan_distance/2 - progress * pan_distance
-                            y = -img_height/2 + video_height/2
-                        elif pan_direction == 2:  # 从上到下
-                            x = -img_width/2 + video_width/2
-                            y = -img_height/2 + video_height/2 - pan_distance/2 + progress * pan_distance
-                        else:  # 从下到上
-                            x = -img_width/2 + video_width/2
-                            y = -img_height/2 + video_height/2 + pan_distance/2 - progress * pan_distance
-                        
-                        return (int(x), int(y))
-                    
-                elif effect_type == 1:  # 缓慢放大
-                    # 从小到大缓慢放大 - 减小放大比例
-                    start_scale = 1.0
-                    end_scale = 1.03 # Changed from 1.05
-                    
-                    # 定义缩放函数
-                    def zoom_func(t):
-                        # 线性缩放
-                        progress = t / duration
-                        return start_scale + (end_scale - start_scale) * progress
-                    
-                    # 应用缩放效果
-                    img_clip = img_clip.resize(lambda t: (int(img_width * zoom_func(t)), 
-                                                         int(img_height * zoom_func(t))))
-                    
-                    # 定义位置函数 - 保持居中
-                    def pos_func(t):
-                        scale = zoom_func(t)
-                        x = -img_width * scale / 2 + video_width / 2
-                        y = -img_height * scale / 2 + video_height / 2
-                        return (int(x), int(y))
-                    
-                else:  # 缓慢缩小
-                    # 从大到小缓慢缩小 - 减小缩小比例
-                    # start_scale = 1.03 # Changed from 1.05
-                    # end_scale = 1.0
-                    start_scale = 1.0 + (safe_margin_factor - 1.0) * 0.8 # Start from 80% of the new margin
-                    end_scale = 1.005 # Ensure it ends slightly larger than the base calculated img_width/height
-                    
-                    # 定义缩放函数
-                    def zoom_func(t):
-                        # 线性缩放
-                        progress = t / duration
-                        return start_scale + (end_scale - start_scale) * progress
-                    
-                    # 应用缩放效果
-                    img_clip = img_clip.resize(lambda t: (int(img_width * zoom_func(t)), 
-                                                         int(img_height * zoom_func(t))))
-                    
-                    # 定义位置函数 - 保持居中
-                    def pos_func(t):
-                        scale = zoom_func(t)
-                        x = -img_width * scale / 2 + video_width / 2
-                        y = -img_height * scale / 2 + video_height / 2
-                        return (int(x), int(y))
-                
-                # 设置持续时间和开始时间
-                img_clip = img_clip.set_duration(duration).set_start(start_time)
-                
-                # 设置位置
-                img_clip = img_clip.set_position(pos_func)
-                
-                if use_fade_transitions:
-                    # 添加淡入淡出效果
-                    # 计算淡入淡出时间 - 较短场景使用较短的淡入淡出时间
-                    fade_duration = min(0.5, duration / 10)  # 最长0.5秒，或者场景时长的1/10
-                    
-                    # 应用淡入淡出效果
-                    img_clip = img_clip.fadein(fade_duration).fadeout(fade_duration)
-                    logger.info(f"已添加图片: {image_file} 效果类型: {effect_type} 淡入淡出: {fade_duration:.2f}秒")
-                else:
-                    logger.info(f"已添加图片: {image_file} 效果类型: {effect_type} (淡入淡出已禁用)")
-                
-                # 添加到剪辑列表
-                clips.append(img_clip)
-                
+                scale, pos_x, pos_y = self._plan_scene_motion(duration, img_width, img_height, effect_type, pan_direction)
+                fade_duration = min(0.5, duration / 10) if use_fade_transitions else 0
+                scene_plans.append({
+                    "start": start_time,
+                    "end": end_time,
+                    "image_path": image_path,
+                    "image_hash": self._file_hash(image_path),
+                    "effect": (effect_type, pan_direction),
+                    "size": (int(round(img_width)), int(round(img_height))),
+                    "scale": scale,
+                    "pos_x": pos_x,
+                    "pos_y": pos_y,
+                    "fade": fade_duration
+                })
+                logger.info(f"已添加图片: {image_file} 效果类型: {effect_type} 淡入淡出: {fade_duration:.2f}秒")
             except Exception as e:
-                logger.error(f"处理图片 {scene.get('image_file', '未知')} 时出错: {e}")
+                logger.error(f"处理图片 {image_file} 时出错: {e}")
                 import traceback
                 traceback.print_exc()
         
         # 合成最终视频
-        logger.info(f"合成视频，共 {len(clips)} 个剪辑...")
+        self._render_moviepy_segments(scene_plans, total_duration, audio_track, output_video, subpixel)
+        register_media(output_video, width=video_width, height=video_height, fps=self.fps, duration=total_duration,
+                       video_streams=1, audio_streams=1, subtitle_streams=0)
+        
+        logger.info("MoviePy视频处理完成！")
+        return output_video
+    
+    def _moviepy_render_workers(self) -> int:
+        """MoviePy引擎并行渲染场景片段的进程数，0 表示按CPU核心数自动计算"""
+        workers = int(config.get("video", "moviepy_render_shards", default=1))
+        if workers <= 0:
+            workers = max(1, (os.cpu_count() or 1) // 2)
+        return workers
+    
+    def _render_moviepy_segments(self, scene_plans: List[Dict[str, Any]], total_duration: float, audio_track: str,
+                                 output_video: str, subpixel: bool):
+        """按场景边界把时间线切分为片段渲染，使用concat分离器无损拼接后流复制混入音轨
+        
+        每个片段从场景开始时刻 (对齐到帧) 持续到下一个场景开始，独立编码，
+        清单中记录每个片段的输入签名 (图片内容哈希、时间、效果和编码参数)。
+        在场景编辑后重新合成时只渲染签名变化的片段，其余片段直接复用；
+        需要渲染的片段在多个进程中并行渲染。
+        """
+        clips_dir = os.path.join(os.path.dirname(output_video), self.clips_dir_name)
+        os.makedirs(clips_dir, exist_ok=True)
+        manifest_file = os.path.join(clips_dir, "moviepy_segments.json")
+        manifest = self._load_clip_manifest(manifest_file)
+        
+        segment_files = []
+        tasks = []
+        segment_frames = plan_segment_frames([plan["start"] for plan in scene_plans[1:]], total_duration, self.fps)
+        for index, (start_frame, end_frame) in enumerate(segment_frames):
+            start = start_frame / self.fps
+            end = end_frame / self.fps
+            frame_count = end_frame - start_frame
+            segment_plans = [plan for plan in scene_plans if plan["end"] > start and plan["start"] < end]
+            segment_file = os.path.abspath(os.path.join(clips_dir, f"moviepy_segment_{index:04d}.mp4"))
+            signature = json.dumps({
+                "range": [start, end],
+                "frames": frame_count,
+                "scenes": [[plan["image_hash"], plan["start"], plan["end"], plan["size"], plan["effect"], plan["fade"]]
+                           for plan in segment_plans],
+                "resolution": list(self.resolution),
+                "fps": self.fps,
+                "subpixel": subpixel,
+                "profile": moviepy_write_kwargs(self.profile)
+            }, sort_keys=True)
+            segment_files.append(segment_file)
+            if manifest.get(segment_file) == signature and os.path.exists(segment_file):
+                continue
+            # 分辨率和帧率随任务传递，子进程不从全局配置读取 (多画幅画布、代理预览与配置不同)
+            tasks.append(((segment_plans, start, frame_count, segment_file, subpixel, self.profile,
+                           tuple(self.resolution), self.fps), signature))
+        
+        logger.info(f"合成视频，共 {len(scene_plans)} 个场景，{len(segment_files)} 个片段，"
+                    f"复用缓存 {len(segment_files) - len(tasks)} 个，重新渲染 {len(tasks)} 个")
+        
+        workers = min(len(tasks), self._moviepy_render_workers())
+        if workers <= 1:
+            for task, signature in tasks:
+                _render_moviepy_shard(task)
+                manifest[task[3]] = signature
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_render_moviepy_shard, task): (task[3], signature) for task, signature in tasks}
+                for future in as_completed(futures):
+                    segment_file, signature = futures[future]
+                    future.result()
+                    manifest[segment_file] = signature
+                    logger.info(f"片段渲染完成: {os.path.basename(segment_file)}")
+        
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        
+        list_file = os.path.join(clips_dir, "moviepy_segments.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for segment_file in segment_files:
+                f.write(f"file '{segment_file}'\n")
+        
+        # 视频流和已编码的AAC音轨都直接流复制
+        logger.info(f"拼接片段并混入音轨: {output_video}")
+        try:
+            self._run_ffmpeg([
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0", "-i", list_file,
+                "-i", audio_track,
+                "-map", "0:v", "-map", "1:a",
+                "-c", "copy",
+                "-shortest",
+                output_video
+            ])
+        except subprocess.CalledProcessError as e:
+            logger.error(f"拼接片段失败: {e.stderr.decode() if e.stderr else str(e)}")
+            raise VideoProcessingError("拼接片段失败", details={"ffmpeg_error": str(e)})
+    
+    def _render_moviepy_segment(self, scene_plans: List[Dict[str, Any]], start: float, frame_count: int,
+                                output_video: str, subpixel: bool, profile: Optional[str] = None) -> str:
+        """从 start 开始渲染 frame_count 帧画面
         
-        # 创建合成视频 - 使用CompositeVideoClip
-        from moviepy.editor import CompositeVideoClip
-        final_clip = CompositeVideoClip(clips, size=(video_width, video_height))
+        Args:
+            scene_plans: 场景渲染计划 (时间为整条时间线上的绝对时间)
+            start: 区间开始时间 (对齐到帧)
+            frame_count: 输出的帧数
+            output_video: 输出视频文件路径
+            subpixel: 是否使用双线性插值采样
+            profile: 编码配置名称，默认使用处理器的编码配置
+        """
+        from moviepy.editor import VideoClip
+        from PIL import Image
+        
+        video_width, video_height = self.resolution
+        scene_starts = [plan["start"] for plan in scene_plans]
+        black_frame = np.zeros((video_height, video_width, 3), dtype=np.uint8)
+        # 场景图片按时间窗口加载：到达场景前由后台线程预取，场景结束后立即释放，
+        # 内存占用只取决于预取窗口大小，与场景总数无关
+        prefetch_scenes = max(0, int(config.get("video", "moviepy_prefetch_scenes", default=1)))
+        prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        image_futures = {}
+        
+        def decode_scene_image(plan):
+            with Image.open(plan["image_path"]) as img:
+                return np.asarray(img.convert("RGB").resize(plan["size"], Image.LANCZOS))
+        
+        def load_scene_image(index):
+            """返回当前场景的缓存图片，释放已结束的场景并预取后续场景"""
+            for cached_index in [k for k in image_futures if k < index]:
+                image_futures.pop(cached_index).cancel()
+            for next_index in range(index, min(index + prefetch_scenes + 1, len(scene_plans))):
+                if next_index not in image_futures:
+                    image_futures[next_index] = prefetch_pool.submit(decode_scene_image, scene_plans[next_index])
+            return image_futures[index].result()
+        
+        def make_frame(t):
+            t = t + start
+            index = bisect.bisect_right(scene_starts, t) - 1
+            if index < 0 or t >= scene_plans[index]["end"]:
+                return black_frame
+            plan = scene_plans[index]
+            local_t = t - plan["start"]
+            frame_index = min(int(local_t * self.fps), len(plan["scale"]) - 1)
+            frame = self._render_scene_frame(
+                load_scene_image(index),
+                plan["scale"][frame_index],
+                plan["pos_x"][frame_index],
+                plan["pos_y"][frame_index],
+                subpixel
+            )
+            fade = plan["fade"]
+            if fade > 0:
+                alpha = min(1.0, local_t / fade, (plan["end"] - t) / fade)
+                if alpha < 1.0:
+                    frame = (frame * max(alpha, 0.0)).astype(np.uint8)
+            return frame
         
-        # 导出视频
+        # MoviePy 按 np.arange(0, duration, 1/fps) 取帧，时长取 (n - 0.5) 帧可避免浮点误差多出一帧
+        clip = VideoClip(make_frame, duration=(frame_count - 0.5) / self.fps)
+        
+        # 导出视频 (仅画面)
         logger.info(f"写入视频文件: {output_video}")
-        final_clip.write_videofile(
+        clip.write_videofile(
             output_video,
-            codec="libx264",
-            audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
-            remove_temp=True,
-            fps=30,  # 使用较高帧率
-            preset="slow",
-            bitrate="5000k"
+            audio=False,
+            fps=self.fps,
+            **moviepy_write_kwargs(profile or self.profile)
         )
         
         # 清理
-        base_clip.close()
-        final_clip.close()
-        for clip in clips[1:]:
-            try:
-                clip.close()
-            except:
-                pass
-        
-        logger.info("MoviePy视频处理完成！")
+        clip.close()
+        prefetch_pool.shutdown(wait=False)
+        image_futures.clear()
         return output_video
     
-    @error_handler(error_message="添加字幕失败")
     def add_subtitles(self, video_file: str, srt_file: str, output_file: str, **kwargs) -> str:
         """为视频添加字幕
         
@@ -877,6 +940,7 @@ class VideoProcessor(VideoProcessorService):
                   f"PrimaryColour={self._convert_color_to_ass(font_color)},"
                   f"OutlineColour={self._convert_color_to_ass(outline_color)},"
                   f"BorderStyle=1,Outline={outline_width},Shadow=0'",
+            *ffmpeg_video_args(self.profile),
             "-c:a", "copy",
             "-y",
             output_file
@@ -885,13 +949,7 @@ class VideoProcessor(VideoProcessorService):
         logger.info(f"运行FFmpeg命令添加字幕...")
         
         # 执行命令
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            shell=(platform.system() == "Windows")
-        )
+        result = self._run_ffmpeg(cmd, live_preview=True)
         
         logger.info(f"已成功添加字幕，输出文件: {output_file}")
         return output_file
@@ -977,27 +1035,9 @@ class VideoProcessor(VideoProcessorService):
             生成的视频文件路径
         """
         # 确定视频分辨率
-        cmd_probe = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "json",
-            video_file
-        ]
-        
-        result = subprocess.run(
-            cmd_probe,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            shell=(platform.system() == "Windows")
-        )
-        
-        video_info = json.loads(result.stdout)
-        if 'streams' in video_info and video_info['streams']:
-            width = int(video_info['streams'][0]['width'])
-            height = int(video_info['streams'][0]['height'])
+        video_size = get_video_size(video_file)
+        if video_size:
+            width, height = video_size
         else:
             width = 1920
             height = 1080
@@ -1015,8 +1055,13 @@ class VideoProcessor(VideoProcessorService):
             "-i", character_image,
             "-filter_complex", 
                 f"[1:v]scale={overlay_width}:-1,format=rgba[overlay]; " +
-                f"[0:v][overlay]overlay={position_x}:{position_y}:format=auto",
+                f"[0:v][overlay]overlay={position_x}:{position_y}:format=auto[out_v]",
+            "-map", "[out_v]",
+            "-map", "0:a?",
+            "-map", "0:s?",
+            *ffmpeg_video_args(self.profile),
             "-c:a", "copy",
+            "-c:s", "copy",
             "-y",
             output_file
         ]
@@ -1024,14 +1069,9 @@ class VideoProcessor(VideoProcessorService):
         logger.info(f"运行FFmpeg命令添加角色图片...")
         
         # 执行命令
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            shell=(platform.system() == "Windows")
-        )
+        result = self._run_ffmpeg(cmd, live_preview=True)
         
+        register_derived(output_file, video_file)
         logger.info(f"已成功添加角色图片，输出文件: {output_file}")
         return output_file
 
@@ -1044,70 +1084,61 @@ class VideoProcessor(VideoProcessorService):
         Returns:
             float: 视频时长（秒）
         """
-        try:
-            # 使用FFmpeg获取视频信息
-            cmd = [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "json",
-                video_file
-            ]
-            
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            if result.returncode != 0:
-                print(f"获取视频时长失败: {result.stderr}")
-                return 0
-            
-            # 解析JSON输出
-            data = json.loads(result.stdout)
-            duration = float(data["format"]["duration"])
-            return duration
-            
-        except Exception as e:
-            print(f"获取视频时长时出错: {e}")
-            return 0
+        duration = get_duration(video_file)
+        if not duration:
+            print(f"获取视频时长失败: {video_file}")
+        return duration
 
     def _probe_video_info(self, video_path: str) -> Optional[Dict[str, Any]]:
-        """使用 ffprobe 获取视频信息 (宽度, 高度, 时长)"""
-        if not Path(video_path).exists():
-            logger.error(f"视频文件不存在，无法探测信息: {video_path}")
+        """获取视频信息 (宽度, 高度, 时长)，优先使用媒体信息缓存"""
+        info = get_media_info(str(video_path))
+        if not info or info.get("width") is None or info.get("duration") is None:
+            logger.error(f"无法获取视频信息: {video_path}")
             return None
-        try:
-            cmd = [
-                "ffprobe",
-                "-v", "error",
-                "-select_streams", "v:0",
-                "-show_entries", "stream=width,height:format=duration",
-                "-of", "json",
-                str(video_path) # Ensure video_path is string
-            ]
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True, encoding='utf-8', errors='replace')
-            data = json.loads(result.stdout)
-            
-            # Robustly get duration, check if 'format' and 'duration' keys exist
-            duration_str = data.get("format", {}).get("duration")
-            if duration_str is None:
-                # Fallback: try to get duration from the first video stream if format duration is missing
-                if data.get("streams") and data["streams"][0].get("duration"):
-                    duration_str = data["streams"][0]["duration"]
-                else: # If still no duration, log and raise error or return None
-                    logger.error(f"无法从 ffprobe 输出中获取视频时长: {video_path}")
-                    return None
+        logger.info(f"视频 {Path(video_path).name} 信息: {info}")
+        return info
 
-            info = {
-                "width": int(data["streams"][0]["width"]),
-                "height": int(data["streams"][0]["height"]),
-                "duration": float(duration_str)
-            }
-            logger.info(f"探测到视频 {Path(video_path).name} 信息: {info}")
-            return info
-        except json.JSONDecodeError as jde:
-            logger.error(f"解析 ffprobe JSON 输出失败 for {video_path}: {jde}. Output was: {result.stdout if 'result' in locals() else 'N/A'}")
+    def _prepare_effect_clip(self, effect_video: str, width: int, height: int) -> Optional[str]:
+        """把分辨率高于目标画面的特效视频预先缩小到目标分辨率 (yuv420p) 并缓存
+
+        叠加时解码和缩小大尺寸特效视频 (例如4K) 的开销最大，缓存后每帧只需解码目标尺寸的画面。
+        screen 等混合模式必须在RGB中计算，特效流和主视频仍要逐帧转换为 gbrp。
+        不大于目标分辨率的特效视频直接使用 (缩放开销小，解码缓存反而更慢)，返回None；
+        缓存按特效文件内容哈希和分辨率区分，转码失败时也返回None。
+        """
+        effect_info = get_media_info(effect_video)
+        if not effect_info or effect_info.get("width") is None:
             return None
+        if effect_info["width"] * effect_info["height"] <= width * height:
+            return None
+        cache_dir = Path(config.get("paths", "temporary", default="temp")) / "effect_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        signature = f"{self._file_hash(effect_video)}_{width}x{height}_yuv420p"
+        cached_clip = cache_dir / f"{Path(effect_video).stem}_{hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]}.mkv"
+        if cached_clip.exists() and cached_clip.stat().st_size > 0:
+            logger.info(f"使用已缓存的特效片段: {cached_clip.name}")
+            return str(cached_clip)
+        
+        temp_clip = cached_clip.with_name(f"{cached_clip.stem}.tmp.mkv")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(effect_video),
+            "-vf", (f"scale={width}:{height}:force_original_aspect_ratio=increase,"
+                    f"crop={width}:{height},format=yuv420p"),
+            "-an",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+            str(temp_clip)
+        ]
+        logger.info(f"预处理特效视频 {Path(effect_video).name} "
+                    f"({effect_info['width']}x{effect_info['height']}) -> {width}x{height}")
+        try:
+            self._run_ffmpeg(cmd)
+            os.replace(str(temp_clip), str(cached_clip))
+            return str(cached_clip)
         except Exception as e:
-            logger.error(f"使用 ffprobe 探测视频 {video_path} 信息失败: {e}")
+            logger.warning(f"预处理特效视频失败，改为实时缩放: {e}")
+            if temp_clip.exists():
+                temp_clip.unlink()
             return None
 
     @error_handler(error_message="应用特效叠加失败")
@@ -1150,12 +1181,22 @@ class VideoProcessor(VideoProcessorService):
         main_h = main_video_info["height"]
         main_duration = main_video_info["duration"]
 
+        # 预处理过的特效片段已是目标尺寸，不再逐帧缩放裁剪
+        cached_effect = self._prepare_effect_clip(str(selected_effect_video), main_w, main_h)
+        if cached_effect:
+            selected_effect_video = cached_effect
+            effect_filter = "[1:v]format=gbrp[effect_gbrp];"
+        else:
+            effect_filter = (
+                f"[1:v]scale={main_w}:{main_h}:force_original_aspect_ratio=increase,"
+                f"crop={main_w}:{main_h},"
+                f"format=gbrp[effect_gbrp];"     # Effect video scaled, cropped, then to GBRP
+            )
+
         filter_complex = (
             f"[0:v]format=gbrp[main_gbrp];"  # Main video to GBRP
-            f"[1:v]scale={main_w}:{main_h}:force_original_aspect_ratio=increase,"
-            f"crop={main_w}:{main_h},"
-            f"format=gbrp[effect_gbrp];"     # Effect video scaled, cropped, then to GBRP
-            f"[main_gbrp][effect_gbrp]blend=all_mode={blend_mode}[blended_gbrp];" # Blend in GBRP
+            f"{effect_filter}"
+            f"[main_gbrp][effect_gbrp]blend=all_mode={blend_mode}:shortest=1[blended_gbrp];" # Blend in GBRP
             f"[blended_gbrp]format=yuv420p[out_v]"  # Convert final to yuv420p
         )
 
@@ -1167,10 +1208,10 @@ class VideoProcessor(VideoProcessorService):
             "-filter_complex", filter_complex,
             "-map", "[out_v]",
             "-map", "0:a?",                   
+            "-map", "0:s?",
             "-c:a", "copy",                   
-            "-c:v", "libx264",                
-            "-preset", "medium", # Using a general preset
-            "-crf", "23", # Constant Rate Factor for good quality/size balance
+            "-c:s", "copy",
+            *ffmpeg_video_args(self.profile),
             "-t", str(main_duration),         
             str(output_path_obj)
         ]
@@ -1180,8 +1221,8 @@ class VideoProcessor(VideoProcessorService):
             # Ensure output directory exists
             output_path_obj.parent.mkdir(parents=True, exist_ok=True)
             
-            process = subprocess.run(cmd, capture_output=True, text=True, check=True, 
-                                     shell=(platform.system() == "Windows"), encoding='utf-8', errors='replace')
+            process = run_ffmpeg(cmd, duration=main_duration, label="特效叠加", live_preview=True)
+            register_derived(str(output_path_obj), str(input_path_obj))
             logger.info(f"FFmpeg特效叠加成功: {output_path_obj}")
             if process.stdout:
                 logger.debug(f"FFmpeg stdout:\\n{process.stdout}")
@@ -1209,12 +1250,121 @@ class VideoProcessor(VideoProcessorService):
                      logger.error(f"复制原始视频 {input_path_obj} 到 {output_path_obj} 失败: {copy_err}")
             return str(input_path_obj)
 
-# 兼容旧版本的函数
-def create_base_video(audio_info_file, output_file, resolution=(1920, 1080)):
-    """兼容旧版本的函数，使用默认引擎创建基础视频"""
-    processor = VideoProcessor()
-    return processor.create_base_video(audio_info_file, output_file)
+    def render_aspect_variants(self, canvas_video: str, variants: List[Tuple[int, int]], output_files: List[str],
+                               srt_file: Optional[str] = None, subtitle_params: Optional[Dict[str, Any]] = None,
+                               character_image: Optional[str] = None) -> List[str]:
+        """由一个画布视频一次性输出多个画幅的版本
+        
+        画布视频只解码一次，通过 split 滤镜分成多路，每一路按目标宽高比居中裁剪、
+        缩放到目标分辨率，再按该画幅叠加角色图片和烧录字幕 (样式与单画幅输出相同)。
+        
+        Args:
+            canvas_video: 覆盖所有目标画幅的画布视频
+            variants: 目标分辨率列表 [(宽, 高), ...]
+            output_files: 与 variants 对应的输出文件路径
+            srt_file: 需要烧录的字幕文件 (可选)
+            subtitle_params: 字幕样式参数，与 add_subtitles 相同
+            character_image: 角色图片路径 (可选)
+            
+        Returns:
+            List[str]: 输出文件路径列表
+        """
+        from add_subtitles import build_subtitle_filter
+        
+        canvas_info = self._probe_video_info(canvas_video)
+        if not canvas_info:
+            raise VideoProcessingError("无法获取画布视频信息", details={"video": canvas_video})
+        canvas_w, canvas_h = canvas_info["width"], canvas_info["height"]
+        
+        count = len(variants)
+        inputs = ["-i", canvas_video]
+        filters = [f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+        if character_image:
+            inputs.extend(["-i", character_image])
+            filters.append(f"[1:v]format=rgba,split={count}" + "".join(f"[c{i}]" for i in range(count)))
+        
+        subtitle_params = dict(subtitle_params or {})
+        subtitle_params.pop("subtitle_mode", None)
+        outputs = []
+        for i, (width, height) in enumerate(variants):
+            # 在画布中取目标宽高比的最大居中区域
+            crop_w = min(canvas_w, int(canvas_h * width / height)) // 2 * 2
+            crop_h = min(canvas_h, int(canvas_w * height / width)) // 2 * 2
+            chain = [f"[s{i}]crop={crop_w}:{crop_h}:(iw-{crop_w})/2:(ih-{crop_h})/2,scale={width}:{height},setsar=1[v{i}]"]
+            label = f"v{i}"
+            if character_image:
+                # 与 _add_character_image_ffmpeg 相同的布局: 宽度为画面的1/4，位于右下角
+                overlay_width = width // 4
+                chain.append(f"[c{i}]scale={overlay_width}:-1[cs{i}]")
+                chain.append(f"[{label}][cs{i}]overlay={width - overlay_width - 20}:{height - overlay_width - 20}:format=auto[o{i}]")
+                label = f"o{i}"
+            if srt_file and os.path.exists(srt_file):
+                # 与单画幅输出使用相同的字幕样式 (libass 按画面高度缩放字号)，同一画幅无论哪条路径输出都一致
+                chain.append(f"[{label}]{build_subtitle_filter(srt_file, **subtitle_params)}[t{i}]")
+                label = f"t{i}"
+            filters.extend(chain)
+            outputs.extend(["-map", f"[{label}]", "-map", "0:a?", *ffmpeg_video_args(self.profile), "-c:a", "copy", output_files[i]])
+        
+        cmd = ["ffmpeg", "-y", *inputs, "-filter_complex", ";".join(filters), *outputs]
+        logger.info(f"一次输出 {count} 个画幅版本: {', '.join(f'{w}x{h}' for w, h in variants)}")
+        try:
+            self._run_ffmpeg(cmd)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"输出多画幅版本失败: {e.stderr.decode() if e.stderr else str(e)}")
+            raise VideoProcessingError("输出多画幅版本失败", details={"ffmpeg_error": str(e)})
+        
+        for (width, height), output_file in zip(variants, output_files):
+            register_media(output_file, width=width, height=height, fps=canvas_info.get("fps"),
+                           duration=canvas_info["duration"], video_streams=1,
+                           audio_streams=canvas_info.get("audio_streams"), subtitle_streams=0)
+        return output_files
+
+def plan_segment_frames(boundaries: List[float], total_duration: float, fps: int) -> List[Tuple[int, int]]:
+    """把时间线按边界切分为整帧区间 [开始帧, 结束帧)
+    
+    边界对齐到最近的帧，总帧数与单次渲染整条时间线一致 (ceil(总时长 * fps))，
+    各区间首尾相接，拼接后既不重复也不缺帧。
+    
+    Args:
+        boundaries: 片段开始时间 (不含0，一般为第2个及之后场景的开始时间)
+        total_duration: 时间线总时长 (秒)
+        fps: 帧率
+    """
+    total_frames = max(1, math.ceil(round(total_duration * fps, 6)))
+    frames = [0]
+    for boundary in boundaries:
+        frame = int(round(boundary * fps))
+        if frames[-1] < frame < total_frames:
+            frames.append(frame)
+    frames.append(total_frames)
+    return list(zip(frames[:-1], frames[1:]))
+
+def plan_scene_effects(scene_count: int, seed: int = 42) -> List[Tuple[int, int]]:
+    """为每个场景选择电影效果 (两种引擎共用)
+    
+    使用固定种子的局部随机数生成器按场景序号依次抽取，同一场景在两种引擎中效果相同，
+    跳过无效场景不会改变其他场景的效果，也不影响全局 random 的状态。
+    
+    Returns:
+        List[Tuple[int, int]]: 每个场景的 (效果类型 0=缓慢平移/1=缓慢放大/2=缓慢缩小, 平移方向 0-3)
+    """
+    rng = random.Random(seed)
+    effects = []
+    for _ in range(scene_count):
+        effect_type = rng.randint(0, 2)
+        pan_direction = rng.randint(0, 3) if effect_type == 0 else 0
+        effects.append((effect_type, pan_direction))
+    return effects
 
+def _render_moviepy_shard(task) -> str:
+    """在子进程中渲染一个时间分片 (供 ProcessPoolExecutor 调用)"""
+    scene_plans, start, frame_count, output_video, subpixel, profile, resolution, fps = task
+    processor = VideoProcessor(engine="moviepy")
+    processor.resolution = resolution
+    processor.fps = fps
+    return processor._render_moviepy_segment(scene_plans, start, frame_count, output_video, subpixel, profile=profile)
+
+# 兼容旧版本的函数
 def create_video_with_scenes_moviepy(key_scenes_file, input_video, output_file):
     """兼容旧版本的函数，使用MoviePy引擎创建视频"""
     processor = VideoProcessor(engine="moviepy")
@@ -1223,7 +1373,7 @@ def create_video_with_scenes_moviepy(key_scenes_file, input_video, output_file):
 def create_video_with_scenes_ffmpeg(key_scenes_file, input_video, output_file, batch_size=5):
     """兼容旧版本的函数，使用FFmpeg引擎创建视频"""
     processor = VideoProcessor(engine="ffmpeg")
-    return processor._create_video_with_scenes_ffmpeg(key_scenes_file, input_video, output_file, batch_size)
+    return processor._create_video_with_scenes_ffmpeg(key_scenes_file, input_video, output_file)
 
 # 主程序入口点
 if __name__ == "__main__":
@@ -1236,12 +1386,12 @@ if __name__ == "__main__":
                         help="音频信息文件路径")
     parser.add_argument("--scenes", default="output/key_scenes.json",
                         help="场景信息JSON文件路径")
-    parser.add_argument("--base_video", default="output/base_video.mp4",
-                        help="基础视频输出路径")
+    parser.add_argument("--audio_track", default="output/audio/audio_track.m4a",
+                        help="音轨输出路径")
     parser.add_argument("--output", default="output/final_video.mp4",
                         help="最终视频输出路径")
-    parser.add_argument("--skip_base", action="store_true",
-                        help="跳过基础视频生成步骤")
+    parser.add_argument("--skip_audio", action="store_true",
+                        help="跳过音轨生成步骤")
     
     args = parser.parse_args()
     
@@ -1249,11 +1399,11 @@ if __name__ == "__main__":
     processor = VideoProcessor(engine=args.engine)
     
     # 处理视频
-    if not args.skip_base:
-        logger.info("步骤1: 创建基础视频...")
-        processor.create_base_video(args.audio_info, args.base_video)
+    if not args.skip_audio:
+        logger.info("步骤1: 创建音轨...")
+        processor.create_audio_track(args.audio_info, args.audio_track)
     
     logger.info("\n步骤2: 创建最终视频...")
-    processor.create_video_with_scenes(args.scenes, args.base_video, args.output)
+    processor.create_video_with_scenes(args.scenes, args.audio_track, args.output)
     
     logger.info(f"\n处理完成! 最终视频已保存至: {args.output}") 
\ No newline at end of file
@@ -915,6 +915,10 @@ class VoiceVoxGenerator(VoiceGeneratorService):
                 error_msg=f"合成音频失败: {text[:20]}..."
             )
             Path(output_path).write_bytes(audio_data)
+            # 保存音频查询，其中的音素时长可直接用于角色口型同步
+            Path(output_path).with_suffix(".query.json").write_text(
+                json.dumps(query, ensure_ascii=False), encoding="utf-8"
+            )
             
             # 获取实际音频时长
             with wave.open(str(output_path), 'rb') as wav_file:
@@ -31,6 +31,7 @@ from scene_management import (
 )
 from scene_manager import SceneManager
 from image_processor import ImageProcessor
+from encoding_profiles import ffmpeg_video_args
 
 # 添加SRT解析函数
 def parse_srt_file(srt_path):
@@ -120,7 +121,7 @@ scene_manager = SceneManager()
 image_processor = ImageProcessor()
 
 # 添加一个直接使用FFmpeg添加字幕的函数
-def add_subtitles_direct_ffmpeg(video_file, srt_file, output_file, font_name="Arial"):
+def add_subtitles_direct_ffmpeg(video_file, srt_file, output_file, font_name="Arial", profile=None):
     """直接使用FFmpeg命令添加字幕，作为备选方案
     
     Args:
@@ -128,6 +129,7 @@ def add_subtitles_direct_ffmpeg(video_file, srt_file, output_file, font_name="Ar
         srt_file: SRT字幕文件
         output_file: 输出视频文件
         font_name: 字体名称
+        profile: 编码配置名称 (默认使用当前配置)
         
     Returns:
         bool: 是否成功
@@ -138,6 +140,7 @@ def add_subtitles_direct_ffmpeg(video_file, srt_file, output_file, font_name="Ar
             'ffmpeg', '-y',
             '-i', video_file,
             '-vf', f"subtitles={srt_file}:force_style='FontName={font_name},FontSize=24'",
+            *ffmpeg_video_args(profile),
             '-c:a', 'copy',
             output_file
         ]
@@ -155,7 +158,21 @@ def add_subtitles_direct_ffmpeg(video_file, srt_file, output_file, font_name="Ar
         return False
 
 # 添加新的只重新合成视频的函数
-def recompose_video_only(video_engine, character_image=None, font_name=None, font_size=None, font_color=None, bg_opacity=None, talking_character=None, closed_mouth_image=None, open_mouth_image=None, audio_sensitivity=None):
+def recompose_video_only(video_engine, character_image=None, font_name=None, font_size=None, font_color=None, bg_opacity=None, talking_character=None, closed_mouth_image=None, open_mouth_image=None, audio_sensitivity=None, proxy_render=False):
+    """只重新合成视频，保留现有的音频和图片资源
+    
+    proxy_render 为 True 时以代理预览模式渲染 (video.proxy 配置的低分辨率、低帧率和快速编码配置)，
+    包含角色和字幕，用于快速检查时间和布局；输出文件带 _proxy 后缀，不覆盖正式视频。
+    编码配置随各步骤显式传递，不修改全局配置，同时进行的其他渲染不受影响。
+    
+    Returns:
+        str: 最终视频路径，失败时返回None
+    """
+    return _recompose_video(video_engine, character_image, font_name, font_size, font_color, bg_opacity,
+                            talking_character, closed_mouth_image, open_mouth_image, audio_sensitivity,
+                            proxy_render=proxy_render)
+
+def _recompose_video(video_engine, character_image=None, font_name=None, font_size=None, font_color=None, bg_opacity=None, talking_character=None, closed_mouth_image=None, open_mouth_image=None, audio_sensitivity=None, proxy_render=False):
     """只重新合成视频，保留现有的音频和图片资源
     
     Args:
@@ -166,9 +183,10 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
         closed_mouth_image: 闭嘴图片
         open_mouth_image: 张嘴图片
         audio_sensitivity: 音频敏感度
+        proxy_render: 是否以代理预览模式渲染
         
     Returns:
-        tuple: (状态信息, 视频路径)
+        str: 最终视频路径，失败时返回None
     """
     import os
     import time
@@ -210,13 +228,16 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
         
         # 检查必要的文件
         key_scenes_file = "output/key_scenes.json"
-        base_video = "output/base_video.mp4"
+        audio_track = "output/audio/audio_track.m4a"
+        if not os.path.exists(audio_track) and os.path.exists("output/base_video.mp4"):
+            # 兼容旧版本生成的基础视频
+            audio_track = "output/base_video.mp4"
         
         if not os.path.exists(key_scenes_file):
             return "错误：找不到场景信息文件，请先生成完整视频", None
             
-        if not os.path.exists(base_video):
-            return "错误：找不到基础视频，请先生成完整视频", None
+        if not os.path.exists(audio_track):
+            return "错误：找不到音轨文件，请先生成完整视频", None
             
         # 获取输入文件名，用于最终输出文件名
         input_files = glob.glob("input_texts/*.txt")
@@ -229,22 +250,25 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
         # 使用正确的字幕文件路径 - 基于输入文件名
         srt_file = f"output/{input_file_stem}.srt"
         
-        # 设置输出文件路径 - 使用固定文件名覆盖原有文件
-        final_video = "output/final_video.mp4"
-        final_video_with_char = "output/final_video_with_char.mp4"
-        output_video_final = f"output/{input_file_stem}_final.mp4"
+        # 设置输出文件路径 - 使用固定文件名覆盖原有文件，代理预览使用单独的文件名
+        suffix = "_proxy" if proxy_render else ""
+        final_video = f"output/final_video{suffix}.mp4"
+        final_video_with_char = f"output/final_video_with_char{suffix}.mp4"
+        output_video_final = f"output/{input_file_stem}_final{suffix}.mp4"
         
         # 初始化视频处理器
-        processor = VideoProcessor(engine=video_engine)
+        processor = VideoProcessor(engine=video_engine, proxy=proxy_render)
+        # 后续的角色和字幕步骤使用与场景视频相同的编码配置 (代理预览时为 video.proxy 中的配置)
+        profile = processor.profile
         output += f"使用 {processor.engine.upper()} 引擎处理视频\n"
         
-        # 1. 使用现有基础视频
-        output += "使用现有基础视频...\n"
+        # 1. 使用现有音轨
+        output += "使用现有音轨...\n"
         
         # 2. 创建场景视频
         output += "创建场景视频...\n"
         # 直接覆盖原来的final_video.mp4
-        processor.create_video_with_scenes(key_scenes_file, base_video, final_video)
+        processor.create_video_with_scenes(key_scenes_file, audio_track, final_video)
         
         # 3. 如果提供了角色图片，添加角色图片
         current_video = final_video
@@ -252,10 +276,10 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
             output += "添加角色图片...\n"
             
             # 删除旧的会说话角色视频，确保重新生成
-            if os.path.exists("output/temp_video_with_character.mp4"):
+            if os.path.exists(f"output/temp_video_with_character{suffix}.mp4"):
                 print("删除旧的会说话角色视频，确保使用最新图片...")
                 try:
-                    os.remove("output/temp_video_with_character.mp4")
+                    os.remove(f"output/temp_video_with_character{suffix}.mp4")
                     print("旧的会说话角色视频已删除")
             except Exception as e:
                     print(f"无法删除旧的视频文件: {e}")
@@ -280,15 +304,15 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                         from add_character_image import add_character_image_to_video
                         
                         # 创建临时视频文件
-                        final_video_with_char = "output/final_video_with_char.mp4"
+                        final_video_with_char = f"output/final_video_with_char{suffix}.mp4"
                         
-                        success = add_character_image_to_video(current_video, character_image_path, final_video_with_char)
+                        success = add_character_image_to_video(current_video, character_image_path, final_video_with_char, profile=profile)
                     else:
                         # 导入会说话角色模块
                         from add_talking_character import create_talking_character_video
                         
                         # 创建临时视频文件
-                        final_video_with_char = "output/temp_video_with_character.mp4"
+                        final_video_with_char = f"output/temp_video_with_character{suffix}.mp4"
                         
                         # 添加会说话的角色
                         success = create_talking_character_video(
@@ -296,7 +320,9 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                             closed_mouth_path, 
                             open_mouth_path, 
                             final_video_with_char,
-                            threshold=audio_sensitivity
+                            threshold=audio_sensitivity,
+                            audio_info_file=f"output/audio/{input_file_stem}_audio_info.json",
+                            profile=profile
                         )
                     
                     if success:
@@ -317,9 +343,9 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                     from add_character_image import add_character_image_to_video
                     
                     # 创建临时视频文件
-                    final_video_with_char = "output/final_video_with_char.mp4"
+                    final_video_with_char = f"output/final_video_with_char{suffix}.mp4"
                     
-                    success = add_character_image_to_video(current_video, character_image_path, final_video_with_char)
+                    success = add_character_image_to_video(current_video, character_image_path, final_video_with_char, profile=profile)
                     if success:
                         output += f"成功添加角色图片到视频\\n"
                         current_video = final_video_with_char
@@ -350,7 +376,7 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                     raise FileNotFoundError(f"字幕文件不存在: {srt_file}")
                 
                 # 调用add_subtitles函数
-                subtitle_output = os.path.join("output", "final_video_with_subtitle.mp4")
+                subtitle_output = os.path.join("output", f"final_video_with_subtitle{suffix}.mp4")
                 add_subtitles(
                     current_video, 
                     srt_file, 
@@ -358,7 +384,8 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                     font_name=font_name,
                     font_size=font_size,
                     font_color=font_color,
-                    bg_opacity=float(bg_opacity)
+                    bg_opacity=float(bg_opacity),
+                    profile=profile
                 )
                 
                 # 检查输出文件是否存在
@@ -372,8 +399,8 @@ def recompose_video_only(video_engine, character_image=None, font_name=None, fon
                 print(f"使用add_subtitles函数添加字幕失败: {e}")
                 print("尝试使用备用方法(直接FFmpeg)添加字幕...")
                 
-                subtitle_output = os.path.join("output", "final_video_with_subtitle.mp4")
-                if add_subtitles_direct_ffmpeg(current_video, srt_file, subtitle_output, font_name):
+                subtitle_output = os.path.join("output", f"final_video_with_subtitle{suffix}.mp4")
+                if add_subtitles_direct_ffmpeg(current_video, srt_file, subtitle_output, font_name, profile=profile):
                     current_video = subtitle_output
                     print(f"使用备用方法添加字幕成功，输出文件: {current_video}")
                 else:
@@ -974,8 +1001,10 @@ with gr.Blocks(theme=gr_themes.Base()) as demo:
             character_image = main_ui["character_image"]
             refresh_character_button = main_ui["refresh_character_button"]
             video_engine = main_ui["video_engine"]
+            video_profile = main_ui["video_profile"]
             video_resolution = main_ui["video_resolution"]
             max_scene_duration_slider = main_ui["max_scene_duration_slider"]
+            draft_preview = main_ui["draft_preview"]
             one_click_process_button = main_ui["one_click_process_button"]
             output_text = main_ui["output_text"]
             output_video = main_ui["output_video"]
@@ -1043,6 +1072,11 @@ with gr.Blocks(theme=gr_themes.Base()) as demo:
             
             # 重新合成视频和清除修改按钮
             with gr.Row():
+                proxy_render = gr.Checkbox(
+                    label="代理预览 (360p 快速渲染)",
+                    value=False,
+                    info="低分辨率、低帧率快速合成 (含角色和字幕)，用于检查时间和布局，确认后取消勾选再正式合成"
+                )
                 recompose_video_button = gr.Button("重新合成视频", variant="primary", visible=True)
                 clear_modifications_button = gr.Button("重新生成所有图片", variant="secondary", visible=True)
             
@@ -1153,7 +1187,9 @@ with gr.Blocks(theme=gr_themes.Base()) as demo:
             speed_scale_slider, 
             video_engine, video_resolution,
             talking_character, closed_mouth_image, open_mouth_image, audio_sensitivity,
-            max_scene_duration_slider
+            max_scene_duration_slider, draft_preview, video_profile,
+            main_ui["subtitle_mode"], main_ui["progressive_output"],
+            main_ui["output_resolutions"]
         ],
         outputs=[output_text, output_video, log_output_area]
     ).then(
@@ -1265,7 +1301,8 @@ with gr.Blocks(theme=gr_themes.Base()) as demo:
             video_engine,
             character_image,
             font_name, font_size, font_color, bg_opacity,
-            talking_character, closed_mouth_image, open_mouth_image, audio_sensitivity
+            talking_character, closed_mouth_image, open_mouth_image, audio_sensitivity,
+            proxy_render
         ],
         outputs=[scene_video_preview]
     ).then(